@@ -0,0 +1,218 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+import datetime
+import unittest
+from unittest import mock
+
+from openmolar.dbtools import appointments
+from openmolar.dbtools.appointments import _MaxTree, AvailabilityIndex
+
+MON = datetime.date(2016, 1, 4)
+TUE, WED, THU, FRI = (MON + datetime.timedelta(days=i) for i in range(1, 5))
+NOW = 600  # minutes past midnight on MON
+
+
+class Slot(object):
+
+    def __init__(self, mpm, mpm_end):
+        self.mpm = mpm
+        self.mpm_end = mpm_end
+
+
+class FakeIndex(AvailabilityIndex):
+
+    '''
+    an AvailabilityIndex reading from books, a dictionary
+    {dent: {date: [(start, end), ...]}}, rather than the database.
+    '''
+
+    def __init__(self, books):
+        AvailabilityIndex.__init__(self)
+        self.books = books
+        self.fetches = []
+
+    def _fetch(self, startdate, enddate, dents):
+        self.fetches.append((startdate, enddate, sorted(dents)))
+        days = dict((dent, []) for dent in dents)
+        for dent in dents:
+            for adate, intervals in sorted(self.books[dent].items()):
+                if startdate <= adate <= enddate:
+                    days[dent].append(
+                        (adate, [Slot(*interval) for interval in intervals]))
+        return days
+
+
+class TestMaxTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = _MaxTree([3, -1, 7, 0, 7])
+
+    def test_first_at_least(self):
+        self.assertEqual(self.tree.first_at_least(0, 5), 2)
+        self.assertEqual(self.tree.first_at_least(3, 5), 4)
+        self.assertEqual(self.tree.first_at_least(0, 0), 0)
+        self.assertIsNone(self.tree.first_at_least(5, 0))
+        self.assertIsNone(self.tree.first_at_least(0, 8))
+
+    def test_last_at_least(self):
+        self.assertEqual(self.tree.last_at_least(4, 7), 4)
+        self.assertEqual(self.tree.last_at_least(3, 7), 2)
+        self.assertEqual(self.tree.last_at_least(1, 1), 0)
+        # the padding beyond the values is never returned.
+        self.assertEqual(self.tree.last_at_least(10, 0), 4)
+        self.assertIsNone(self.tree.last_at_least(-1, 0))
+
+    def test_update(self):
+        self.tree.update(1, 9)
+        self.assertEqual(self.tree.first_at_least(0, 8), 1)
+        self.tree.update(1, -1)
+        self.tree.update(4, 2)
+        self.assertIsNone(self.tree.first_at_least(0, 8))
+        self.assertEqual(self.tree.last_at_least(4, 7), 2)
+
+    def test_empty(self):
+        tree = _MaxTree([])
+        self.assertIsNone(tree.first_at_least(0, 0))
+        self.assertIsNone(tree.last_at_least(0, 0))
+
+
+class TestAvailabilityIndex(unittest.TestCase):
+
+    def setUp(self):
+        # clinician 2 does not work on MON or TUE.
+        self.books = {
+            1: {MON: [(480, 600), (620, 630)],
+                TUE: [(540, 560)],
+                THU: [(600, 690)]},
+            2: {WED: [(480, 510)],
+                FRI: [(840, 900)]},
+        }
+        for patcher in (
+                mock.patch.object(appointments.localsettings, "currentDay",
+                                  lambda: MON),
+                mock.patch.object(appointments.localsettings, "BOOKEND",
+                                  MON + datetime.timedelta(days=30)),
+                mock.patch.object(appointments.localsettings,
+                                  "pyTimeToMinutesPastMidnight",
+                                  lambda t: NOW)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.index = FakeIndex(self.books)
+
+    def test_forwards(self):
+        self.assertEqual(self.index.next_date(MON, [1], 20), TUE)
+        self.assertEqual(self.index.next_date(MON, [1, 2], 30), WED)
+        self.assertEqual(self.index.next_date(TUE, [1], 60), THU)
+        self.assertEqual(self.index.next_date(FRI, [1, 2], 60), FRI)
+        self.assertIsNone(self.index.next_date(MON, [1, 2], 100))
+
+    def test_backwards(self):
+        self.assertEqual(self.index.next_date(FRI, [1], 20, False), THU)
+        self.assertEqual(self.index.next_date(WED, [1, 2], 20, False), WED)
+        self.assertEqual(self.index.next_date(WED, [1], 10, False), TUE)
+        self.assertIsNone(self.index.next_date(WED, [1], 60, False))
+
+    def test_today(self):
+        '''
+        gaps which have finished already today are ignored.
+        '''
+        self.assertEqual(self.index.next_date(MON, [1], 60), THU)
+        self.assertEqual(self.index.next_date(MON, [1], 10), MON)
+
+    def test_zero_length(self):
+        '''
+        any gap will do, but a day with no gaps will not.
+        '''
+        self.books[2][THU] = []
+        self.assertEqual(self.index.next_date(MON, [2], 0), WED)
+        self.assertEqual(self.index.next_date(THU, [2], 0), FRI)
+
+    def test_excluded_days(self):
+        self.assertEqual(
+            self.index.next_date(MON, [1, 2], 30, excluded_days=(3,)), THU)
+        self.assertEqual(
+            self.index.next_date(FRI, [1], 10, False, (2, 4)), MON)
+
+    def test_clinicians_loaded_once(self):
+        self.index.next_date(MON, [1], 10)
+        self.index.next_date(TUE, [1, 2], 10)
+        self.index.next_date(WED, [2, 1], 60)
+        self.assertEqual([dents for start, end, dents in self.index.fetches],
+                         [[1], [2]])
+
+    def test_invalidated_date(self):
+        '''
+        a changed date is refetched (for that date only) on the next search.
+        '''
+        self.assertEqual(self.index.next_date(MON, [1], 60), THU)
+        self.books[1][THU] = [(600, 620)]
+        self.books[1][TUE] = [(540, 640)]
+        self.index.invalidate(THU)
+        self.assertEqual(self.index.next_date(WED, [1], 60), None)
+        # TUE was not invalidated.
+        self.assertEqual(self.index.next_date(MON, [1], 60), None)
+        self.assertEqual(self.index.fetches[-1], (THU, THU, [1]))
+
+    def test_new_working_day(self):
+        self.assertEqual(self.index.next_date(MON, [1, 2], 60), THU)
+        self.books[1][WED] = [(480, 600)]
+        self.index.invalidate(WED)
+        self.assertEqual(self.index.next_date(MON, [1, 2], 60), WED)
+
+    def test_dates_out_of_range(self):
+        self.index.next_date(MON, [1], 10)
+        self.index.invalidate(MON - datetime.timedelta(days=1))
+        self.index.invalidate(MON + datetime.timedelta(days=31))
+        self.assertEqual(self.index.stale_dates, set())
+
+    @mock.patch.dict(appointments._AVAILABILITY_INDEXES, clear=True)
+    def test_slot_freed_elsewhere(self):
+        '''
+        books altered by another client are noticed by the diary, through
+        diary_signatures, which must invalidate the dates found changed.
+        '''
+        appointments._AVAILABILITY_INDEXES[(None, False)] = self.index
+        self.assertIsNone(self.index.next_date(MON, [1], 120))
+        # an appointment on THU is cancelled by another client.
+        self.books[1][THU] = [(600, 780)]
+        changed = appointments.changed_books(
+            {("aslot", THU, 1): (2, 1234), ("aday", THU, 1): 99},
+            {("aslot", THU, 1): (1, 4321), ("aday", THU, 1): 99})
+        appointments.invalidate_changed_books(changed)
+        self.assertEqual(self.index.next_date(MON, [1], 120), THU)
+
+    @mock.patch.dict(appointments._AVAILABILITY_INDEXES, clear=True)
+    def test_local_changes_are_not_refetched(self):
+        '''
+        changes made by this client invalidated the index when made.
+        '''
+        appointments._AVAILABILITY_INDEXES[(None, False)] = self.index
+        self.index.next_date(MON, [1], 10)
+        appointments.invalidate_changed_books(
+            appointments.changed_books({}, {("local", THU, None): 1}))
+        self.assertEqual(self.index.stale_dates, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
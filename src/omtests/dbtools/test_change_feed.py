@@ -0,0 +1,157 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+import unittest
+from unittest import mock
+
+from openmolar import connect
+from openmolar.dbtools import change_feed, locations, records_in_use
+from openmolar.settings import localsettings
+
+
+class FakeCursor(object):
+    '''
+    answers the change_feed queries from a list of
+    (ix, table_name, serialno, settled) rows.
+    '''
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def execute(self, query, values=()):
+        if query == change_feed.SETTLED_MAX_IX_QUERY:
+            settled = [row[0] for row in self.rows if row[3]]
+            self.result = [(max(settled) if settled else None,)]
+        elif query == change_feed.FEED_QUERY:
+            settle_time, last_ix, table_name = values
+            min_ix = min(row[0] for row in self.rows) if self.rows else None
+            self.result = sorted(
+                row for row in self.rows
+                if (row[0] > last_ix and row[1] == table_name) or
+                row[0] == min_ix)
+        else:
+            raise ValueError("unexpected query %s" % query)
+        return len(self.result)
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [(1, "locations", 1, True)]
+        patcher = mock.patch.object(
+            change_feed.connect, "connect",
+            lambda: FakeConnection(self.rows))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.feed = change_feed.ChangeFeed("locations")
+        self.assertIsNone(self.feed.changes())
+
+    def test_no_changes(self):
+        self.assertEqual(self.feed.changes(), set())
+
+    def test_changes(self):
+        self.rows.append((2, "locations", 5, False))
+        self.rows.append((3, "records_in_use", 6, False))
+        self.assertEqual(self.feed.changes(), set([5]))
+        self.assertEqual(self.feed.changes(), set())
+
+    def test_out_of_order_commit(self):
+        '''
+        ix 3 is committed (and seen) before ix 2.
+        '''
+        self.rows.append((3, "locations", 7, False))
+        self.assertEqual(self.feed.changes(), set([7]))
+        self.rows.append((2, "locations", 6, False))
+        self.assertEqual(self.feed.changes(), set([6]))
+        self.assertEqual(self.feed.changes(), set())
+
+    def test_settled_rows_are_not_fetched_again(self):
+        self.rows.append((2, "locations", 6, True))
+        self.assertEqual(self.feed.changes(), set([6]))
+        self.assertEqual(self.feed.last_ix, 2)
+        self.assertEqual(self.feed.seen, set())
+
+    def test_all_rows_changed(self):
+        self.rows.append((2, "locations", None, False))
+        self.assertIsNone(self.feed.changes())
+
+    def test_pruned(self):
+        self.rows[:] = [(10, "locations", 3, True)]
+        self.assertIsNone(self.feed.changes())
+        self.assertEqual(self.feed.changes(), set())
+
+
+class TestForceReconnect(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [(1, "locations", 1, True),
+                     (2, "records_in_use", 1, True)]
+        for patcher in (
+                mock.patch.object(change_feed.connect, "connect",
+                                  lambda: FakeConnection(self.rows)),
+                mock.patch.object(connect.Connection, "has_connection",
+                                  False),
+                mock.patch.object(connect.params, "reload")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.feeds = (locations._MONITOR.feed, records_in_use._MONITOR.feed)
+        for feed in self.feeds:
+            feed.reset()
+            feed.changes()
+        self.addCleanup(locations.reset_monitor)
+        self.addCleanup(records_in_use.reset_monitor)
+
+    def test_feeds_are_reset(self):
+        '''
+        after changing server, the feeds must not carry on from the old
+        server's position.
+        '''
+        for feed in self.feeds:
+            self.assertEqual(feed.changes(), set())
+        localsettings.force_reconnect()
+        for feed in self.feeds:
+            self.assertIsNone(feed.last_ix)
+            self.assertIsNone(feed.changes())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+import copy
+import pickle
+import unittest
+
+from openmolar.ptModules.estimates import Estimate, EstimateList, TXHash
+
+
+def new_estimate(itemcode, csetype="P"):
+    est = Estimate()
+    est.itemcode = itemcode
+    est.csetype = csetype
+    return est
+
+
+class TestEstimateCounts(unittest.TestCase):
+
+    def setUp(self):
+        self.estimates = EstimateList(
+            [new_estimate("0101"), new_estimate("1401"),
+             new_estimate("1401", "I")])
+
+    def test_counts(self):
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+        self.assertEqual(self.estimates.count_of("1401", "P"), 1)
+        self.assertEqual(self.estimates.count_of("1401", "I"), 1)
+        self.assertEqual(self.estimates.count_of("0101", "I"), 0)
+        self.assertEqual(self.estimates.count_of("4001", "P"), 0)
+
+    def test_append_after_counting(self):
+        self.assertEqual(self.estimates.count_of("1401", "P"), 1)
+        self.estimates.append(new_estimate("1401"))
+        self.assertEqual(self.estimates.count_of("1401", "P"), 2)
+        self.assertEqual(self.estimates.count_of("1401", "I"), 1)
+
+    def test_remove_an_equal_estimate(self):
+        '''
+        estimates compare by value, so remove may be passed a copy.
+        '''
+        self.assertEqual(self.estimates.count_of("1401", "I"), 1)
+        self.estimates.remove(copy.copy(self.estimates[2]))
+        self.assertEqual(len(self.estimates), 2)
+        self.assertEqual(self.estimates.count_of("1401", "I"), 0)
+        self.assertEqual(self.estimates.count_of("1401", "P"), 1)
+
+    def test_listed_estimate_altered(self):
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+        self.estimates[0].itemcode = "0111"
+        self.assertEqual(self.estimates.count_of("0101", "P"), 0)
+        self.assertEqual(self.estimates.count_of("0111", "P"), 1)
+        self.estimates[2].csetype = "P"
+        self.assertEqual(self.estimates.count_of("1401", "P"), 2)
+        self.assertEqual(self.estimates.count_of("1401", "I"), 0)
+
+    def test_other_mutations(self):
+        self.assertEqual(self.estimates.count_of("1401", "P"), 1)
+        self.estimates.insert(0, new_estimate("1401"))
+        self.assertEqual(self.estimates.count_of("1401", "P"), 2)
+        self.estimates[0] = new_estimate("4001")
+        self.assertEqual(self.estimates.count_of("1401", "P"), 1)
+        self.assertEqual(self.estimates.count_of("4001", "P"), 1)
+        self.estimates += [new_estimate("4001")]
+        self.assertEqual(self.estimates.count_of("4001", "P"), 2)
+        self.estimates.pop(0)
+        del self.estimates[-1]
+        self.assertEqual(self.estimates.count_of("4001", "P"), 0)
+        self.estimates.clear()
+        self.assertEqual(self.estimates.count_of("0101", "P"), 0)
+
+    def test_lists_are_independent(self):
+        '''
+        altering an estimate only drops the counts of the lists holding it.
+        '''
+        other = EstimateList([new_estimate("0101")])
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+        self.assertEqual(other.count_of("0101", "P"), 1)
+        # bypass the counts, so that a recount of other would show.
+        list.append(other, new_estimate("0101"))
+        self.estimates[0].itemcode = "4001"
+        self.assertEqual(other.count_of("0101", "P"), 1)
+        self.assertEqual(self.estimates.count_of("0101", "P"), 0)
+
+    def test_estimate_in_two_lists(self):
+        est = self.estimates[0]
+        other = EstimateList([est])
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+        self.assertEqual(other.count_of("0101", "P"), 1)
+        est.csetype = "I"
+        self.assertEqual(self.estimates.count_of("0101", "I"), 1)
+        self.assertEqual(other.count_of("0101", "I"), 1)
+
+    def test_copied_estimate_is_not_listed(self):
+        '''
+        a copy of a listed estimate is not in the list, so altering it must
+        not drop the list's counts.
+        '''
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+        list.append(self.estimates, new_estimate("0101"))
+        for est in (copy.copy(self.estimates[0]),
+                    pickle.loads(pickle.dumps(self.estimates[0]))):
+            est.itemcode = "4001"
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+
+    def test_copies(self):
+        '''
+        copied or unpickled lists are EstimateLists, with their own counts.
+        '''
+        self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+        for estimates in (copy.deepcopy(self.estimates),
+                          pickle.loads(pickle.dumps(self.estimates))):
+            self.assertIsInstance(estimates, EstimateList)
+            estimates.append(new_estimate("0101"))
+            self.assertEqual(estimates.count_of("0101", "P"), 2)
+            self.assertEqual(self.estimates.count_of("0101", "P"), 1)
+
+
+def hashed_estimate(itemcode, *hashes):
+    est = new_estimate(itemcode)
+    est.tx_hashes = [TXHash(hash_) for hash_ in hashes]
+    return est
+
+
+class TestEstimatesFromHash(unittest.TestCase):
+
+    def setUp(self):
+        self.estimates = EstimateList(
+            [hashed_estimate("0101", "exam"),
+             hashed_estimate("1401", "ur5", "ur4"),
+             hashed_estimate("1401", "ul5")])
+
+    def test_lookup(self):
+        self.assertEqual(self.estimates.ests_from_hash("ur4"),
+                         [self.estimates[1]])
+        self.assertEqual(self.estimates.ests_from_hash(TXHash("ul5")),
+                         [self.estimates[2]])
+        self.assertEqual(self.estimates.ests_from_hash("unknown"), [])
+
+    def test_hash_listed_twice(self):
+        '''
+        an estimate is returned once for each of its tx_hashes which match.
+        '''
+        est = hashed_estimate("4001", "lr6", "lr6")
+        self.estimates.append(est)
+        self.assertEqual(self.estimates.ests_from_hash("lr6"), [est, est])
+
+    def test_removed_in_place(self):
+        '''
+        treatment is removed as manipulate_plan does it, removing the hash
+        from the (shared) tx_hashes list, then any estimate left empty.
+        '''
+        self.assertEqual(len(self.estimates.ests_from_hash("ur5")), 1)
+        for hash_ in ("ur5", "ul5"):
+            for est in list(self.estimates.ests_from_hash(hash_)):
+                est.tx_hashes.remove(hash_)
+                if est.tx_hashes == []:
+                    self.estimates.remove(est)
+        self.assertEqual(len(self.estimates), 2)
+        self.assertEqual(self.estimates.ests_from_hash("ur5"), [])
+        self.assertEqual(self.estimates.ests_from_hash("ul5"), [])
+        self.assertEqual(self.estimates.ests_from_hash("ur4"),
+                         [self.estimates[1]])
+
+    def test_shared_tx_hashes(self):
+        est = new_estimate("4001")
+        est.tx_hashes = self.estimates[1].tx_hashes
+        self.estimates.append(est)
+        self.assertEqual(self.estimates.ests_from_hash("ur5"),
+                         [self.estimates[1], est])
+        est.tx_hashes.remove("ur5")
+        self.assertEqual(self.estimates.ests_from_hash("ur5"), [])
+
+    def test_hash_altered(self):
+        self.assertEqual(self.estimates.ests_from_hash("exam"),
+                         [self.estimates[0]])
+        self.estimates[0].tx_hashes[0].hash = "recall"
+        self.assertEqual(self.estimates.ests_from_hash("exam"), [])
+        self.assertEqual(self.estimates.ests_from_hash("recall"),
+                         [self.estimates[0]])
+
+    def test_tx_hashes_replaced(self):
+        self.assertEqual(self.estimates.ests_from_hash("ul5"),
+                         [self.estimates[2]])
+        self.estimates[2].tx_hashes = [TXHash("ul4")]
+        self.assertEqual(self.estimates.ests_from_hash("ul5"), [])
+        self.assertEqual(self.estimates.ests_from_hash("ul4"),
+                         [self.estimates[2]])
+
+    def test_list_altered(self):
+        self.assertEqual(self.estimates.ests_from_hash("exam"),
+                         [self.estimates[0]])
+        est = hashed_estimate("0101", "exam")
+        self.estimates.append(est)
+        self.assertEqual(self.estimates.ests_from_hash("exam"),
+                         [self.estimates[0], est])
+        self.estimates.pop(0)
+        self.assertEqual(self.estimates.ests_from_hash("exam"), [est])
+        self.estimates.insert(0, hashed_estimate("0111", "exam"))
+        self.assertEqual(len(self.estimates.ests_from_hash("exam")), 2)
+        self.estimates.remove(est)
+        self.assertEqual(self.estimates.ests_from_hash("exam"),
+                         [self.estimates[0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
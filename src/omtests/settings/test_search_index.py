@@ -0,0 +1,104 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+import unittest
+
+from openmolar.settings.fee_tables import SearchIndex
+
+TEXTS = {
+    1: "Examination",
+    2: "Extended Examination",
+    3: "Scale & Polish",
+    4: "Amalgam filling - MOD",
+    5: "Composite (anterior), per tooth",
+    6: "Extraction of 1 tooth",
+    7: "Prothèse ÉTENDUE",
+    8: "",
+}
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex()
+        for key, text in TEXTS.items():
+            self.index.add(key, text)
+
+    def test_len(self):
+        self.assertEqual(len(self.index), len(TEXTS))
+
+    def test_case_insensitive(self):
+        for phrase in ("exam", "EXAM", "eXaM"):
+            self.assertEqual(self.index.search(phrase), set([1, 2]))
+        self.assertEqual(self.index.search("mod"), set([4]))
+        self.assertEqual(self.index.search("étendue"), set([7]))
+        self.assertEqual(self.index.search("PROTHÈSE"), set([7]))
+
+    def test_within_words(self):
+        self.assertEqual(self.index.search("amin"), set([1, 2]))
+        self.assertEqual(self.index.search("x"), set([1, 2, 6]))
+        self.assertEqual(self.index.search("lish"), set([3]))
+        self.assertEqual(self.index.search("zz"), set())
+
+    def test_phrases(self):
+        '''
+        the first and last words of a phrase may be part of a word in the
+        text, but the phrase must appear as typed.
+        '''
+        self.assertEqual(self.index.search("ded exam"), set([2]))
+        self.assertEqual(self.index.search("ale & pol"), set([3]))
+        self.assertEqual(self.index.search("per tooth"), set([5]))
+        self.assertEqual(self.index.search("of 1 too"), set([6]))
+        self.assertEqual(self.index.search("tooth per"), set())
+        self.assertEqual(self.index.search("scale  & polish"), set())
+        self.assertEqual(self.index.search("amalgam mod"), set())
+
+    def test_punctuation(self):
+        '''
+        phrases without words are checked against every text.
+        '''
+        self.assertEqual(self.index.search("&"), set([3]))
+        self.assertEqual(self.index.search(" - "), set([4]))
+        self.assertEqual(self.index.search("("), set([5]))
+        self.assertEqual(self.index.search("(anterior),"), set([5]))
+        self.assertEqual(self.index.search(""), set(TEXTS))
+
+    def test_readded_key(self):
+        '''
+        a key added again with a new text is found by the new text only.
+        '''
+        self.index.search("polish")
+        self.index.add(3, "Scale only")
+        self.assertEqual(self.index.search("scale only"), set([3]))
+        self.assertEqual(self.index.search("polish"), set())
+        self.assertEqual(len(self.index), len(TEXTS))
+
+    def test_added_after_search(self):
+        self.assertEqual(self.index.search("veneer"), set())
+        self.index.add(9, "Porcelain Veneer")
+        self.assertEqual(self.index.search("veneer"), set([9]))
+        self.assertEqual(self.index.search("lain"), set([9]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+import re
+import unittest
+
+from openmolar.settings.fee_tables import ShortcutMatcher
+
+
+def matcher(*patterns):
+    '''
+    a ShortcutMatcher with itemcodes "0", "1", "2".. for patterns in order.
+    '''
+    return ShortcutMatcher([(re.compile(pattern), str(i))
+                            for i, pattern in enumerate(patterns)])
+
+
+class TestShortcutMatcher(unittest.TestCase):
+
+    def test_first_match_wins(self):
+        shortcuts = matcher("MO", "M.*", "MOD", "DO")
+        self.assertEqual(shortcuts.match("MOD"), "0")
+        self.assertEqual(shortcuts.match("MD"), "1")
+        self.assertEqual(shortcuts.match("DO"), "3")
+        self.assertIsNone(shortcuts.match("O"))
+
+    def test_match_not_search(self):
+        '''
+        as with regex.match, codes match from their start only, and need
+        not be matched to the end.
+        '''
+        shortcuts = matcher("O", "CR,GO")
+        self.assertIsNone(shortcuts.match("MO"))
+        self.assertEqual(shortcuts.match("OL"), "0")
+        self.assertEqual(shortcuts.match("CR,GOLD"), "1")
+
+    def test_order_across_leading_characters(self):
+        '''
+        a regex which may start with any character is tried in its place
+        in the table, before those for a particular character which follow
+        it.
+        '''
+        shortcuts = matcher("CR,V1", ".*O", "MO", "[MD]OD", "^B")
+        self.assertEqual(shortcuts.match("MO"), "1")
+        self.assertEqual(shortcuts.match("MOD"), "1")
+        self.assertEqual(shortcuts.match("CR,V1"), "0")
+        self.assertEqual(shortcuts.match("B"), "4")
+
+    def test_optional_first_character(self):
+        shortcuts = matcher("M?OD", "M*", "CE")
+        self.assertEqual(shortcuts.match("OD"), "0")
+        self.assertEqual(shortcuts.match("MOD"), "0")
+        self.assertEqual(shortcuts.match("O"), "1")
+        self.assertEqual(shortcuts.match(""), "1")
+        self.assertEqual(shortcuts.match("CE"), "1")
+
+    def test_alternation(self):
+        shortcuts = matcher("B|L", "M")
+        self.assertEqual(shortcuts.match("L"), "0")
+        self.assertEqual(shortcuts.match("MO"), "1")
+
+    def test_flags(self):
+        '''
+        flags given when a regex was compiled still apply once combined.
+        '''
+        shortcuts = ShortcutMatcher([(re.compile("mod", re.I), "0"),
+                                     (re.compile("M."), "1"),
+                                     (re.compile("CR,.", re.S), "2")])
+        self.assertEqual(shortcuts.match("MOD"), "0")
+        self.assertEqual(shortcuts.match("MO"), "1")
+        self.assertEqual(shortcuts.match("CR,\n"), "2")
+        self.assertIsNotNone(shortcuts._dispatch)
+
+    def test_empty_code(self):
+        shortcuts = matcher("CE", "EX")
+        self.assertIsNone(shortcuts.match(""))
+        self.assertIsNone(shortcuts.match("FS"))
+
+    def test_groups_in_patterns(self):
+        '''
+        groups within a regex must not shift the itemcodes which follow it.
+        '''
+        shortcuts = matcher("EX(/S(\\d))?$", "(CE|ST)", "E(X)", "M(O)(D)?",
+                            "MO", "ST")
+        self.assertEqual(shortcuts.match("EX/S1"), "0")
+        self.assertEqual(shortcuts.match("EX/"), "2")
+        self.assertEqual(shortcuts.match("ST"), "1")
+        self.assertEqual(shortcuts.match("MOD"), "3")
+        self.assertIsNone(shortcuts.match("E"))
+
+    def test_backreference_is_scanned(self):
+        '''
+        backreferences would be renumbered by combining the regexes.
+        '''
+        shortcuts = matcher("(M)\\1", "M")
+        self.assertIsNone(shortcuts._dispatch)
+        self.assertEqual(shortcuts.match("MM"), "0")
+        self.assertEqual(shortcuts.match("MO"), "1")
+
+    def test_repeated_group_name_is_scanned(self):
+        shortcuts = matcher("(?P<surface>M)O", "(?P<surface>D)O", "M")
+        self.assertIsNone(shortcuts._dispatch)
+        self.assertEqual(shortcuts.match("MO"), "0")
+        self.assertEqual(shortcuts.match("DO"), "1")
+        self.assertEqual(shortcuts.match("MM"), "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
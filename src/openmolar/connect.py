@@ -27,8 +27,8 @@ provide a connection to the mysqldatabase using 3rd party MySQLdb module
 '''
 
 import base64
-import inspect
 import logging
+import threading
 import time
 import subprocess
 from xml.dom import minidom
@@ -36,7 +36,8 @@ from xml.dom import minidom
 import MySQLdb
 from PyQt5 import QtCore
 
-from openmolar.settings import localsettings
+from openmolar.settings import localsettings, startup_profile
+from openmolar.dbtools.query_stats import InstrumentedCursor
 
 LOGGER = logging.getLogger("openmolar")
 
@@ -45,6 +46,32 @@ ProgrammingError = MySQLdb.ProgrammingError
 IntegrityError = MySQLdb.IntegrityError
 OperationalError = MySQLdb.OperationalError
 
+# maximum number of connections lent to threads other than the gui thread.
+# can be overridden by a <pool_size> node in the server section of the
+# conf file.
+POOL_SIZE = 4
+
+# a worker thread waiting longer than this (in seconds) for a pooled
+# connection raises PoolExhaustedError.
+POOL_TIMEOUT = 60
+
+# a connection idle for longer than this (in seconds) is pinged before use.
+HEALTH_CHECK_INTERVAL = 10
+
+# reconnect delays (in seconds) double from BACKOFF_INITIAL to BACKOFF_MAX
+BACKOFF_INITIAL = 2
+BACKOFF_MAX = 30
+
+# worker threads give up (and raise) after this many failed attempts
+WORKER_MAX_ATTEMPTS = 5
+
+
+class PoolExhaustedError(OperationalError):
+    '''
+    raised when a worker thread waits too long for a pooled connection.
+    '''
+    pass
+
 
 class Signaller(QtCore.QObject):
     '''
@@ -55,6 +82,107 @@ class Signaller(QtCore.QObject):
     connection_signal = QtCore.pyqtSignal()
 
 
+class ConnectionPool(object):
+    '''
+    A bounded pool of database connections for threads other than the gui
+    thread.
+    Each thread is lent one connection, which it keeps (and reuses) until
+    it calls release. Released connections are recycled for other threads.
+    '''
+
+    def __init__(self, connection_factory, size=POOL_SIZE):
+        self.connection_factory = connection_factory
+        self.size = size
+        self._condition = threading.Condition()
+        self._idle = []  # list of [connection, last_used]
+        self._lent = {}  # thread ident: [connection, last_used]
+
+    def __len__(self):
+        return len(self._idle) + len(self._lent)
+
+    def acquire(self, timeout=None):
+        '''
+        return the connection lent to the calling thread, borrowing one
+        if necessary. Blocks if all connections are lent, for at most
+        timeout seconds (if given).
+        '''
+        ident = threading.get_ident()
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            entry = self._lent.get(ident)
+            if entry is None:
+                while not self._idle and len(self._lent) >= self.size:
+                    remaining = (None if deadline is None
+                                 else deadline - time.time())
+                    if ((remaining is not None and remaining <= 0) or
+                            not self._condition.wait(remaining)):
+                        raise PoolExhaustedError(
+                            "no pooled connection available after %s seconds"
+                            % timeout)
+                entry = self._idle.pop() if self._idle else [None, 0]
+                self._lent[ident] = entry
+        db, last_used = entry
+        if db is None or not is_healthy(db, last_used):
+            close_quietly(db)
+            try:
+                db = self.connection_factory()
+            except MySQLdb.Error:
+                with self._condition:
+                    self._lent.pop(ident, None)
+                    self._condition.notify()
+                raise
+        entry[:] = [db, time.time()]
+        return db
+
+    def release(self):
+        '''
+        return the calling thread's connection to the pool.
+        '''
+        with self._condition:
+            entry = self._lent.pop(threading.get_ident(), None)
+            if entry is not None:
+                self._idle.append(entry)
+                self._condition.notify()
+
+    def close_all(self):
+        '''
+        close every connection (idle or lent).
+        threads holding a connection will be given a new one on next acquire.
+        '''
+        with self._condition:
+            for entry in self._idle + list(self._lent.values()):
+                close_quietly(entry[0])
+                entry[:] = [None, 0]
+            self._idle = []
+            self._condition.notify_all()
+
+
+def is_healthy(db, last_used):
+    '''
+    a cheap check that a connection is usable.
+    only connections idle for more than HEALTH_CHECK_INTERVAL are pinged.
+    '''
+    if not db.open:
+        return False
+    if time.time() - last_used < HEALTH_CHECK_INTERVAL:
+        return True
+    try:
+        db.ping()
+        return True
+    except MySQLdb.Error:
+        LOGGER.warning("database connection failed health check")
+        return False
+
+
+def close_quietly(db):
+    if db is None:
+        return
+    try:
+        db.close()
+    except MySQLdb.Error:
+        pass
+
+
 class Connection(object):
     '''
     an object for communicating with the database and alerting the
@@ -62,6 +190,7 @@ class Connection(object):
     '''
 
     _connection = None
+    _last_used = 0
     was_connected = False   # returns True if a connection has been established
     connection_abandoned = False   # this param altered by a dialog
 
@@ -74,6 +203,7 @@ class Connection(object):
         self.subprocs = []
         self.signaller = Signaller()
         self.attempts = 0
+        self.pool = ConnectionPool(self.new_worker_connection)
         try:
             self.reload()
         except IOError:
@@ -94,8 +224,10 @@ class Connection(object):
             except AttributeError:
                 print("sub_proc %s vanished" % sub_proc)
 
+    @startup_profile.timed("read connection settings")
     def reload(self):
         self.kill_subprocs()
+        self.pool.close_all()
         self._connection = None
 
         dom = minidom.parse(localsettings.cflocation)
@@ -120,6 +252,9 @@ class Connection(object):
             xmlnode.getElementsByTagName("port")[0].firstChild.data)
         sslnode = xmlnode.getElementsByTagName("ssl")
         self.use_ssl = sslnode and sslnode[0].firstChild.data == "True"
+        poolnode = xmlnode.getElementsByTagName("pool_size")
+        self.pool.size = \
+            int(poolnode[0].firstChild.data) if poolnode else POOL_SIZE
 
         xmlnode = dom.getElementsByTagName(
             "database")[localsettings.chosenserver]
@@ -170,60 +305,115 @@ class Connection(object):
     def has_connection(self):
         return self._connection and self._connection.open
 
+    @property
+    def backoff_delay(self):
+        '''
+        seconds to wait before the next connection attempt.
+        '''
+        return min(BACKOFF_INITIAL * 2 ** max(self.attempts - 1, 0),
+                   BACKOFF_MAX)
+
+    def new_connection(self):
+        db = MySQLdb.connect(cursorclass=InstrumentedCursor, **self.kwargs)
+        db.autocommit(True)
+        return db
+
+    def new_worker_connection(self):
+        '''
+        connect on behalf of a worker thread, backing off between attempts.
+        raises MySQLdb.Error after WORKER_MAX_ATTEMPTS failures.
+        '''
+        delay = BACKOFF_INITIAL
+        for attempt in range(1, WORKER_MAX_ATTEMPTS + 1):
+            try:
+                LOGGER.debug("worker thread connecting to %s",
+                             self.database_name)
+                return self.new_connection()
+            except MySQLdb.Error:
+                LOGGER.warning("worker connection attempt %d failed", attempt)
+                if attempt == WORKER_MAX_ATTEMPTS:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX)
+
+    def release_connection(self):
+        '''
+        worker threads should call this when finished with the database,
+        so that their connection can be reused by other threads.
+        has no effect in the gui thread.
+        '''
+        self.pool.release()
+
     def connect(self):
         '''
         returns a MySQLdb object, connected to the database specified in the
-        settings file
+        settings file.
+        the gui thread has a connection of its own, other threads are lent
+        one from the pool.
         '''
         if self.connection_abandoned:
             return None
-        try:
-            if not self.has_connection:
+        if threading.current_thread() is not threading.main_thread():
+            return self.pool.acquire(POOL_TIMEOUT)
+        while True:
+            try:
+                if self.has_connection and is_healthy(self._connection,
+                                                      self._last_used):
+                    self._last_used = time.time()
+                    return self._connection
                 if self.attempts == 0:
                     LOGGER.info("New database connection needed")
-                    params.signaller.message_signal.emit(
+                    self.signaller.message_signal.emit(
                         _("Initiating MySQL connection"), 0)
-                LOGGER.debug("connecting to %s", params.database_name)
-                params._connection = MySQLdb.connect(**params.kwargs)
-                params._connection.autocommit(True)
-                params.was_connected = True  # never returned to False
+                LOGGER.debug("connecting to %s", self.database_name)
+                self._connection = self.new_connection()
+                self._last_used = time.time()
+                self.was_connected = True  # never returned to False
                 self.attempts = 0
-                params.signaller.message_signal.emit(
+                self.signaller.message_signal.emit(
                     _("Connection Established"), 0)
-                params.signaller.connection_signal.emit()
-            else:
-                params._connection.commit()
-            return params._connection
-        except MySQLdb.Error:
-            LOGGER.error("unable to connect to Mysql database")
-            LOGGER.info("will attempt re-connect in 2 seconds...")
-            self._connection = None
-        self.attempts += 1
-        params.signaller.connection_signal.emit()
-        params.signaller.message_signal.emit("%s %d %s" % (
-            _("Connection attempt"), self.attempts, _("failed")), 0)
-        if self.was_connected:
-            # if the application has previously connected, this function needs
-            # to block all interation until connection is reestablished.
-            sleeps = 0
-            while sleeps < 2000:   # approx 2 seconds between each attempt
-                time.sleep(0.001)
-                QtCore.QCoreApplication.processEvents()
-                sleeps += 1
-            return self.connect()
-        else:
-            # more efficient, but not blocking
-            QtCore.QTimer.singleShot(2000, self.connect)
+                self.signaller.connection_signal.emit()
+                return self._connection
+            except MySQLdb.Error:
+                LOGGER.error("unable to connect to Mysql database")
+                self._connection = None
+            self.attempts += 1
+            delay = self.backoff_delay
+            LOGGER.info("will attempt re-connect in %s seconds...", delay)
+            self.signaller.connection_signal.emit()
+            self.signaller.message_signal.emit("%s %d %s" % (
+                _("Connection attempt"), self.attempts, _("failed")), 0)
+            if not self.was_connected:
+                # more efficient, but not blocking
+                QtCore.QTimer.singleShot(delay * 1000, self.connect)
+                return None
+            # if the application has previously connected, this function
+            # needs to block all interation until connection is
+            # reestablished.
+            self.wait(delay)
+            if self.connection_abandoned:
+                return None
+
+    @staticmethod
+    def wait(seconds):
+        '''
+        block for a number of seconds whilst still servicing qt events.
+        unlike a processEvents loop, this does not spin the cpu.
+        '''
+        if QtCore.QCoreApplication.instance() is None:
+            time.sleep(seconds)
+            return
+        loop = QtCore.QEventLoop()
+        QtCore.QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec_()
 
 
 # create singletons
 params = Connection()
 
 # this line prevents a total rewrite of all modules which connect.
+# callers are no longer logged here, see openmolar.dbtools.query_stats
 def connect():
-    frameinfo = inspect.getframeinfo(inspect.currentframe().f_back)
-    LOGGER.debug('connect called by %s line %s',
-                 frameinfo.filename, frameinfo.lineno)
     return params.connect()
 
 if __name__ == "__main__":
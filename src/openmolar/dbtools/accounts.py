@@ -27,6 +27,10 @@ module to retrieve a list of patients who owe money
 
 from openmolar.settings import localsettings
 from openmolar.connect import connect
+from openmolar.dbtools.query_stats import InstrumentedSSCursor
+
+# rows are streamed from the server in batches of this size.
+BATCH_SIZE = 200
 
 QUERY = '''SELECT dnt1, new_patients.serialno, cset, CONCAT(fname, " ", sname),
 status, tx_date, cmpd,
@@ -34,21 +38,25 @@ status, tx_date, cmpd,
 as fees, billdate, billtype, billct, memo from new_patients
 join patient_money on new_patients.serialno = patient_money.pt_sno
 join currtrtmt2 on new_patients.courseno0 = currtrtmt2.courseno
-join (select serialno, max(date) as tx_date from daybook group by serialno)
-as t on new_patients.serialno = t.serialno
+join last_treatment on new_patients.serialno = last_treatment.serialno
 where (money0 + money1 + money9 + money10 - money2 - money3 - money8 + money11)
 %s %%s %s order by tx_date desc
 '''
 
 
+def _query(greater_than, amount, extra_conditions, extra_values):
+    extras = " AND ".join(extra_conditions)
+    query = QUERY % (">" if greater_than else "<",
+                     " AND " + extras if extras else "")
+    return query, [amount] + extra_values
+
+
 def details(greater_than=True, amount=0, extra_conditions=[], extra_values=[]):
     '''
     get all patients owing money where the debt has not been written off
     '''
-    extras = " AND ".join(extra_conditions)
-    query = QUERY % (">" if greater_than else "<",
-                     " AND " + extras if extras else "")
-    values = [amount] + extra_values
+    query, values = _query(greater_than, amount, extra_conditions,
+                           extra_values)
     db = connect()
     cursor = db.cursor()
     cursor.execute(query, values)
@@ -57,6 +65,27 @@ def details(greater_than=True, amount=0, extra_conditions=[], extra_values=[]):
     return rows
 
 
+def stream_details(greater_than=True, amount=0, extra_conditions=[],
+                   extra_values=[], batch_size=BATCH_SIZE):
+    '''
+    as details, but a generator of lists of at most batch_size rows,
+    read from the server as they are required.
+    '''
+    query, values = _query(greater_than, amount, extra_conditions,
+                           extra_values)
+    db = connect()
+    cursor = db.cursor(InstrumentedSSCursor)
+    try:
+        cursor.execute(query, values)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield list(rows)
+    finally:
+        cursor.close()
+
+
 if __name__ == "__main__":
     localsettings.initiate()
     for row in details():
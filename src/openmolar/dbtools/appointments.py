@@ -21,8 +21,10 @@
 # #                                                                         # #
 # ########################################################################### #
 
+import bisect
 import datetime
 import logging
+import time
 
 from openmolar.settings import localsettings
 from openmolar.connect import connect, ProgrammingError, OperationalError
@@ -71,6 +73,32 @@ WHERE adate=%s and apptix=%s AND flag0=-128 and name!="LUNCH" ORDER BY start'''
 LUNCHES_QUERY = '''SELECT start, end, 0, "%s", 63 , "" FROM aslot
 WHERE adate = %%s and apptix = %%s AND name="LUNCH" ''' % _("Lunch")
 
+WEEK_ADAY_QUERY = '''SELECT adate, apptix, start, end, memo, flag FROM aday
+WHERE adate>=%s AND adate<%s ORDER BY adate, apptix'''
+
+WEEK_CALENDAR_QUERY = '''SELECT adate, memo FROM calendar
+WHERE adate>=%s AND adate<%s'''
+
+WEEK_ASLOT_QUERY = '''SELECT adate, apptix, start, end, serialno, name, flag0,
+flag1, concat(code0, " ", code1," ", code2) FROM aslot
+WHERE adate>=%s AND adate<%s ORDER BY adate, apptix, start'''
+
+UPCOMING_PATIENTS_QUERY = '''SELECT serialno FROM aslot
+WHERE adate=%s AND start>=%s AND start<%s AND serialno!=0
+GROUP BY serialno ORDER BY min(start)'''
+
+SIGNATURE_ASLOT_QUERY = '''SELECT adate, apptix, count(*),
+sum(crc32(concat_ws("|", start, end, name, serialno, code0, code1, code2,
+note, flag0, flag1, flag2, flag3))) FROM aslot
+WHERE adate>=%s AND adate<%s GROUP BY adate, apptix'''
+
+SIGNATURE_ADAY_QUERY = '''SELECT adate, apptix,
+crc32(concat_ws("|", start, end, flag, memo)) FROM aday
+WHERE adate>=%s AND adate<%s'''
+
+SIGNATURE_CALENDAR_QUERY = '''SELECT adate, crc32(memo) FROM calendar
+WHERE adate>=%s AND adate<%s'''
+
 
 def duration(dt1, dt2):
 
@@ -206,6 +234,64 @@ class FreeSlot(object):
                 return i
 
 
+def joint_slot_pairs(primary_slots, secondary_slots,
+                     appt1_length, appt2_length, max_wait):
+    '''
+    find the (primary, secondary) pairs for which FreeSlot.wait_time is not
+    None and no greater than max_wait.
+    pairs are returned in the order the nested loop
+    "for primary in primary_slots: for secondary in secondary_slots"
+    would produce them.
+
+    rather than calling wait_time for every pair, secondary slots are
+    grouped by date and clinician, and sorted. As a clinician's slots do not
+    overlap, the candidates for each primary slot form a contiguous run,
+    found by bisection.
+    all arithmetic is in integer minutes.
+    '''
+    groups = {}
+    for position, slot in enumerate(secondary_slots):
+        start = slot.mpm
+        groups.setdefault((slot.date(), slot.dent), []).append(
+            (start, start + slot.length, position, slot))
+
+    indexed_groups = {}
+    for (date_, dent), group in groups.items():
+        group.sort(key=lambda item: item[0])
+        starts = [item[0] for item in group]
+        ends = [item[1] for item in group]
+        monotonic = all(e1 <= e2 for e1, e2 in zip(ends, ends[1:]))
+        indexed_groups.setdefault(date_, []).append(
+            (starts, ends if monotonic else None, group))
+
+    combined_length = appt1_length + appt2_length
+    pairs = []
+    for primary in primary_slots:
+        if appt1_length > primary.length:
+            continue
+        s1 = primary.mpm
+        e1 = s1 + primary.length
+        matches = []
+        for starts, ends, group in indexed_groups.get(primary.date(), ()):
+            # any valid secondary starts no later than e1 + max_wait
+            # and finishes no earlier than s1 - max_wait
+            hi = bisect.bisect_right(starts, e1 + max_wait)
+            lo = 0 if ends is None else \
+                bisect.bisect_left(ends, s1 - max_wait, 0, hi)
+            for s2, e2, position, secondary in group[lo:hi]:
+                if appt2_length > e2 - s2:
+                    continue
+                # appt1 first, then appt2 (waits between e2 - s1 - a - b
+                # and s2 - e1) or appt2 first (e1 - s2 - a - b to s1 - e2)
+                if ((e2 - s1 >= combined_length and s2 - e1 <= max_wait) or
+                        (e1 - s2 >= combined_length and
+                         s1 - e2 <= max_wait)):
+                    matches.append((position, secondary))
+        for position, secondary in sorted(matches, key=lambda m: m[0]):
+            pairs.append((primary, secondary))
+    return pairs
+
+
 class AgendaAppointment(FreeSlot):
     text = ""
     is_slot = False
@@ -520,6 +606,19 @@ class DayAppointmentData(DaySummary):
         self.workingDents = tuple(working_dents)
         self.appointments = allAppointmentData(self.date, self.workingDents)
 
+    def refresh_appointments(self, dents):
+        '''
+        re-read the appointments for dents only, keeping those of the other
+        books.
+        '''
+        self._snos = None
+        dents = tuple(dents)
+        appointments = [appt for appt in self.appointments
+                        if appt.apptix not in dents]
+        appointments += allAppointmentData(self.date, dents)
+        self.appointments = sorted(
+            appointments, key=lambda appt: (appt.apptix, appt.start))
+
     def dentAppointments(self, dent, ignore_emergency=False,
                          busy_serialno=None):
         '''
@@ -633,6 +732,48 @@ class DentistDay(object):
         return localsettings.minutesPastMidnight(self.end)
 
 
+class WeekDayData(object):
+
+    '''
+    everything the week view needs for one day, as loaded by week_data.
+    appts, blocks and lunches are dictionaries
+    {apptix: tuple of WeekViewAppointment}
+    and contain the same data as day_summary, getBlocks and getLunch.
+    '''
+
+    def __init__(self, adate):
+        self.date = adate
+        self.bank_holiday = ""
+        self.global_memo = ""
+        self.dentist_days = []
+        self.working = set()  # apptix of books flagged as in use
+        self.appts = {}
+        self.blocks = {}
+        self.lunches = {}
+
+    def __repr__(self):
+        return "WeekDayData %s %s" % (self.date, self.dentist_days)
+
+    def working_dents(self, dents=(0,), include_non_working=True):
+        '''
+        the same as getWorkingDents, without a query
+        '''
+        for d_day in self.dentist_days:
+            if 0 not in dents and d_day.ix not in dents:
+                continue
+            if not include_non_working and d_day.ix not in self.working:
+                continue
+            yield d_day
+
+    def all_clinicians(self):
+        '''
+        the same as getAllClinicians, without a query
+        '''
+        wds = dict((wd.ix, wd) for wd in self.dentist_days)
+        for dent in localsettings.activedent_ixs + localsettings.activehyg_ixs:
+            yield wds.get(dent, DentistDay(dent))
+
+
 class PrintableAppointment(object):
 
     '''
@@ -885,6 +1026,7 @@ def updateAday(date_, data):
               data.active) * 2
 
     n_rows = cursor.execute(query, values)
+    books_changed(date_, working_days=True)
     return n_rows
 
 
@@ -913,6 +1055,89 @@ def todays_patients(dents):
     return rows
 
 
+def upcoming_patients(hours=2):
+    '''
+    the serialnos of patients booked in today's book over the next few hours,
+    in order of appointment time.
+    used to prefetch their records.
+    '''
+    now = localsettings.pyTimetoWystime(localsettings.currentTime())
+    db = connect()
+    cursor = db.cursor()
+    cursor.execute(UPCOMING_PATIENTS_QUERY,
+                   (localsettings.currentDay(), now,
+                    min(2400, now + hours * 100)))
+    rows = cursor.fetchall()
+    cursor.close()
+    return [row[0] for row in rows]
+
+
+def week_data(startdate, days=7):
+    '''
+    load the aday, aslot and calendar rows for the days beginning startdate
+    with 3 queries (rather than several per day and clinician)
+    returns a list of WeekDayData
+    '''
+    enddate = startdate + datetime.timedelta(days=days)
+    week = [WeekDayData(startdate + datetime.timedelta(days=i))
+            for i in range(days)]
+    week_dict = dict((day.date, day) for day in week)
+
+    db = connect()
+    cursor = db.cursor()
+
+    cursor.execute(WEEK_ADAY_QUERY, (startdate, enddate))
+    for adate, apptix, start, end, memo, flag in cursor.fetchall():
+        day = week_dict[adate]
+        if apptix == 0:
+            day.global_memo += "%s " % memo
+            continue
+        d_day = DentistDay(apptix)
+        d_day.date = adate
+        d_day.start = start
+        d_day.end = end
+        d_day.memo = memo
+        d_day.flag = bool(flag)
+        day.dentist_days.append(d_day)
+        if flag in (1, 2):
+            day.working.add(apptix)
+
+    try:
+        cursor.execute(WEEK_CALENDAR_QUERY, (startdate, enddate))
+        for adate, memo in cursor.fetchall():
+            week_dict[adate].bank_holiday += "%s " % memo
+    except ProgrammingError:  # no bank holiday table - old schema.
+        LOGGER.warning("bank holiday table not found")
+        for day in week:
+            day.bank_holiday = "couldn't get Bank Holiday details"
+
+    appts, blocks, lunches = {}, {}, {}
+    cursor.execute(WEEK_ASLOT_QUERY, (startdate, enddate))
+    for (adate, apptix, start, end, serialno, name, flag0, flag1,
+         trt) in cursor.fetchall():
+        key = (adate, apptix)
+        # mysql string comparisons are case insensitive, and false for NULL
+        is_lunch = name is not None and name.upper() == "LUNCH"
+        if flag0 != -128:
+            if apptix in week_dict[adate].working:
+                appts.setdefault(key, []).append(
+                    (start, end, serialno, name, flag1, trt))
+        elif name is not None and not is_lunch:
+            blocks.setdefault(key, []).append((start, end, 0, name, 63, ""))
+        if is_lunch:
+            lunches.setdefault(key, []).append(
+                (start, end, 0, _("Lunch"), 63, ""))
+    cursor.close()
+
+    for results, attr in ((appts, "appts"), (blocks, "blocks"),
+                          (lunches, "lunches")):
+        for (adate, apptix), rows in results.items():
+            getattr(week_dict[adate], attr)[apptix] = \
+                tuple(convertResults(rows))
+
+    return week
+
+
 def getWorkingDents(adate, dents=(0,), include_non_working=True):
     '''
     dentists are part time, or take holidays...this proc takes a date,
@@ -1116,6 +1341,7 @@ def setMemos(adate, memos):
         values = (memo, adate, apptix, start, end, memo)
         cursor.execute(query, values)
     cursor.close()
+    books_changed(adate)
 
 
 def get_appt_note(sno, adate, atime, dentist):
@@ -1146,6 +1372,7 @@ def set_appt_note(sno, adate, atime, dentist, note):
     cursor.execute(query, values)
     cursor.close()
     db.commit()
+    books_changed(adate)
 
 
 def setPubHol(adate, arg):
@@ -1165,6 +1392,7 @@ def setPubHol(adate, arg):
         values = (adate, arg, arg)
     cursor.execute(query, values)
     cursor.close()
+    books_changed(adate)
 
 
 def allAppointmentData(adate, dents=()):
@@ -1329,6 +1557,7 @@ def clearEms(cedate):
         values = (cedate, -128, "%Emergency%")
         number = cursor.execute(query, values)
         db.commit()
+        books_changed(cedate)
     except Exception:
         LOGGER("exception in appointments module, clearEms")
 
@@ -1523,6 +1752,7 @@ def make_appt(make_date, apptix, start, end, name, serialno, code0, code1,
     result = False
     try:
         result = cursor.execute(INSERT_APPT_QUERY, values)
+        books_changed(make_date)
     except OperationalError:
         LOGGER.exception("couldn't insert into aslot %s %s %s serialno %d",
                          make_date, apptix, start, serialno)
@@ -1546,6 +1776,7 @@ def cancel_emergency_slot(a_date, apptix, a_start, a_end):
 
     rows = cursor.execute(query, values)
     LOGGER.warning("deleted %d emergency slots" % rows)
+    books_changed(a_date)
 
     cursor.close()
     return rows > 0
@@ -1631,6 +1862,7 @@ def block_appt(bldate, apptix, start, end, bl_start, bl_end, reason):
         # - insert call.. so this will always be true unless we have key
         # - value errors?
         db.commit()
+        books_changed(bldate)
         result = True
     else:
         LOGGER.warning("couldn't insert into aslot %s %s %s",
@@ -1658,6 +1890,7 @@ def modify_aslot_appt(moddate, apptix, start, serialno, code0, code1, code2,
     try:
         cursor.execute(query, values)
         db.commit()
+        books_changed(moddate)
         result = True
     except Exception:
         LOGGER.exception("couldn't modify aslot %s %s %s serialno %s",
@@ -1745,6 +1978,7 @@ def delete_appt_from_aslot(appt):
         values = (appt.date, appt.serialno, appt.dent, appt.atime)
         LOGGER.debug("deleting appointment %s", values)
         if cursor.execute(DELETE_APPOINTMENT_QUERY, values):
+            books_changed(appt.date)
             result = True
     except Exception:
         LOGGER.exception("appointments.delete_appt_from_aslot")
@@ -1753,17 +1987,13 @@ def delete_appt_from_aslot(appt):
     return result
 
 
-def future_slots(startdate, enddate, dents,
-                 busy_serialno=None, override_emergencies=False):
+def _book_rows(cursor, startdate, enddate, dents,
+               busy_serialno=None, override_emergencies=False):
     '''
-    get a list of possible appointment positions
-    (between startdate and enddate) that can be offered to the patient
+    fetch the aday and aslot rows needed to calculate free slots for dents
+    between startdate and enddate (2 queries, regardless of range)
+    returns (possible_days, rows_by_date)
     '''
-    if len(dents) == 0:
-        return ()
-
-    db = connect()
-    cursor = db.cursor()
     values = [startdate, enddate] + list(dents)
 
     format_dents = ",".join(('%s',) * len(dents))  # %s, %s, %s
@@ -1774,32 +2004,435 @@ def future_slots(startdate, enddate, dents,
 
     cursor.execute(fullquery, values)
     possible_days = cursor.fetchall()
-    cursor.close()
-    cursor = db.cursor()
+    if not possible_days:
+        return (), {}
 
     # -get days when a suitable appointment is possible
     # -flag0!=72 necessary to avoid zero length apps like pain/double/fam
 
-    query = '''select start, end from aslot
-    where adate = %%s and (apptix = %%s %s) and flag0!=72 %s order by start
-    ''' % ('' if busy_serialno is None else 'or serialno=%s',
+    query = '''select adate, apptix, serialno, start, end from aslot
+    where adate>=%%s and adate<=%%s and (apptix in (%s) %s) and flag0!=72 %s
+    order by adate, start
+    ''' % (format_dents,
+           '' if busy_serialno is None else 'or serialno=%s',
            ' and name!="emergency" ' if override_emergencies else '')
+    if busy_serialno is not None:
+        values.append(busy_serialno)
 
-    slotlist = []
-    # -now get data for those days so that we can find slots within
-    for day in possible_days:
-        adate, apptix, daystart, dayfin = day
-        values = (adate, apptix) if busy_serialno is None else (
-            adate, apptix, busy_serialno)
+    cursor.execute(query, values)
+    rows_by_date = {}
+    for adate, apptix, serialno, start, end in cursor.fetchall():
+        rows_by_date.setdefault(adate, []).append((apptix, serialno,
+                                                   start, end))
+    return possible_days, rows_by_date
 
-        cursor.execute(query, values)
-        results = cursor.fetchall()
-        slotlist += slots(adate, apptix, daystart, results, dayfin)
 
+def _day_slots(possible_days, rows_by_date, busy_serialno=None):
+    '''
+    a generator of (adate, apptix, list of FreeSlots) from the data
+    returned by _book_rows
+    '''
+    for adate, apptix, daystart, dayfin in possible_days:
+        results = [
+            (start, end) for ix, serialno, start, end in
+            rows_by_date.get(adate, ())
+            if ix == apptix or (busy_serialno is not None and
+                                serialno == busy_serialno)]
+        yield adate, apptix, slots(adate, apptix, daystart, results, dayfin)
+
+
+def future_slots(startdate, enddate, dents,
+                 busy_serialno=None, override_emergencies=False):
+    '''
+    get a list of possible appointment positions
+    (between startdate and enddate) that can be offered to the patient
+    the aslot rows for the whole range are fetched in one query, and grouped
+    by date in memory, so the cost is 2 round trips regardless of how many
+    days or clinicians are searched.
+    '''
+    if len(dents) == 0:
+        return ()
+
+    db = connect()
+    cursor = db.cursor()
+    possible_days, rows_by_date = _book_rows(
+        cursor, startdate, enddate, dents, busy_serialno,
+        override_emergencies)
     cursor.close()
+
+    slotlist = []
+    for adate, apptix, day_slots in _day_slots(possible_days, rows_by_date,
+                                               busy_serialno):
+        slotlist += day_slots
+
     return slotlist
 
 
+class _MaxTree(object):
+
+    '''
+    a segment tree of integers, answering "which is the first (or last)
+    position at or beyond i holding a value >= n" in logarithmic time.
+    '''
+
+    def __init__(self, values):
+        size = 1
+        while size < len(values):
+            size *= 2
+        self.size = size
+        self.tree = [-1] * (2 * size)
+        self.tree[size:size + len(values)] = values
+        for i in range(size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def update(self, i, value):
+        i += self.size
+        self.tree[i] = value
+        i //= 2
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def first_at_least(self, lo, minimum, node=1, left=0, right=None):
+        '''
+        the lowest index >= lo with a value >= minimum (or None)
+        '''
+        if right is None:
+            right = self.size
+        if right <= lo or self.tree[node] < minimum:
+            return None
+        if right - left == 1:
+            return left
+        mid = (left + right) // 2
+        found = self.first_at_least(lo, minimum, 2 * node, left, mid)
+        if found is None:
+            found = self.first_at_least(lo, minimum, 2 * node + 1, mid, right)
+        return found
+
+    def last_at_least(self, hi, minimum, node=1, left=0, right=None):
+        '''
+        the highest index <= hi with a value >= minimum (or None)
+        '''
+        if right is None:
+            right = self.size
+        if left > hi or self.tree[node] < minimum:
+            return None
+        if right - left == 1:
+            return left
+        mid = (left + right) // 2
+        found = self.last_at_least(hi, minimum, 2 * node + 1, mid, right)
+        if found is None:
+            found = self.last_at_least(hi, minimum, 2 * node, left, mid)
+        return found
+
+
+class ClinicianAvailability(object):
+
+    '''
+    the free intervals in one clinician's book, for each working day.
+    intervals are (start, end) tuples in minutes past midnight.
+    '''
+
+    def __init__(self, apptix, days):
+        '''
+        days is a list of (date, list of FreeSlots)
+        '''
+        self.apptix = apptix
+        self.dates = []
+        self.intervals = []
+        for adate, day_slots in sorted(days, key=lambda day: day[0]):
+            self.dates.append(adate)
+            self.intervals.append(
+                [(slot.mpm, slot.mpm_end) for slot in day_slots])
+        self.tree = _MaxTree([self.max_gap(i)
+                              for i in range(len(self.dates))])
+
+    def max_gap(self, i):
+        return max([end - start for start, end in self.intervals[i]] or [-1])
+
+    def set_day(self, adate, day_slots):
+        '''
+        replace the data for adate. returns False if adate is not a day
+        known to the index (in which case the index needs rebuilding).
+        '''
+        i = bisect.bisect_left(self.dates, adate)
+        if i == len(self.dates) or self.dates[i] != adate:
+            return not day_slots
+        self.intervals[i] = [(slot.mpm, slot.mpm_end) for slot in day_slots]
+        self.tree.update(i, self.max_gap(i))
+        return True
+
+    def fits(self, i, length, after=None):
+        '''
+        can an appointment of length be put into day i?
+        if after is given (minutes past midnight) intervals finishing before
+        this are ignored (as getLengthySlots does for today's slots).
+        '''
+        for start, end in self.intervals[i]:
+            if end - start >= length and (after is None or end > after):
+                return True
+        return False
+
+    def find_date(self, adate, length, forwards=True, excluded_days=()):
+        '''
+        the first working date (on or after adate if forwards, else on or
+        before adate) with a gap of at least length minutes
+        '''
+        today = localsettings.currentDay()
+        now = localsettings.pyTimeToMinutesPastMidnight(
+            datetime.datetime.now().time())
+        length = max(length, 1)
+        if forwards:
+            i = self.tree.first_at_least(
+                bisect.bisect_left(self.dates, adate), length)
+        else:
+            i = self.tree.last_at_least(
+                bisect.bisect_right(self.dates, adate) - 1, length)
+        while i is not None and i < len(self.dates):
+            candidate = self.dates[i]
+            if (candidate.isoweekday() not in excluded_days and
+                    (candidate != today or self.fits(i, length, now))):
+                return candidate
+            if forwards:
+                i = self.tree.first_at_least(i + 1, length)
+            else:
+                i = self.tree.last_at_least(i - 1, length)
+        return None
+
+
+class AvailabilityIndex(object):
+
+    '''
+    an in memory index of the free time in the appointment books, from today
+    until localsettings.BOOKEND, so that the scheduler can jump straight to
+    the next day on which an appointment could fit, rather than laying out
+    the diary day by day.
+    data for each clinician is loaded (with 2 queries) on first use.
+    the functions in this module which alter aslot or aday call
+    invalidate_availability, as does the diary for dates on display which
+    other clients have changed (see invalidate_changed_books). the index
+    expires after TIME_TO_LIVE seconds to pick up other changes made by
+    other clients.
+    '''
+    TIME_TO_LIVE = 300
+
+    def __init__(self, busy_serialno=None, override_emergencies=False):
+        self.busy_serialno = busy_serialno
+        self.override_emergencies = override_emergencies
+        self.created = time.time()
+        self.startdate = localsettings.currentDay()
+        self.enddate = localsettings.BOOKEND
+        self.clinicians = {}
+        self.stale_dates = set()
+
+    @property
+    def expired(self):
+        return (time.time() - self.created > self.TIME_TO_LIVE or
+                self.startdate != localsettings.currentDay())
+
+    def _fetch(self, startdate, enddate, dents):
+        db = connect()
+        cursor = db.cursor()
+        possible_days, rows_by_date = _book_rows(
+            cursor, startdate, enddate, dents, self.busy_serialno,
+            self.override_emergencies)
+        cursor.close()
+        days = dict((dent, []) for dent in dents)
+        for adate, apptix, day_slots in _day_slots(
+                possible_days, rows_by_date, self.busy_serialno):
+            days[apptix].append((adate, day_slots))
+        return days
+
+    def load(self, dents):
+        '''
+        make sure data for dents is in the index.
+        '''
+        self.refresh_stale_dates()
+        required = [dent for dent in dents if dent not in self.clinicians]
+        if not required:
+            return
+        LOGGER.debug("loading availability for clinicians %s", required)
+        for dent, days in self._fetch(self.startdate, self.enddate,
+                                      required).items():
+            self.clinicians[dent] = ClinicianAvailability(dent, days)
+
+    def invalidate(self, adate):
+        if self.startdate <= adate <= self.enddate:
+            self.stale_dates.add(adate)
+
+    def refresh_stale_dates(self):
+        dents = list(self.clinicians.keys())
+        while self.stale_dates and dents:
+            adate = self.stale_dates.pop()
+            days = self._fetch(adate, adate, dents)
+            for dent in dents:
+                if dent not in self.clinicians:
+                    continue
+                day_slots = days[dent][0][1] if days[dent] else []
+                if not self.clinicians[dent].set_day(adate, day_slots):
+                    # a new working day, reload this clinician next time.
+                    self.clinicians.pop(dent)
+        self.stale_dates.clear()
+
+    def next_date(self, adate, dents, length, forwards=True,
+                  excluded_days=()):
+        '''
+        the nearest date (on or after adate if forwards, else on or before)
+        on which at least one of dents has a gap of length minutes.
+        returns None if there is no such date before BOOKEND (or today).
+        '''
+        self.load(dents)
+        found = [self.clinicians[dent].find_date(adate, length, forwards,
+                                                 excluded_days)
+                 for dent in dents]
+        found = [date_ for date_ in found if date_ is not None]
+        if not found:
+            return None
+        return min(found) if forwards else max(found)
+
+
+_AVAILABILITY_INDEXES = {}
+
+
+def availability_index(busy_serialno=None, override_emergencies=False):
+    '''
+    return the (cached) AvailabilityIndex for these search criteria.
+    '''
+    key = (busy_serialno, override_emergencies)
+    index = _AVAILABILITY_INDEXES.get(key)
+    if index is None or index.expired:
+        if len(_AVAILABILITY_INDEXES) >= 4:
+            _AVAILABILITY_INDEXES.clear()
+        index = AvailabilityIndex(busy_serialno, override_emergencies)
+        _AVAILABILITY_INDEXES[key] = index
+    return index
+
+
+def invalidate_availability(adate=None):
+    '''
+    called whenever the books are changed.
+    if adate is None, all cached availability is discarded.
+    '''
+    if adate is None:
+        _AVAILABILITY_INDEXES.clear()
+        return
+    for index in _AVAILABILITY_INDEXES.values():
+        index.invalidate(adate)
+
+
+_LOCAL_VERSIONS = {}
+
+
+def books_changed(adate, working_days=False):
+    '''
+    called by the functions in this module which write to aslot, aday or
+    calendar.
+    bumps the local version number of adate, so that diaries in this client
+    redraw that date on their next check, and invalidates cached availability
+    (all of it if clinicians' working days may have changed).
+    '''
+    _LOCAL_VERSIONS[adate] = _LOCAL_VERSIONS.get(adate, 0) + 1
+    invalidate_availability(None if working_days else adate)
+
+
+def diary_signatures(startdate, enddate, include_slots=True):
+    '''
+    a cheap probe of the books from startdate (inclusive) to enddate.
+    returns a dictionary {(table, adate, apptix): signature}, where table is
+    one of "aday", "aslot", "calendar" or "local" (the local version number),
+    and apptix is None for data which is not specific to a book.
+    the checksums are calculated by the database server, so only a few
+    numbers per book are transferred, and nothing is transferred for unused
+    books.
+    if include_slots is False, only aday and calendar are probed.
+    '''
+    signatures = {}
+    db = connect()
+    cursor = db.cursor()
+    cursor.execute(SIGNATURE_ADAY_QUERY, (startdate, enddate))
+    for adate, apptix, checksum in cursor.fetchall():
+        signatures[("aday", adate, apptix)] = checksum
+    if include_slots:
+        cursor.execute(SIGNATURE_ASLOT_QUERY, (startdate, enddate))
+        for adate, apptix, count, checksum in cursor.fetchall():
+            signatures[("aslot", adate, apptix)] = (count, checksum)
+    try:
+        cursor.execute(SIGNATURE_CALENDAR_QUERY, (startdate, enddate))
+        for adate, checksum in cursor.fetchall():
+            signatures[("calendar", adate, None)] = checksum
+    except ProgrammingError:  # no bank holiday table - old schema.
+        pass
+    cursor.close()
+    for adate, version in _LOCAL_VERSIONS.items():
+        if startdate <= adate < enddate:
+            signatures[("local", adate, None)] = version
+    return signatures
+
+
+def changed_books(old_signatures, new_signatures):
+    '''
+    compare 2 results of diary_signatures.
+    returns the set of (table, adate, apptix) keys which have changed.
+    '''
+    return set(key for key, signature in
+               set(old_signatures.items()) ^ set(new_signatures.items()))
+
+
+def invalidate_changed_books(changed):
+    '''
+    changed is a result of changed_books.
+    discard cached availability for the dates changed by other clients
+    (changes made by this client have invalidated it already).
+    '''
+    for adate in set(adate for table, adate, apptix in changed
+                     if table != "local"):
+        invalidate_availability(adate)
+
+
+def _benchmark_joint_slot_pairs(n_clinicians=20, max_wait=10):
+    '''
+    compare joint_slot_pairs with calling wait_time for every pair,
+    using a synthetic week of fragmented books.
+    '''
+    import random
+    random.seed(0)
+    monday = datetime.date(2015, 6, 1)
+    all_slots = []
+    for day in range(7):
+        date_ = monday + datetime.timedelta(days=day)
+        for dent in range(1, n_clinicians + 1):
+            mpm = 8 * 60
+            while mpm < 18 * 60:
+                length = random.choice((10, 15, 20, 30, 45, 60, 90))
+                if random.random() < 0.5:
+                    all_slots.append(FreeSlot(
+                        datetime.datetime.combine(date_, datetime.time(
+                            mpm // 60, mpm % 60)), dent, length))
+                mpm += length
+    primary = [slot for slot in all_slots if slot.dent % 2 and
+               slot.length >= 20]
+    secondary = [slot for slot in all_slots if not slot.dent % 2 and
+                 slot.length >= 15]
+
+    start_time = time.perf_counter()
+    expected = []
+    for slot1 in primary:
+        for slot2 in secondary:
+            wait = slot1.wait_time(20, 15, slot2)
+            if wait is not None and wait <= max_wait:
+                expected.append((slot1, slot2))
+    naive_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    result = joint_slot_pairs(primary, secondary, 20, 15, max_wait)
+    indexed_time = time.perf_counter() - start_time
+
+    print("%d x %d slots, %d pairs. wait_time %.1f ms, "
+          "joint_slot_pairs %.1f ms, identical results = %s" % (
+              len(primary), len(secondary), len(result),
+              naive_time * 1000, indexed_time * 1000, result == expected))
+
+
 if __name__ == "__main__":
     '''
     test procedures......
@@ -1815,6 +2448,7 @@ if __name__ == "__main__":
 
 
     LOGGER.setLevel(logging.DEBUG)
+    _benchmark_joint_slot_pairs()
     localsettings.initiate()
 
     testdate = datetime.date(2015, 6, 1)
@@ -1834,3 +2468,33 @@ if __name__ == "__main__":
     for slot_ in d_a_d.slots(15, ignore_emergency=True):
         print("\t\t%s" % slot_)
     cancel_emergency_slot(testdate, 4, 1130, 1210)
+
+    # - benchmark future_slots against the one query per (day, clinician)
+    # - approach it replaced. needs a populated database (eg. demo).
+    from openmolar.dbtools import query_stats
+
+    def legacy_future_slots(startdate, enddate, dents):
+        cursor = connect().cursor()
+        cursor.execute('''SELECT adate, apptix, start, end FROM aday
+        WHERE adate>=%%s AND adate<=%%s AND (flag=1 OR flag= 2)
+        AND apptix in (%s) ORDER BY adate''' % ",".join(("%s",) * len(dents)),
+                       [startdate, enddate] + list(dents))
+        slotlist = []
+        for adate, apptix, daystart, dayfin in cursor.fetchall():
+            cursor.execute('''select start, end from aslot where adate = %s
+            and apptix = %s and flag0!=72 order by start''', (adate, apptix))
+            slotlist += slots(adate, apptix, daystart, cursor.fetchall(),
+                              dayfin)
+        cursor.close()
+        return slotlist
+
+    bench_dents = localsettings.activedent_ixs + localsettings.activehyg_ixs
+    bench_end = testdate + datetime.timedelta(days=31)
+    for name, func in (("per day", legacy_future_slots),
+                       ("batched", future_slots)):
+        query_stats.clear()
+        start_time = time.perf_counter()
+        result = func(testdate, bench_end, bench_dents)
+        print("%s: %d slots, %d round trips, %.1f ms" % (
+            name, len(result), len(query_stats.records()),
+            (time.perf_counter() - start_time) * 1000))
@@ -26,6 +26,7 @@ import logging
 from PyQt5 import QtCore
 
 from openmolar import connect
+from openmolar.dbtools.change_tracking import Tracked
 
 LOGGER = logging.getLogger("openmolar")
 
@@ -42,7 +43,7 @@ UPDATE_QUERY = '''replace into appt_prefs
         '''
 
 
-class ApptPrefs(object):
+class ApptPrefs(Tracked):
 
     '''
     has a tiny percentage of the footprint (and loading time) of the
@@ -51,9 +52,10 @@ class ApptPrefs(object):
     recall_active = False
     note = ""
 
-    def __init__(self, sno):
+    def __init__(self, sno, rows=None):
         '''
         initiate the class with default variables, then load from database
+        (unless rows from QUERY are passed)
         '''
         self.serialno = sno
         self.recdent_period = None
@@ -64,13 +66,16 @@ class ApptPrefs(object):
         self.note = ""
         self.recall_active = False
 
-        db = connect.connect()
-        cursor = db.cursor()
-        cursor.execute(QUERY, (self.serialno,))
-        row = cursor.fetchone()
+        if rows is None:
+            db = connect.connect()
+            cursor = db.cursor()
+            cursor.execute(QUERY, (self.serialno,))
+            rows = cursor.fetchall()
+            cursor.close()
 
-        if not row:
+        if not rows:
             return
+        row = rows[0]
 
         (self.recall_active, self.recdent_period, self.recdent,
          self.rechyg_period, self.rechyg,
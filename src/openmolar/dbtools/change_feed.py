@@ -0,0 +1,153 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+'''
+the change_feed table holds a row for every write to the locations and
+records_in_use tables, numbered by a monotonic sequence (ix).
+clients poll for rows newer than the last they have seen, and re-read
+only the serialnos concerned.
+'''
+
+import logging
+
+from openmolar import connect
+
+LOGGER = logging.getLogger("openmolar")
+
+INSERT_QUERY = \
+    'INSERT INTO change_feed (table_name, serialno) VALUES (%s, %s)'
+
+MAX_IX_QUERY = 'SELECT max(ix) FROM change_feed'
+
+# ix values are allocated before a row is committed, so concurrent writers
+# can commit out of order, and a row may appear after a higher ix is seen.
+# a row inserted more than this many seconds ago is "settled", and every
+# lower ix is assumed to be committed (all writes are single statements).
+SETTLE_TIME = 10
+
+SETTLED_MAX_IX_QUERY = '''SELECT max(ix) FROM change_feed
+WHERE time_stamp < NOW() - INTERVAL %s SECOND'''
+
+# the oldest row is always returned, so that a client can tell if rows it
+# has not seen have been pruned.
+FEED_QUERY = '''SELECT ix, table_name, serialno,
+time_stamp < NOW() - INTERVAL %s SECOND FROM change_feed
+WHERE (ix > %s AND table_name = %s)
+OR ix = (SELECT min(ix) FROM change_feed) ORDER BY ix'''
+
+# the newest row is never pruned, so the sequence cannot restart if the
+# table is emptied.
+PRUNE_QUERY = '''DELETE FROM change_feed
+WHERE time_stamp < NOW() - INTERVAL 1 DAY AND ix < %s'''
+
+
+def record_change(cursor, table_name, serialno=None):
+    '''
+    add a row to the change feed. serialno None means all rows of the table
+    may have changed.
+    '''
+    cursor.execute(INSERT_QUERY, (table_name, serialno))
+
+
+def prune():
+    '''
+    remove rows more than a day old.
+    '''
+    db = connect.connect()
+    cursor = db.cursor()
+    cursor.execute(MAX_IX_QUERY)
+    max_ix = cursor.fetchone()[0]
+    if max_ix is not None:
+        result = cursor.execute(PRUNE_QUERY, (max_ix,))
+        LOGGER.debug("pruned %s rows from the change feed", result)
+    cursor.close()
+    db.commit()
+
+
+class ChangeFeed(object):
+
+    '''
+    follows the change feed for a single table.
+    last_ix only moves past settled rows. rows above it are fetched again
+    on each poll, and those already reported (in seen) are ignored.
+    '''
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.last_ix = None
+        self.seen = set()
+
+    def reset(self):
+        self.last_ix = None
+        self.seen = set()
+
+    def changes(self):
+        '''
+        returns the set of serialnos changed since the previous call, or
+        None if the caller should re-read the whole table.
+        (on the first call, when all rows have changed, or when rows have
+        been pruned before this client saw them)
+        '''
+        db = connect.connect()
+        cursor = db.cursor()
+        if self.last_ix is None:
+            cursor.execute(SETTLED_MAX_IX_QUERY, (SETTLE_TIME,))
+            self.last_ix = cursor.fetchone()[0] or 0
+            self.seen = set()
+            cursor.close()
+            return None
+        cursor.execute(FEED_QUERY,
+                       (SETTLE_TIME, self.last_ix, self.table_name))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        re_read = bool(rows) and rows[0][0] > self.last_ix + 1
+        changes = set()
+        settled_ix = self.last_ix
+        unsettled = False
+        for ix, table_name, serialno, settled in rows:
+            if ix <= self.last_ix or table_name != self.table_name:
+                continue
+            if ix not in self.seen:
+                changes.add(serialno)
+                self.seen.add(ix)
+            if settled and not unsettled:
+                settled_ix = ix
+            else:
+                unsettled = True
+        if re_read:
+            # the whole table is re-read, so continue from the oldest row.
+            settled_ix = max(settled_ix, rows[0][0] - 1)
+        self.last_ix = settled_ix
+        self.seen = set(ix for ix in self.seen if ix > settled_ix)
+        if re_read or None in changes:
+            LOGGER.debug("change feed - all %s rows to be re-read",
+                         self.table_name)
+            return None
+        return changes
+
+
+if __name__ == "__main__":
+    feed = ChangeFeed("locations")
+    print(feed.changes())
+    print(feed.changes())
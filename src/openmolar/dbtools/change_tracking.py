@@ -0,0 +1,57 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+cheap change detection for the objects which make up a patient record.
+
+every attribute assignment on a Tracked object stamps it with a new (ever
+increasing) edit number, so whether an object has been altered since a
+snapshot was taken can be found by comparing edit numbers, rather than by
+comparing the object with a deep copy of itself.
+'''
+
+import itertools
+
+_EDITS = itertools.count(1)
+
+
+class Tracked(object):
+
+    '''
+    a mixin which records when an instance was last altered.
+    '''
+    edit_number = 0
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "edit_number", next(_EDITS))
+
+
+def edit_stamp(obj):
+    '''
+    a value which changes whenever obj is replaced or altered.
+    '''
+    if obj is None:
+        return None
+    return id(obj), obj.edit_number
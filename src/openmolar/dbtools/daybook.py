@@ -44,6 +44,17 @@ values (DATE(NOW()),%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)'''
 
 HASH_QUERY = 'insert into daybook_link (daybook_id, tx_hash) values (%s, %s)'
 
+# the last_treatment table summarises max(date) from the daybook per patient,
+# (used by the accounts table). It is maintained here.
+LAST_TX_QUERY = '''insert into last_treatment (serialno, tx_date)
+values (%s, DATE(NOW())) on duplicate key update tx_date = DATE(NOW())'''
+
+LAST_TX_DELETE_QUERY = 'delete from last_treatment where serialno=%s'
+
+LAST_TX_RECALC_QUERY = '''insert into last_treatment (serialno, tx_date)
+select serialno, max(date) from daybook where serialno=%s and date is not null
+group by serialno'''
+
 INSPECT_QUERY = '''select description, fee, ptfee
 from newestimates join est_link2 on newestimates.ix = est_link2.est_id
 where tx_hash in
@@ -75,6 +86,7 @@ UPDATE_ROW_FEES_QUERY = "update daybook set feesa=%s, feesb=%s where id=%s"
 UPDATE_ROW_FEE_QUERY = "update daybook set feesa=%s where id=%s"
 UPDATE_ROW_PTFEE_QUERY = "update daybook set feesb=%s where id=%s"
 DELETE_ROW_QUERY = "delete from daybook where id=%s"
+ROW_SERIALNO_QUERY = "select serialno from daybook where id=%s"
 
 TREATMENTS_QUERY = ('select diagn, perio, anaes, misc, ndu, ndl, '
                     'odu, odl, other, chart from daybook where id = %s')
@@ -113,6 +125,7 @@ def add(sno, cset, dent, trtid, t_dict, fee, ptfee, tx_hashes):
     cursor.execute(QUERY, values)
 
     daybook_id = db.insert_id()
+    cursor.execute(LAST_TX_QUERY, (sno,))
 
     for tx_hash in tx_hashes:
         LOGGER.debug("%s %s %s" % (HASH_QUERY, daybook_id, tx_hash))
@@ -300,7 +313,12 @@ def update_row_ptfee(id, feesb):
 def delete_row(id):
     db = connect.connect()
     cursor = db.cursor()
+    cursor.execute(ROW_SERIALNO_QUERY, (id,))
+    row = cursor.fetchone()
     result = cursor.execute(DELETE_ROW_QUERY, (id,))
+    if row:
+        cursor.execute(LAST_TX_DELETE_QUERY, row)
+        cursor.execute(LAST_TX_RECALC_QUERY, row)
     cursor.close()
     return result
 
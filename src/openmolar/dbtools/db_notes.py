@@ -27,14 +27,69 @@ module to retrieve from the new formatted_notes table
 
 from openmolar.connect import connect
 
+NOTES_QUERY = '''SELECT ndate, op1, op2, ntype, note
+from formatted_notes where serialno = %s order by ndate, ix'''
+
+TODAYS_NOTES_QUERY = '''SELECT ndate, op1, op2, ntype, note
+from formatted_notes where serialno = %s and ndate = DATE(NOW())
+order by ndate, ix'''
+
+
+# notes are loaded a page (of this many days) at a time, most recent first.
+PAGE_SIZE = 30
+
+# the notes for the most recent days (before a given (ndate, ix) if
+# OLDER_CONDITION is used). one day more than PAGE_SIZE is fetched, so that
+# split_page can tell whether there are older notes.
+NOTES_PAGE_QUERY = '''SELECT ndate, op1, op2, ntype, note, ix
+from formatted_notes where serialno = %s{0} and ndate >= (
+select min(ndate) from (select distinct ndate from formatted_notes
+where serialno = %s{0} order by ndate desc limit {1}) as recent)
+order by ndate, ix'''
+
+OLDER_CONDITION = " and (ndate < %s or (ndate = %s and ix < %s))"
+
+RECENT_NOTES_QUERY = NOTES_PAGE_QUERY.format("", PAGE_SIZE + 1)
+
+OLDER_NOTES_QUERY = NOTES_PAGE_QUERY.format(OLDER_CONDITION, PAGE_SIZE + 1)
 
-def notes(serialno, today_only=False):
-    query = '''SELECT ndate, op1, op2, ntype, note
-    from formatted_notes where serialno = %s and ndate = DATE(NOW())
-    order by ndate, ix'''
 
-    if not today_only:
-        query = query.replace("and ndate = DATE(NOW())", "")
+def split_page(rows):
+    '''
+    rows are from one of the NOTES_PAGE_QUERY queries.
+    returns (rows for get_notes_dict, (ndate, ix) of the first row or None,
+    whether older notes exist)
+    '''
+    dates = set(row[0] for row in rows)
+    has_older = len(dates) > PAGE_SIZE
+    if has_older:
+        oldest = min(dates)
+        rows = [row for row in rows if row[0] != oldest]
+    first = (rows[0][0], rows[0][5]) if rows else None
+    return [row[:5] for row in rows], first, has_older
+
+
+def notes_page(serialno, before=None):
+    '''
+    get a page of notes, the most recent PAGE_SIZE days before "before"
+    (an (ndate, ix) tuple), or the most recent days if before is None.
+    returns a tuple as split_page.
+    '''
+    db = connect()
+    cursor = db.cursor()
+    if before is None:
+        cursor.execute(RECENT_NOTES_QUERY, (serialno, serialno))
+    else:
+        ndate, ix = before
+        cursor.execute(OLDER_NOTES_QUERY,
+                       (serialno, ndate, ndate, ix) * 2)
+    rows = cursor.fetchall()
+    cursor.close()
+    return split_page(rows)
+
+
+def notes(serialno, today_only=False):
+    query = TODAYS_NOTES_QUERY if today_only else NOTES_QUERY
 
     db = connect()
     cursor = db.cursor()
@@ -73,6 +73,83 @@ INSERT_SETTING_QUERY = '''INSERT INTO settings
 UPDATE_SETTING_QUERY = '''UPDATE settings SET
 data = %s, modified_by = %s, time_stamp = NOW() where value=%s'''
 
+SETTING_QUERY = 'select data from settings where value = %s order by ix'
+
+SETTINGS_QUERY = 'select ix, value, data, time_stamp from settings order by ix'
+
+# this changes whenever a row of the settings table is inserted or updated.
+# (the checksum catches updates made within the second of max(time_stamp))
+SETTINGS_STAMP_QUERY = '''select count(*), max(ix), max(time_stamp),
+sum(crc32(concat_ws('|', value, data))) from settings'''
+
+# if False, SettingsFetcher queries the database for each key
+# (only useful for benchmarking).
+BULK_SETTINGS = True
+
+_SNAPSHOT = None
+
+
+class SettingsSnapshot(object):
+    '''
+    every row of the settings table, loaded with a single query.
+    stamp is the value of SETTINGS_STAMP_QUERY read before the rows.
+    '''
+
+    def __init__(self, rows, stamp=None):
+        self._data = {}
+        for ix, value, data, time_stamp in rows:
+            self._data.setdefault(value, []).append(data)
+        self.stamp = stamp
+
+    def get(self, key):
+        '''
+        the data for key, as rows (in the form returned by a cursor)
+        '''
+        return tuple((data,) for data in self._data.get(key, ()))
+
+
+def _fetch_stamp(cursor=None):
+    own_cursor = cursor is None
+    if own_cursor:
+        cursor = connect.connect().cursor()
+    cursor.execute(SETTINGS_STAMP_QUERY)
+    stamp = tuple(cursor.fetchone())
+    if own_cursor:
+        cursor.close()
+    return stamp
+
+
+def settings_snapshot(validate=True):
+    '''
+    a (cached) SettingsSnapshot.
+    if validate is True, the cached snapshot is checked against the database
+    (with a query returning a single row) and replaced if out of date.
+    '''
+    global _SNAPSHOT
+    try:
+        if (_SNAPSHOT is not None and validate and
+                _fetch_stamp() != _SNAPSHOT.stamp):
+            LOGGER.debug("settings have changed, reloading")
+            _SNAPSHOT = None
+        if _SNAPSHOT is None:
+            db = connect.connect()
+            cursor = db.cursor()
+            # the stamp is read first, so a change made between the two
+            # queries causes a reload rather than a stale snapshot.
+            stamp = _fetch_stamp(cursor)
+            cursor.execute(SETTINGS_QUERY)
+            _SNAPSHOT = SettingsSnapshot(cursor.fetchall(), stamp)
+            cursor.close()
+    except connect.ProgrammingError:
+        LOGGER.warning("unable to read the settings table")
+        return SettingsSnapshot(())
+    return _SNAPSHOT
+
+
+def clear_settings_snapshot():
+    global _SNAPSHOT
+    _SNAPSHOT = None
+
 
 def insert_login(opid):
     db = connect.connect()
@@ -95,6 +172,7 @@ def insertData(value, data, user=None):
     cursor = db.cursor()
     result = cursor.execute(INSERT_SETTING_QUERY, values)
     cursor.close()
+    clear_settings_snapshot()
     return result
 
 
@@ -110,6 +188,7 @@ def updateData(value, data, user=None):
     cursor = db.cursor()
     if cursor.execute(UPDATE_SETTING_QUERY, values):
         cursor.close()
+        clear_settings_snapshot()
         return True
     return insertData(value, data, user)
 
@@ -168,12 +247,23 @@ def insert_bookend(date_):
 
 
 class SettingsFetcher(object):
+    '''
+    reads settings from a SettingsSnapshot, which is validated once
+    (when first used) by each SettingsFetcher.
+    '''
 
     def __init__(self):
         self._cursor = None
+        self._snapshot = None
         self.loaded = False
         self.PT_COUNT = 0
 
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = settings_snapshot()
+        return self._snapshot
+
     @property
     def cursor(self):
         if self._cursor is None:
@@ -194,9 +284,10 @@ class SettingsFetcher(object):
         self.close_cursor()
 
     def getData(self, key):
+        if BULK_SETTINGS:
+            return self.snapshot.get(key)
         try:
-            query = 'select data from settings where value = %s order by ix'
-            self.cursor.execute(query, (key,))
+            self.cursor.execute(SETTING_QUERY, (key,))
             rows = self.cursor.fetchall()
             return rows
         except connect.ProgrammingError:
@@ -358,6 +449,34 @@ class SettingsFetcher(object):
         return [fields[0] for fields in rows]
 
 
+def _benchmark(latency=0.05, repeats=5):
+    '''
+    compare the startup settings fetch (localsettings.initiateUsers and
+    localsettings.initiate) with a query per settings key against a single
+    snapshot, adding latency (in seconds) to every round trip to simulate a
+    slow network link.
+    '''
+    global BULK_SETTINGS
+    import time
+    from openmolar.dbtools import query_stats
+
+    query_stats.SIMULATED_LATENCY = latency
+    for label, bulk in (("query per key", False), ("snapshot", True)):
+        BULK_SETTINGS = bulk
+        query_stats.clear()
+        start = time.perf_counter()
+        for i in range(repeats):
+            clear_settings_snapshot()
+            localsettings.initiateUsers()
+            localsettings.initiate()
+        elapsed = time.perf_counter() - start
+        print("%s: %d round trips, %.0f ms per startup (%d ms latency)" % (
+            label.ljust(20), len(query_stats.records()) // repeats,
+            1000 * elapsed / repeats, 1000 * latency))
+    query_stats.SIMULATED_LATENCY = 0
+    BULK_SETTINGS = True
+
+
 if __name__ == "__main__":
     sf = SettingsFetcher()
     sf.fetch()
@@ -373,3 +492,5 @@ if __name__ == "__main__":
     print(sf.account_footer)
     print(sf.debt_collector)
     print(sf.disallowed_forum_posters)
+
+    _benchmark()
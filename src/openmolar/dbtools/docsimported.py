@@ -22,27 +22,45 @@
 # ########################################################################### #
 
 import os
+import logging
 import mimetypes
 import datetime
 from openmolar import connect
+from openmolar.dbtools import document_store
+from openmolar.dbtools.query_stats import InstrumentedSSCursor
 from openmolar.settings import localsettings
 
+LOGGER = logging.getLogger("openmolar")
 
-def getData(ix):
+DOC_HASH_QUERY = 'select doc_hash from docsimported where ix=%s'
+
+# documents imported before schema 3.9 are held in this table,
+# later ones in the document store.
+LEGACY_DATA_QUERY = '''select filedata from docsimporteddata
+where masterid=%s order by ix'''
+
+
+def write_to_file(ix, filepath):
     '''
-    gets the binary data for the file from the database,
-    along with the version number
+    write the stored file to filepath.
+    the data is streamed, a chunk at a time.
     '''
     db = connect.connect()
     cursor = db.cursor()
-    query = '''select filedata from docsimporteddata where masterid=%s''' % ix
-    cursor.execute(query)
-    rows = cursor.fetchall()
+    cursor.execute(DOC_HASH_QUERY, (ix,))
+    row = cursor.fetchone()
     cursor.close()
-    if rows:
-        return rows
-    else:
-        return (("no data found",),)
+    if row and row[0] is not None:
+        document_store.copy_to_path(row[0], filepath)
+        return
+    cursor = db.cursor(InstrumentedSSCursor)
+    try:
+        cursor.execute(LEGACY_DATA_QUERY, (ix,))
+        with open(filepath, "wb") as f:
+            for row in iter(cursor.fetchone, None):
+                f.write(row[0])
+    finally:
+        cursor.close()
 
 
 def storedDocs(sno):
@@ -64,20 +82,6 @@ def storedDocs(sno):
     return docs
 
 
-def chunks_from_file(filepath, chunksize=57344):
-    '''
-    a generator to break a file into chunks
-    '''
-    f = open(filepath, "rb")
-    while True:
-        chunk = f.read(chunksize)
-        if chunk:
-            yield chunk
-        else:
-            break
-    f.close()
-
-
 def sizeof_fmt(num):
     for x in ['bytes', 'KB', 'MB', 'GB', 'TB']:
         if num < 1024.0:
@@ -90,28 +94,24 @@ def add(sno, filepath):
     add a binary file to the database (broken into chunks)
     '''
     st = os.stat(filepath)
+    doc_hash = document_store.store_file(filepath)
     db = connect.connect()
     cursor = db.cursor()
     query = '''insert into docsimported
-    (serialno, datatype, name, size, filedate) values (%s, %s, %s, %s, %s)'''
+    (serialno, datatype, name, size, filedate, doc_hash)
+    values (%s, %s, %s, %s, %s, %s)'''
     file_type = mimetypes.guess_type(filepath)[0]
     if file_type is None:
         file_type = "unknown"
     values = (sno, file_type, os.path.basename(filepath), st.st_size,
-              datetime.datetime.fromtimestamp(st.st_mtime))
+              datetime.datetime.fromtimestamp(st.st_mtime), doc_hash)
 
     cursor.execute(query, values)
-    fileid = db.insert_id()
-    query = 'INSERT INTO docsimporteddata (masterid, filedata) VALUES (%s, %s)'
-    for data in chunks_from_file(filepath):
-        values = (fileid, data)
-        cursor.execute(query, values)
-    print("added doc to importeddocs table")
+    LOGGER.info("added doc to importeddocs table")
     db.commit()
     cursor.close()
 
 
 if __name__ == "__main__":
     #- test function
-    data = getData(1)
-    print(data)
+    print(storedDocs(1))
@@ -24,6 +24,7 @@
 import logging
 
 from openmolar import connect
+from openmolar.dbtools import document_store
 from openmolar.settings import localsettings
 
 LOGGER = logging.getLogger("openmolar")
@@ -32,10 +33,13 @@ PREVIOUS_DOCS_QUERY = '''select DATE_FORMAT(printdate, '%s'), docname,
 docversion,ix from newdocsprinted where serialno=%%s order by ix DESC
 ''' % localsettings.OM_DATE_FORMAT.replace("%", "%%")
 
-GET_DATA_QUERY = 'select data, docversion from newdocsprinted where ix=%s'
+# documents printed before schema 3.9 are held in the data column,
+# later ones in the document store.
+GET_DATA_QUERY = '''select data, docversion, doc_hash from newdocsprinted
+where ix=%s'''
 
 INSERT_QUERY = '''INSERT INTO newdocsprinted
-(serialno, printdate, docname, docversion, data)
+(serialno, printdate, docname, docversion, doc_hash)
 VALUES (%s, date(NOW()), %s, %s, %s)'''
 
 
@@ -44,12 +48,34 @@ def getData(ix):
     gets the binary data for the file from the database,
     along with the version number
     '''
+    row = _get_row(ix)
+    if row is None:
+        return None
+    data, version, doc_hash = row
+    if doc_hash is not None:
+        data = document_store.read(doc_hash)
+    return data, version
+
+
+def _get_row(ix):
     db = connect.connect()
     cursor = db.cursor()
     cursor.execute(GET_DATA_QUERY, (ix,))
-    rows = cursor.fetchone()
+    row = cursor.fetchone()
     cursor.close()
-    return rows
+    return row
+
+
+def copy_to_path(ix, filepath):
+    '''
+    write the document to filepath, streaming it from the document store
+    '''
+    data, version, doc_hash = _get_row(ix)
+    if doc_hash is not None:
+        document_store.copy_to_path(doc_hash, filepath)
+    else:
+        with open(filepath, "wb") as f:
+            f.write(data)
 
 
 def previousDocs(sno):
@@ -68,9 +94,10 @@ def add(sno, docname, object_, version=1):
     '''
     add a note in the database of stuff which has been printed
     '''
+    doc_hash = document_store.store_data(object_)
     db = connect.connect()
     cursor = db.cursor()
-    values = (sno, docname, version, object_)
+    values = (sno, docname, version, doc_hash)
     LOGGER.info("adding letter to newdocsprinted table")
     cursor.execute(INSERT_QUERY, values)
     db.commit()
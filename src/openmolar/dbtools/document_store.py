@@ -0,0 +1,188 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+a content addressed store for printed and imported documents.
+
+documents are split into chunks of CHUNK_SIZE bytes. Each chunk is keyed by
+the sha1 hash of its content, so a chunk common to several documents (eg.
+repeated letters) is stored only once, and compressed if that saves space.
+A document is identified by the sha1 hash of its entire content, and
+is stored as an ordered list of chunk hashes.
+
+Data is streamed in both directions, so memory use is bounded by the chunk
+size, whatever the size of the document.
+'''
+
+import hashlib
+import logging
+import zlib
+
+from openmolar import connect
+from openmolar.dbtools.query_stats import InstrumentedSSCursor
+
+LOGGER = logging.getLogger("openmolar")
+
+# the same size as the chunks of the legacy docsimporteddata table
+CHUNK_SIZE = 57344
+
+COMPRESSION_LEVEL = 6
+
+CHUNK_EXISTS_QUERY = 'select 1 from document_chunks where chunk_hash=%s'
+
+INSERT_CHUNK_QUERY = '''insert ignore into document_chunks
+(chunk_hash, compressed, data) values (%s, %s, %s)'''
+
+DOC_EXISTS_QUERY = 'select 1 from documents where doc_hash=%s'
+
+INSERT_DOC_QUERY = '''insert ignore into documents (doc_hash, size)
+values (%s, %s)'''
+
+INSERT_CHUNK_LIST_QUERY = '''insert ignore into document_chunk_lists
+(doc_hash, seq, chunk_hash) values (%s, %s, %s)'''
+
+CHUNKS_QUERY = '''select compressed, data from document_chunk_lists
+join document_chunks
+on document_chunk_lists.chunk_hash = document_chunks.chunk_hash
+where doc_hash=%s order by seq'''
+
+
+def chunks_from_file(file_, chunksize=CHUNK_SIZE):
+    '''
+    a generator to break an open (binary) file into chunks
+    '''
+    while True:
+        chunk = file_.read(chunksize)
+        if not chunk:
+            break
+        yield chunk
+
+
+def chunks_from_bytes(data, chunksize=CHUNK_SIZE):
+    if isinstance(data, str):
+        data = data.encode("utf8")
+    for i in range(0, len(data), chunksize):
+        yield data[i:i + chunksize]
+
+
+def _put_chunk(cursor, chunk):
+    '''
+    store a chunk (unless already stored), return its hash.
+    '''
+    chunk_hash = hashlib.sha1(chunk).hexdigest()
+    if not cursor.execute(CHUNK_EXISTS_QUERY, (chunk_hash,)):
+        compressed = zlib.compress(chunk, COMPRESSION_LEVEL)
+        if len(compressed) < len(chunk):
+            values = (chunk_hash, True, compressed)
+        else:
+            values = (chunk_hash, False, chunk)
+        cursor.execute(INSERT_CHUNK_QUERY, values)
+    return chunk_hash
+
+
+def store_chunks(chunks):
+    '''
+    store a document given as an iterable of chunks (of at most CHUNK_SIZE
+    bytes), return the document's hash.
+    '''
+    doc_hash = hashlib.sha1()
+    chunk_hashes = []
+    doc_size = 0
+    db = connect.connect()
+    cursor = db.cursor()
+    for chunk in chunks:
+        doc_hash.update(chunk)
+        doc_size += len(chunk)
+        chunk_hashes.append(_put_chunk(cursor, chunk))
+    doc_hash = doc_hash.hexdigest()
+    if cursor.execute(DOC_EXISTS_QUERY, (doc_hash,)):
+        LOGGER.debug("document %s is already stored", doc_hash)
+    else:
+        cursor.executemany(
+            INSERT_CHUNK_LIST_QUERY,
+            [(doc_hash, seq, chunk_hash)
+             for seq, chunk_hash in enumerate(chunk_hashes)])
+        # the document row is written last, so a document is never listed
+        # without all of its chunks.
+        cursor.execute(INSERT_DOC_QUERY, (doc_hash, doc_size))
+    cursor.close()
+    db.commit()
+    return doc_hash
+
+
+def store_file(filepath):
+    '''
+    store the file at filepath, return its hash.
+    '''
+    with open(filepath, "rb") as f:
+        return store_chunks(chunks_from_file(f))
+
+
+def store_data(data):
+    '''
+    store bytes (or a string, encoded as utf8), return its hash.
+    '''
+    return store_chunks(chunks_from_bytes(data))
+
+
+def iter_chunks(doc_hash):
+    '''
+    a generator of the (uncompressed) chunks of the document,
+    read from the server as they are required.
+    '''
+    db = connect.connect()
+    cursor = db.cursor(InstrumentedSSCursor)
+    try:
+        cursor.execute(CHUNKS_QUERY, (doc_hash,))
+        while True:
+            row = cursor.fetchone()
+            if row is None:
+                break
+            compressed, data = row
+            yield zlib.decompress(data) if compressed else bytes(data)
+    finally:
+        cursor.close()
+
+
+def read(doc_hash):
+    '''
+    the entire document as bytes (for small documents only!)
+    '''
+    return b"".join(iter_chunks(doc_hash))
+
+
+def write_to_file(doc_hash, file_):
+    '''
+    write the document into an open (binary) file.
+    '''
+    for chunk in iter_chunks(doc_hash):
+        file_.write(chunk)
+
+
+def copy_to_path(doc_hash, filepath):
+    '''
+    write the document to filepath.
+    '''
+    with open(filepath, "wb") as f:
+        write_to_file(doc_hash, f)
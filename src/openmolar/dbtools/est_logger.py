@@ -44,27 +44,31 @@ HISTORY_QUERY = ('select est_data, operator, time_stamp '
 
 class EstLogger(object):
 
-    def __init__(self, courseno):
+    def __init__(self, courseno, rows=None):
+        '''
+        rows (from SELECT_QUERY) may be passed if already fetched.
+        '''
         self.courseno = courseno
         self.est_data = ""
-        self.get_data()
+        self.get_data(rows)
 
-    def get_data(self):
-        db = connect()
-        cursor = db.cursor()
-        LOGGER.debug(
-            'getting last estimate text from est_logger for courseno %s' % (
-                self.courseno))
+    def get_data(self, rows=None):
+        if rows is None:
+            db = connect()
+            cursor = db.cursor()
+            LOGGER.debug(
+                'getting last estimate text from est_logger for courseno %s' %
+                (self.courseno))
 
-        cursor.execute(SELECT_QUERY, (self.courseno,))
+            cursor.execute(SELECT_QUERY, (self.courseno,))
+            rows = cursor.fetchall()
+            cursor.close()
 
         try:
-            self.est_data = cursor.fetchone()[0]
-        except TypeError:
+            self.est_data = rows[0][0]
+        except IndexError:
             pass
 
-        cursor.close()
-
     def add_row(self, courseno, est_data):
         '''
         add a row to the daybook table, and save state.
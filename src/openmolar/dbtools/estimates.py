@@ -66,16 +66,17 @@ on daybook.id = daybook_link.daybook_id where id=%s)''',
 ]
 
 
-def get_ests(serialno, courseno):
+def get_ests(serialno, courseno, rows=None):
     '''
     get estimate data
+    rows (from ESTS_QUERY) may be passed if already fetched.
     '''
-    db = connect.connect()
-    cursor = db.cursor()
-
-    cursor.execute(ESTS_QUERY, (serialno, courseno))
-
-    rows = cursor.fetchall()
+    if rows is None:
+        db = connect.connect()
+        cursor = db.cursor()
+        cursor.execute(ESTS_QUERY, (serialno, courseno))
+        rows = cursor.fetchall()
+        cursor.close()
     ests = []
 
     for row in rows:
@@ -113,7 +114,6 @@ def get_ests(serialno, courseno):
         est.tx_hashes = [tx_hash]
         ests.append(est)
 
-    cursor.close()
     return ests
 
 
@@ -47,6 +47,28 @@ values (%s, %s, NOW())'''
 UNREAD_POSTS_QUERY = '''select count(*) from forum where open and ix not in
 (select id from forumread where op=%s)'''
 
+UNREAD_COUNTER_QUERY = "select unread from forum_unread where op=%s"
+
+UNREAD_COUNTER_INSERT_QUERY = '''insert into forum_unread (op, unread)
+values (%s, %s) on duplicate key update unread=values(unread)'''
+
+UNREAD_COUNTER_NEW_POST_QUERY = '''update forum_unread set unread=unread+1
+where not op <=> %s'''
+
+UNREAD_COUNTER_CHANGE_QUERY = '''update forum_unread
+set unread=greatest(unread + %s, 0) where op=%s'''
+
+UNREAD_COUNTER_ARCHIVE_QUERY = '''update forum_unread set unread=unread-1
+where unread > 0 and not exists
+(select id from forumread where forumread.op=forum_unread.op and id=%s)'''
+
+NEWLY_READ_QUERY = '''select ix, open from forum where ix in (%s)
+and ix not in (select id from forumread where op=%%s)'''
+
+ARCHIVE_QUERY = "update forum set open=False where ix=%s and open"
+
+IS_OPEN_QUERY = "select open from forum where ix=%s"
+
 INSERT_QUERY = '''
 insert into forum (inits, recipient, fdate, topic, comment)
 VALUES (%s, %s, NOW(), %s, %s)'''
@@ -99,12 +121,41 @@ def is_fully_read():
 
 
 def number_of_unread_posts(user):
+    '''
+    the number of open posts the user has not read.
+    read from the forum_unread counter, which is initialised (with the
+    slower anti-join) the first time a user is checked.
+    '''
     db = connect.connect()
     cursor = db.cursor()
+    if cursor.execute(UNREAD_COUNTER_QUERY, (user,)):
+        unread_posts = cursor.fetchone()[0]
+    else:
+        unread_posts = _recount(cursor, user)
+        db.commit()
+    cursor.close()
+    LOGGER.debug("%s has %s unread posts", user, unread_posts)
+    return unread_posts
+
+
+def _recount(cursor, user):
     cursor.execute(UNREAD_POSTS_QUERY, (user,))
     unread_posts = cursor.fetchone()[0]
+    cursor.execute(UNREAD_COUNTER_INSERT_QUERY, (user, unread_posts))
+    return unread_posts
+
+
+def recount_unread_posts(user):
+    '''
+    recalculate the unread counter for user from forumread.
+    called when the user forces a refresh of the forum, so that a counter
+    which has drifted is corrected.
+    '''
+    db = connect.connect()
+    cursor = db.cursor()
+    unread_posts = _recount(cursor, user)
     cursor.close()
-    LOGGER.debug("%s has %s unread posts", user, unread_posts)
+    db.commit()
     return unread_posts
 
 
@@ -123,15 +174,19 @@ def commitPost(post):
         cursor.execute(INSERT_PARENT_QUERY, (ix, post.parent_ix))
         cursor.execute(ANCESTORS_QUERY, (ix,))
     cursor.execute(READPOSTS_UPDATE_QUERY, (post.inits, ix))
+    cursor.execute(UNREAD_COUNTER_NEW_POST_QUERY, (post.inits,))
     db.commit()
     return ix
 
 
 def deletePost(ix):
+    '''
+    archive a post. users who had not read it have one less unread post.
+    '''
     db = connect.connect()
     cursor = db.cursor()
-    query = "update forum set open=False where ix=%s"
-    cursor.execute(query, (ix,))
+    if cursor.execute(ARCHIVE_QUERY, (ix,)):
+        cursor.execute(UNREAD_COUNTER_ARCHIVE_QUERY, (ix,))
     db.commit()
     cursor.close()
 
@@ -148,12 +203,25 @@ def setParent(child_id, new_parent_ix):
 
 
 def update_forum_read(user, read_ids):
+    '''
+    mark posts as read by user.
+    posts already marked as read are ignored, and the user's unread counter
+    is reduced by the number of open posts newly read.
+    '''
     if not read_ids:
         return
+    read_ids = list(read_ids)
     db = connect.connect()
     cursor = db.cursor()
-    cursor.executemany(READPOSTS_UPDATE_QUERY,
-                       [(user, id_) for id_ in read_ids])
+    cursor.execute(NEWLY_READ_QUERY % ", ".join(["%s"] * len(read_ids)),
+                   read_ids + [user])
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany(READPOSTS_UPDATE_QUERY,
+                           [(user, ix) for ix, open_ in rows])
+        n_open = len([ix for ix, open_ in rows if open_])
+        if n_open:
+            cursor.execute(UNREAD_COUNTER_CHANGE_QUERY, (-n_open, user))
     cursor.close()
     db.commit()
 
@@ -161,7 +229,11 @@ def update_forum_read(user, read_ids):
 def mark_as_unread(user, id):
     db = connect.connect()
     cursor = db.cursor()
-    cursor.execute(READPOSTS_UNREAD_QUERY, (user, id))
+    if cursor.execute(READPOSTS_UNREAD_QUERY, (user, id)):
+        cursor.execute(IS_OPEN_QUERY, (id,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            cursor.execute(UNREAD_COUNTER_CHANGE_QUERY, (1, user))
     cursor.close()
     db.commit()
 
@@ -188,19 +260,33 @@ def get_read_post_ids(user):
     cursor.close()
 
 
-def getPosts(user, include_closed=False):
+def getPosts(user, include_closed=False, since_ix=0):
     '''
     gets all active rows from a forum table
+    if since_ix is given, only posts with a higher ix are returned.
     '''
-    query = QUERY % (("", "") if include_closed else ('AND open', 'WHERE open'))
+    join_conditions, conditions = [], []
+    if not include_closed:
+        join_conditions.append("open")
+        conditions.append("open")
+    if since_ix:
+        join_conditions.append("child_id > %s")
+        conditions.append("ix > %s")
+    join_clause = "".join(["AND %s " % c for c in join_conditions])
+    where_clause = "WHERE %s" % " AND ".join(conditions) if conditions else ""
+    query = QUERY % (join_clause, where_clause)
+    values = [since_ix] if since_ix else []
+    values.append(user)
+    if since_ix:
+        values.append(since_ix)
+
     db = connect.connect()
     cursor = db.cursor()
-    cursor.execute(query, (user,))
+    cursor.execute(query, values)
     rows = cursor.fetchall()
     cursor.close()
 
     retarg = []
-    update = False
     for row in rows:
         newpost = ForumPost()
         newpost.ix = row[0]
@@ -26,49 +26,118 @@ tools to access the locations table
 (which is a record of where patients are eg. "waiting room")
 '''
 
+import re
+
 from openmolar import connect
+from openmolar.dbtools import change_feed
 
 QUERY = "SELECT serialno, location FROM locations"
-WAIT_QUERY = "SELECT serialno FROM locations WHERE location NOT REGEXP '[0-9]'"
+CHANGED_QUERY = '''SELECT serialno, location FROM locations
+WHERE serialno IN (%s)'''
 
+UPDATE_QUERY = 'REPLACE into locations (serialno, location) values (%s, %s)'
+DELETE_QUERY = 'DELETE FROM locations WHERE serialno=%s'
+DELETE_ALL_QUERY = 'DELETE FROM locations'
 
-def all_snos():
-    db = connect.connect()
-    cursor = db.cursor()
-    if cursor.execute(QUERY):
-        values = [serialno for serialno, location in cursor.fetchall()]
-    else:
-        values = ()
-    cursor.close()
-    return values
 
+class LocationMonitor(object):
+
+    '''
+    a local copy of the locations table, kept current by following the
+    change feed, so that only the rows of patients who have moved are read.
+    '''
+
+    def __init__(self):
+        self.feed = change_feed.ChangeFeed("locations")
+        self._locations = {}
 
-def no_of_patients_waiting():
+    def refresh(self):
+        changes = self.feed.changes()
+        if changes is None:
+            self._locations = dict(_read_locations(QUERY))
+        elif changes:
+            for sno in changes:
+                self._locations.pop(sno, None)
+            query = CHANGED_QUERY % ", ".join(["%s"] * len(changes))
+            self._locations.update(_read_locations(query, tuple(changes)))
 
+    def reset(self):
+        self.feed.reset()
+        self._locations = {}
+
+    def locations(self):
+        self.refresh()
+        return dict(self._locations)
+
+
+_MONITOR = LocationMonitor()
+
+
+def _read_locations(query, values=()):
     db = connect.connect()
     cursor = db.cursor()
-    if cursor.execute(WAIT_QUERY):
-        values = [row[0] for row in cursor.fetchall()]
-    else:
-        values = ()
+    cursor.execute(query, values)
+    rows = cursor.fetchall()
     cursor.close()
-    return values
+    return rows
+
+
+def all_snos():
+    return list(locations().keys())
+
+
+def no_of_patients_waiting(patient_locations=None):
+    '''
+    the serialnos of patients who are not in a (numbered) surgery
+    '''
+    if patient_locations is None:
+        patient_locations = locations()
+    return [sno for sno, location in patient_locations.items()
+            if location is not None and not re.search("[0-9]", location)]
 
 
 def locations():
     '''
-    query the database locations table, and return a dictionary of key:value
-    pairs serialno:location
+    return a dictionary of key:value pairs serialno:location
+    the database is only read for patients whose location has changed since
+    the last call.
     '''
-    location_dict = {}
+    return _MONITOR.locations()
+
+
+def reset_monitor():
+    '''
+    forget the local copy, so that the next call to locations reads the
+    whole table. (called when the server is changed)
+    '''
+    _MONITOR.reset()
+
+
+def set_location(serialno, location):
     db = connect.connect()
     cursor = db.cursor()
-    cursor.execute(QUERY)
-    for key, value in cursor.fetchall():
-        location_dict[key] = value
+    cursor.execute(UPDATE_QUERY, (serialno, location))
+    change_feed.record_change(cursor, "locations", serialno)
     cursor.close()
+    db.commit()
 
-    return location_dict
+
+def clear_location(serialno):
+    db = connect.connect()
+    cursor = db.cursor()
+    if cursor.execute(DELETE_QUERY, (serialno,)):
+        change_feed.record_change(cursor, "locations", serialno)
+    cursor.close()
+    db.commit()
+
+
+def clear_all_locations():
+    db = connect.connect()
+    cursor = db.cursor()
+    cursor.execute(DELETE_ALL_QUERY)
+    change_feed.record_change(cursor, "locations")
+    cursor.close()
+    db.commit()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+an in-memory, least recently used, cache of the data from which
+patient_class.patient objects are built.
+
+entries are stored with a "stamp" (a tuple of checksums calculated by the
+database server) and are only returned if the caller presents the same
+stamp, so a record changed by any client is never served from the cache.
+(notes are stamped by their count, the highest ix, and a checksum of
+today's notes, which are the only notes ever edited.)
+the raw rows are cached rather than patient objects, as the gui alters the
+patient it is working on.
+'''
+
+from collections import OrderedDict
+import logging
+import threading
+
+LOGGER = logging.getLogger("openmolar")
+
+# the maximum number of patients held.
+MAX_RECORDS = 30
+
+# the maximum number of rows held (notes for a long standing patient can
+# run to thousands of rows).
+MAX_ROWS = 20000
+
+
+class PatientCache(object):
+    '''
+    a thread safe lru cache of {serialno: data}, bounded by both the number
+    of patients and the total number of rows held.
+    '''
+
+    def __init__(self, max_records=MAX_RECORDS, max_rows=MAX_ROWS):
+        self.max_records = max_records
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.n_rows = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, serialno):
+        return serialno in self._entries
+
+    def get(self, serialno, stamp):
+        '''
+        the data cached for serialno, or None if there is none or it was
+        cached with a different stamp.
+        '''
+        with self._lock:
+            entry = self._entries.get(serialno)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(serialno)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, serialno, stamp, data):
+        n_rows = sum(len(rows) for rows in data.values())
+        with self._lock:
+            self._discard(serialno)
+            if n_rows > self.max_rows:
+                return
+            self._entries[serialno] = (stamp, data, n_rows)
+            self.n_rows += n_rows
+            while (len(self._entries) > self.max_records or
+                   self.n_rows > self.max_rows):
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, serialno):
+        entry = self._entries.pop(serialno, None)
+        if entry is not None:
+            self.n_rows -= entry[2]
+
+    def discard(self, serialno):
+        with self._lock:
+            self._discard(serialno)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.n_rows = 0
+
+    def __repr__(self):
+        return "PatientCache %d records, %d rows, %d hits, %d misses" % (
+            len(self), self.n_rows, self.hits, self.misses)
+
+
+CACHE = PatientCache()
@@ -33,13 +33,21 @@ import sys
 
 from openmolar import connect
 from openmolar.ptModules import dec_perm, formatted_notes
+from openmolar.ptModules.estimates import EstimateList
 from openmolar.settings import localsettings
 
+from openmolar.dbtools import appt_prefs
 from openmolar.dbtools.appt_prefs import ApptPrefs
+from openmolar.dbtools import treatment_course
 from openmolar.dbtools.treatment_course import TreatmentCourse
+from openmolar.dbtools import plan_data
 from openmolar.dbtools.plan_data import PlanData
+from openmolar.dbtools import est_logger
 from openmolar.dbtools.est_logger import EstLogger
 from openmolar.dbtools import estimates as db_estimates
+from openmolar.dbtools import change_tracking
+from openmolar.dbtools import db_notes
+from openmolar.dbtools import patient_cache
 from openmolar.dbtools import records_in_use
 
 from openmolar.dbtools.queries import (
@@ -105,6 +113,12 @@ decidmouth = ['***', '***', '***', 'ulE', 'ulD', 'ulC', 'ulB', 'ulA',
 
 clinical_memos = ("synopsis",)
 
+# attributes which are altered in place (rather than replaced) during editing.
+# these are copied into pt.dbstate by take_snapshot, and checked for changes
+# using their edit stamps.
+STRUCTURED_ATTRIBUTES = ("bpe", "estimates", "appt_prefs",
+                         "treatment_course", "chartgrid")
+
 _atts = []
 for att in PATIENT_QUERY_FIELDS:
     if re.match(r"[ul][lr]\d$", att):
@@ -113,6 +127,209 @@ for att in PATIENT_QUERY_FIELDS:
         _atts.append(att)
 patient_query_atts = tuple(_atts)
 
+COPIED_ATTRIBUTES = (patient_query_atts + exemptionTableAtts + bpeTableAtts +
+                     clinical_memos + ("fees", "estimate_charges", "serialno",
+                                       "estimates", "appt_prefs",
+                                       "treatment_course", "chartgrid"))
+
+_COPIED_ATTRIBUTE_ORDER = dict(
+    (att, i) for i, att in enumerate(COPIED_ATTRIBUTES))
+
+EXEMPTIONS_QUERY = '''select exemption, exempttext from exemptions
+where serialno=%s'''
+
+BPE_QUERY = '''select bpedate, bpe from bpe where serialno=%s
+order by bpedate'''
+
+LAST_DAYBOOK_QUERY = 'select max(date) from daybook where serialno=%s'
+
+FIRST_NOTE_QUERY = 'select min(ndate) from formatted_notes where serialno=%s'
+
+FAMILY_MEMBERS_QUERY = FAMILY_COUNT_QUERY.replace(
+    "familyno=%s",
+    "familyno=(select familyno from new_patients where serialno=%s)")
+
+COURSENO_SUBQUERY = \
+    "courseno=(select courseno0 from new_patients where serialno=%s)"
+
+# everything needed to load a patient, fetched by bulk_fetch as one
+# multi-statement query. every placeholder is the patient's serialno.
+BULK_QUERIES = (
+    ("synopsis", SYNOPSIS_QUERY),
+    ("patient", PATIENT_QUERY),
+    ("exemptions", EXEMPTIONS_QUERY),
+    ("bpe", BPE_QUERY),
+    ("estimates",
+     db_estimates.ESTS_QUERY.replace("courseno=%s", COURSENO_SUBQUERY)),
+    ("est_logger",
+     est_logger.SELECT_QUERY.replace("courseno=%s", COURSENO_SUBQUERY)),
+    ("treatment_course",
+     treatment_course.QUERY.replace("courseno=%s", COURSENO_SUBQUERY)),
+    ("notes", db_notes.RECENT_NOTES_QUERY),
+    ("medhist", QUICK_MED_QUERY),
+    ("medform", MED_FORM_QUERY + " limit 1"),
+    ("plandata", plan_data.QUERY),
+    ("appt_prefs", appt_prefs.QUERY),
+    ("exam_booked", FUTURE_EXAM_QUERY),
+    ("family_members", FAMILY_MEMBERS_QUERY),
+    ("previous_surnames", PSN_QUERY),
+    ("last_daybook", LAST_DAYBOOK_QUERY),
+)
+
+
+def _split_columns(columns):
+    '''
+    split a select list on the commas which are not within brackets.
+    '''
+    split, depth, start = [], 0, 0
+    for i, char in enumerate(columns):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            split.append(columns[start:i].strip())
+            start = i + 1
+    split.append(columns[start:].strip())
+    return split
+
+
+def _stamp_subquery(query):
+    '''
+    convert one of BULK_QUERIES into a subquery returning a single value
+    which changes whenever the rows returned by the query change.
+    concat_ws skips NULLs, so each column is passed through quote(), which
+    gives the word NULL for a NULL and a quoted string for anything else.
+    every column then keeps its place, and NULL differs from ''.
+    '''
+    columns, tables = re.match(
+        r"select\s+(.*?)\s+from\s+(.*)", query, re.I | re.S).groups()
+    tables = re.sub(r"\s+(order by|limit)\s.*$", "", tables,
+                    flags=re.I | re.S)
+    if re.match(r"(count|max|min)\(", columns, re.I):
+        return "select %s from %s" % (columns, tables)
+    columns = ", ".join("quote(%s)" % column
+                        for column in _split_columns(columns))
+    return "select concat_ws('|', count(*), sum(crc32(concat_ws('|', %s)))) " \
+        "from %s" % (columns, tables)
+
+
+# notes are appended, and only today's notes are ever edited (see
+# alter_todays_notes), so they are stamped by count(*), max(ix) and a
+# checksum of today's notes, all read from the (serialno, ndate) index,
+# rather than by checksumming the patient's whole history.
+NOTES_STAMP_QUERY = '''select concat_ws('|', count(*), max(ix),
+(select sum(crc32(note)) from formatted_notes
+where serialno = %s and ndate = CURDATE()))
+from formatted_notes where serialno = %s'''
+
+# a checksum of everything returned by BULK_QUERIES, used to validate the
+# patient cache with a single (small) row.
+STAMP_QUERY = "select %s" % ",\n".join(
+    "(%s)" % (NOTES_STAMP_QUERY if name == "notes" else
+              _stamp_subquery(query))
+    for name, query in BULK_QUERIES)
+
+# set to False if the server refuses multi-statement queries.
+MULTI_STATEMENTS = True
+
+# the error returned by a server which does not accept multi-statement
+# queries, as it parses the combined query as one statement.
+ER_PARSE_ERROR = 1064
+
+
+def _values(serialno, queries):
+    '''
+    the values for executing queries, in order.
+    every placeholder in these queries is the patient's serialno.
+    '''
+    values = ()
+    for name, query in queries:
+        values += (serialno,) * query.count("%s")
+    return values
+
+
+def fetch_stamp(serialno):
+    '''
+    the current value of STAMP_QUERY for a patient.
+    '''
+    db = connect.connect()
+    cursor = db.cursor()
+    cursor.execute(STAMP_QUERY, _values(serialno, (("stamp", STAMP_QUERY),)))
+    stamp = cursor.fetchone()
+    cursor.close()
+    return stamp
+
+
+def bulk_fetch(serialno, use_cache=True):
+    '''
+    fetch all the data needed to load a patient.
+    returns a dictionary {name: rows} with a key for each of BULK_QUERIES.
+    if the patient is in patient_cache, and unchanged since it was cached,
+    the only query is for the stamp.
+    '''
+    if use_cache and serialno in patient_cache.CACHE:
+        data = patient_cache.CACHE.get(serialno, fetch_stamp(serialno))
+        if data is not None:
+            return data
+    queries = BULK_QUERIES + (("stamp", STAMP_QUERY),)
+    data = _fetch(serialno, queries)
+    stamp = data.pop("stamp")[0]
+    if use_cache and data["patient"]:
+        patient_cache.CACHE.put(serialno, stamp, data)
+    return data
+
+
+def _fetch(serialno, queries):
+    '''
+    execute queries in a single round trip, returning {name: rows}.
+    if multi-statement queries are not allowed, this falls back to executing
+    the queries one at a time.
+    '''
+    global MULTI_STATEMENTS
+    db = connect.connect()
+    refused = False
+    if MULTI_STATEMENTS:
+        query = ";\n".join(query for name, query in queries)
+        cursor = db.cursor()
+        try:
+            cursor.execute(query, _values(serialno, queries))
+            results = {}
+            for name, sql in queries:
+                results[name] = cursor.fetchall()
+                cursor.nextset()
+            return results
+        except connect.ProgrammingError as exc:
+            if exc.args[0] != ER_PARSE_ERROR:
+                raise
+            refused = True
+        finally:
+            cursor.close()
+    results = {}
+    cursor = db.cursor()
+    for name, query in queries:
+        cursor.execute(query, _values(serialno, ((name, query),)))
+        results[name] = cursor.fetchall()
+    cursor.close()
+    # a parse error in one of the queries would have been raised above.
+    if refused:
+        LOGGER.warning("multi-statement queries are not allowed - "
+                       "patients will be fetched with separate queries")
+        MULTI_STATEMENTS = False
+    return results
+
+
+def prefetch(serialnos):
+    '''
+    warm the patient cache with the records of serialnos.
+    '''
+    for serialno in serialnos:
+        try:
+            bulk_fetch(serialno)
+        except Exception:
+            LOGGER.warning("unable to prefetch patient %s", serialno,
+                           exc_info=True)
+
 
 class patient(object):
 
@@ -125,6 +342,9 @@ class patient(object):
         '''
         self.serialno = sno
         self.dbstate = None
+        self._touched = None
+        self._edit_stamps = {}
+        self._record_locked = None
 
         self.load_warnings = []
 
@@ -242,6 +462,8 @@ class patient(object):
         self.bpedate = nullDate
         self.chartdate = nullDate
         self.notes_dict = {}
+        self.notes_cursor = None
+        self.has_older_notes = False
         self.MEDALERT = False
         self.mh_chkdate = None
         self.mh_form_date = None
@@ -266,15 +488,13 @@ class patient(object):
         #
         # now load stuff from the database ##
         #
-        db = connect.connect()
-        cursor = db.cursor()
-
-        self.getSynopsis()
+        data = bulk_fetch(self.serialno)
 
-        cursor.execute(PATIENT_QUERY, (self.serialno,))
-        values = cursor.fetchall()
+        if data["synopsis"]:
+            self.synopsis = data["synopsis"][-1][0]
 
-        if values == ():
+        values = data["patient"]
+        if not values:
             raise localsettings.PatientNotFoundError
 
         for i, att_ in enumerate(patient_query_atts):
@@ -284,54 +504,60 @@ class patient(object):
             elif att_ == "familyno":
                 self.familyno = 0
 
-        query = '''select exemption, exempttext from exemptions
-        where serialno=%s'''
-        cursor.execute(query, (self.serialno,))
-
-        values = cursor.fetchall()
-
-        for value in values:
+        for value in data["exemptions"]:
             self.exemption, self.exempttext = value
 
-        query = '''select bpedate, bpe from bpe where serialno=%s
-        order by bpedate'''
-        cursor.execute(query, (self.serialno,))
-
-        values = cursor.fetchall()
-
-        for value in values:
+        for value in data["bpe"]:
             self.bpe.append(value)
 
         if self.courseno0 != 0:
-            self.getEsts()
+            self.estimates = db_estimates.get_ests(
+                self.serialno, self.courseno0, data["estimates"])
+            self.est_logger = EstLogger(self.courseno0, data["est_logger"])
 
         self.treatment_course = TreatmentCourse(
-            self.serialno, self.courseno0)
+            self.serialno, self.courseno0, data["treatment_course"])
 
-        self.getNotesTuple()
+        self._set_notes_page(db_notes.split_page(data["notes"]))
 
-        cursor.execute(QUICK_MED_QUERY, (self.serialno,))
         try:
-            self.MEDALERT, self.mh_chkdate = cursor.fetchone()
-        except TypeError:
+            self.MEDALERT, self.mh_chkdate = data["medhist"][0]
+        except IndexError:
             pass
 
-        cursor.execute(MED_FORM_QUERY + " limit 1", (self.serialno,))
         try:
-            self.mh_form_date = cursor.fetchone()[0]
-        except TypeError:
+            self.mh_form_date = data["medform"][0][0]
+        except IndexError:
             pass
-        cursor.close()
 
         # - load from plandata
-        self.plandata.getFromDB()
+        self.plandata.getFromDB(data["plandata"])
+
+        self.appt_prefs = ApptPrefs(self.serialno, data["appt_prefs"])
 
-        self.appt_prefs = ApptPrefs(self.serialno)
+        # prime values which would otherwise be fetched lazily.
+        self._has_exam_booked = bool(data["exam_booked"][0][0])
+        if self.familyno:
+            self._n_family_members = data["family_members"][0][0]
+        self._previous_surnames = [row[0] for row in
+                                   data["previous_surnames"]]
+        if data["last_daybook"][0][0] is not None:
+            self._most_recent_daybook_entry = data["last_daybook"][0][0]
+        if self.notes_dict and not self.has_older_notes:
+            self._first_note_date = next(iter(self.notes_dict))[0]
 
         self.updateChartgrid()
 
         self.take_snapshot()
 
+    def __setattr__(self, name, value):
+        if name == "estimates" and not isinstance(value, EstimateList):
+            value = EstimateList(value)
+        object.__setattr__(self, name, value)
+        touched = self.__dict__.get("_touched")
+        if touched is not None and name in _COPIED_ATTRIBUTE_ORDER:
+            touched.add(name)
+
     @property
     def appt_memo(self):
         return self.appt_prefs.note
@@ -370,8 +596,7 @@ class patient(object):
         if self._most_recent_daybook_entry is None:
             db = connect.connect()
             cursor = db.cursor()
-            query = 'select max(date) from daybook where serialno=%s'
-            if cursor.execute(query, (self.serialno,)):
+            if cursor.execute(LAST_DAYBOOK_QUERY, (self.serialno,)):
                 max_date = cursor.fetchone()[0]
             cursor.close()
             self._most_recent_daybook_entry = max_date
@@ -386,8 +611,7 @@ class patient(object):
             min_date = localsettings.currentDay()
             db = connect.connect()
             cursor = db.cursor()
-            query = 'select min(ndate) from formatted_notes where serialno=%s'
-            if cursor.execute(query, (self.serialno,)):
+            if cursor.execute(FIRST_NOTE_QUERY, (self.serialno,)):
                 min_date = cursor.fetchone()[0]
             cursor.close()
             self._first_note_date = min_date \
@@ -585,8 +809,46 @@ class patient(object):
     def getNotesTuple(self):
         '''
         connect and poll the formatted_notes table
+        (the most recent page of notes is loaded, plus any older pages which
+        were loaded before)
+        '''
+        oldest = None if self.notes_cursor is None else self.notes_cursor[0]
+        self._set_notes_page(db_notes.notes_page(self.serialno))
+        if oldest is not None:
+            self.load_notes_since(oldest)
+
+    def _set_notes_page(self, page, older=False):
+        '''
+        page is as returned by db_notes.split_page
         '''
-        self.notes_dict = formatted_notes.get_notes_dict(self.serialno)
+        rows, cursor, self.has_older_notes = page
+        notes_dict = formatted_notes.get_notes_dict(self.serialno, rows=rows)
+        if older:
+            notes_dict.update(self.notes_dict)
+        if cursor is not None:
+            self.notes_cursor = cursor
+        self.notes_dict = notes_dict
+
+    def load_older_notes(self):
+        '''
+        load the page of notes before those already loaded.
+        '''
+        if self.has_older_notes:
+            self._set_notes_page(
+                db_notes.notes_page(self.serialno, self.notes_cursor), True)
+
+    def load_all_notes(self):
+        while self.has_older_notes:
+            self.load_older_notes()
+
+    def load_notes_since(self, date_):
+        '''
+        load older pages of notes until every note on or after date_ is in
+        notes_dict. (pages hold whole days)
+        '''
+        while (self.has_older_notes and self.notes_cursor is not None and
+               self.notes_cursor[0] > date_):
+            self.load_older_notes()
 
     def flipDec_Perm(self, tooth):
         '''
@@ -634,6 +896,8 @@ class patient(object):
                 self.chartgrid[pos] = pos
             else:
                 self.chartgrid[pos] = decidmouth[mouth.index(pos)]
+        if self._touched is not None:
+            self._touched.add("chartgrid")
 
     def apply_fees(self):
         '''
@@ -907,10 +1171,7 @@ class patient(object):
         '''
         these are what is copied over into pt.dbstate
         '''
-        return (patient_query_atts + exemptionTableAtts + bpeTableAtts +
-                clinical_memos + ("fees", "estimate_charges", "serialno",
-                                  "estimates", "appt_prefs",
-                                  "treatment_course", "chartgrid"))
+        return COPIED_ATTRIBUTES
 
     @property
     def USER_CHANGEABLE_ATTRIBUTES(self):
@@ -923,13 +1184,33 @@ class patient(object):
             # if att_ not in ("treatment_course", "estimates", "chartgrid"):
             yield att_
 
+    def current_edit_stamps(self):
+        '''
+        values which change whenever one of the STRUCTURED_ATTRIBUTES is
+        altered in place.
+        (chartgrid is only ever altered by updateChartgrid, which marks it)
+        '''
+        return {
+            "bpe": (id(self.bpe), len(self.bpe)),
+            "estimates": tuple(est.edit_stamp for est in self.estimates),
+            "appt_prefs": change_tracking.edit_stamp(self.appt_prefs),
+            "treatment_course":
+            change_tracking.edit_stamp(self.treatment_course),
+        }
+
     @property
     def changes(self):
         '''
         what has changed since the patient was loaded
+        only attributes which have been set, or altered in place, since
+        take_snapshot are compared.
         '''
+        candidates = set(self._touched)
+        for att_, stamp in self.current_edit_stamps().items():
+            if stamp != self._edit_stamps.get(att_):
+                candidates.add(att_)
         changes = []
-        for att_ in self.USER_CHANGEABLE_ATTRIBUTES:
+        for att_ in sorted(candidates, key=_COPIED_ATTRIBUTE_ORDER.get):
             new_value = self.__dict__.get(att_, "")
             db_value = self.dbstate.__dict__.get(att_, "")
             if new_value != db_value:
@@ -939,27 +1220,37 @@ class patient(object):
                         " ORIG = '%s' NEW = '%s'" % (db_value, new_value))
                 LOGGER.debug(message)
                 changes.append(att_)
+            elif att_ in self._touched:
+                # the attribute has been changed back.
+                self._touched.discard(att_)
         return changes
 
     @property
     def has_changes(self):
         is_changed = self.changes != []
-        self.lock_record_in_use() if is_changed else self.clear_lock()
+        if is_changed != self._record_locked:
+            self.lock_record_in_use() if is_changed else self.clear_lock()
         return is_changed
 
     def take_snapshot(self):
         '''
-        create a snapshot of this class, copying all attributes that the
-        user can change
+        create a snapshot of this class, for comparison when saving changes.
+        attributes which are replaced when edited are shared with the
+        snapshot, only the STRUCTURED_ATTRIBUTES are (deep) copied.
         '''
-        memo = {}
         cls = self.__class__
         snapshot = cls.__new__(cls)
-        memo[id(self)] = snapshot
-        for att_, val_ in list(self.__dict__.items()):
-            if att_ in self.COPIED_ATTRIBUTES:
-                setattr(snapshot, att_, deepcopy(val_, memo))
+        memo = {id(self): snapshot}
+        for att_ in self.COPIED_ATTRIBUTES:
+            if att_ not in self.__dict__:
+                continue
+            value = self.__dict__[att_]
+            if att_ in STRUCTURED_ATTRIBUTES:
+                value = deepcopy(value, memo)
+            snapshot.__dict__[att_] = value
         self.dbstate = snapshot
+        self._edit_stamps = self.current_edit_stamps()
+        self._touched = set()
 
         LOGGER.debug("snapshot of %s taken" % self)
 
@@ -1027,10 +1318,8 @@ class patient(object):
         '''
         return all estimate items associated with a unique tx_hash
         '''
-        for est in self.estimates:
-            for tx_hash in est.tx_hashes:
-                if tx_hash == hash_:
-                    yield est
+        for est in self.estimates.ests_from_hash(hash_):
+            yield est
 
     @property
     def address_tuple(self):
@@ -1064,9 +1353,42 @@ class patient(object):
 
     def lock_record_in_use(self):
         records_in_use.set_locked(self.serialno)
+        self._record_locked = True
 
     def clear_lock(self):
         records_in_use.clear_lock(self.serialno)
+        self._record_locked = False
+
+
+def _benchmark(serialno, latency=0.05, repeats=5):
+    '''
+    compare loading a patient with one query per table against bulk_fetch's
+    single multi-statement query and a (validated) cache hit, adding latency
+    (in seconds) to every round trip to simulate a slow network link.
+    '''
+    global MULTI_STATEMENTS
+    import time
+    from openmolar.dbtools import query_stats
+
+    query_stats.SIMULATED_LATENCY = latency
+    for label, multi, cached in (("separate queries", False, False),
+                                 ("multi-statement", True, False),
+                                 ("cached", True, True)):
+        MULTI_STATEMENTS = multi
+        patient_cache.CACHE.clear()
+        if cached:
+            bulk_fetch(serialno)
+        query_stats.clear()
+        start = time.perf_counter()
+        for i in range(repeats):
+            if not cached:
+                patient_cache.CACHE.clear()
+            patient(serialno)
+        elapsed = time.perf_counter() - start
+        print("%s: %d round trips, %.0f ms per record (%d ms latency)" % (
+            label.ljust(20), len(query_stats.records()) // repeats,
+            1000 * elapsed / repeats, 1000 * latency))
+    query_stats.SIMULATED_LATENCY = 0
 
 
 if __name__ == "__main__":
@@ -1098,3 +1420,5 @@ if __name__ == "__main__":
     print(pt.ageYears)
     print(pt.age_course_start)
     print(pt.under_capitation)
+
+    _benchmark(serialno)
@@ -31,6 +31,9 @@ LOGGER = logging.getLogger("openmolar")
 planDBAtts = ("serialno", "plantype", "band", "grosschg", "discount", "netchg",
               "catcode", "planjoin", "regno")
 
+QUERY = "SELECT %s from plandata where serialno=%%s" % ", ".join(
+    planDBAtts[1:])
+
 
 class PlanData(object):
 
@@ -57,16 +60,18 @@ class PlanData(object):
             self.discount, self.netchg, self.catcode, self.planjoin,
             self.regno)
 
-    def getFromDB(self):
+    def getFromDB(self, rows=None):
+        '''
+        rows (from QUERY) may be passed if already fetched.
+        '''
         try:
-            db = connect.connect()
-            cursor = db.cursor()
-
-            query = '''SELECT %s,%s,%s,%s,%s,%s,%s,%s from plandata
-            where serialno=%s''' % (planDBAtts[1:] + (self.serialno,))
-            cursor.execute(query)
-            row = cursor.fetchone()
-            cursor.close()
+            if rows is None:
+                db = connect.connect()
+                cursor = db.cursor()
+                cursor.execute(QUERY, (self.serialno,))
+                rows = cursor.fetchall()
+                cursor.close()
+            row = rows[0] if rows else None
             i = 1
             if row:
                 for val in row:
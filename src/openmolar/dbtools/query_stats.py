@@ -0,0 +1,231 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+'''
+lightweight instrumentation of database queries.
+
+every connection handed out by openmolar.connect uses InstrumentedCursor,
+which records the calling function, a fingerprint of the sql, the row count
+and the latency of each query into a ring buffer.
+The buffer can be summarised (from the debug menu, or on exit when the
+application is started with --query-report) to show which functions
+dominate load times.
+'''
+
+import collections
+import functools
+import logging
+import re
+import sys
+import time
+from html import escape
+
+from MySQLdb.cursors import Cursor, CursorUseResultMixIn
+
+LOGGER = logging.getLogger("openmolar")
+
+# the number of queries remembered.
+RING_BUFFER_SIZE = 5000
+
+# queries taking longer than this (in seconds) are listed in reports.
+SLOW_QUERY_THRESHOLD = 0.1
+
+# a delay (in seconds) added to every query, so that benchmarks can
+# simulate a slow network link.
+SIMULATED_LATENCY = 0
+
+# frames from these modules are skipped when looking for the caller
+IGNORED_MODULES = ("MySQLdb.cursors", __name__)
+
+QueryRecord = collections.namedtuple(
+    "QueryRecord",
+    ("timestamp", "caller", "fingerprint", "rowcount", "duration")
+)
+
+_RECORDS = collections.deque(maxlen=RING_BUFFER_SIZE)
+
+_LITERALS = re.compile(
+    r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    '''
+    reduce a query to a canonical form, so that queries differing only by
+    their literal values are grouped together.
+    '''
+    if isinstance(query, bytes):
+        query = query.decode("utf8", "replace")
+    query = _LITERALS.sub("?", query)
+    query = _IN_LISTS.sub("(?)", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def _caller():
+    '''
+    the first function on the stack outside this module and MySQLdb.
+    this only walks frame objects, so (unlike inspect.getframeinfo) never
+    touches the source files on disk.
+    '''
+    frame = sys._getframe(2)
+    while frame is not None and \
+            frame.f_globals.get("__name__") in IGNORED_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return "%s.%s:%d" % (frame.f_globals.get("__name__"),
+                         frame.f_code.co_name,
+                         frame.f_lineno)
+
+
+def record(query, rowcount, duration):
+    _RECORDS.append(QueryRecord(time.time(), _caller(), fingerprint(query),
+                                rowcount, duration))
+
+
+def clear():
+    _RECORDS.clear()
+
+
+def records():
+    '''
+    a list of the QueryRecords currently in the buffer, oldest first.
+    '''
+    return list(_RECORDS)
+
+
+def summary(key="caller"):
+    '''
+    aggregate the buffer by "caller" or "fingerprint".
+    returns a list of (key, count, total_time, max_time) tuples,
+    the most expensive first.
+    '''
+    totals = {}
+    for rec in list(_RECORDS):
+        k = getattr(rec, key)
+        count, total, max_ = totals.get(k, (0, 0, 0))
+        totals[k] = (count + 1, total + rec.duration,
+                     max(max_, rec.duration))
+    return sorted(((k,) + v for k, v in totals.items()),
+                  key=lambda row: row[2], reverse=True)
+
+
+def slow_queries(threshold=None):
+    '''
+    QueryRecords which took longer than threshold seconds
+    (default SLOW_QUERY_THRESHOLD), slowest first.
+    '''
+    if threshold is None:
+        threshold = SLOW_QUERY_THRESHOLD
+    return sorted((rec for rec in list(_RECORDS) if rec.duration > threshold),
+                  key=lambda rec: rec.duration, reverse=True)
+
+
+def text_report(limit=20):
+    '''
+    a plain text report, suitable for the console.
+    '''
+    lines = ["%d queries recorded" % len(_RECORDS), "",
+             "%6s %10s %10s  %s" % ("COUNT", "TOTAL ms", "MAX ms", "CALLER")]
+    for caller, count, total, max_ in summary()[:limit]:
+        lines.append("%6d %10.1f %10.1f  %s" % (
+            count, total * 1000, max_ * 1000, caller))
+    lines += ["", "SLOW QUERIES (> %d ms)" % (SLOW_QUERY_THRESHOLD * 1000)]
+    for rec in slow_queries()[:limit]:
+        lines.append("%10.1f  %s rows=%s\n            %s" % (
+            rec.duration * 1000, rec.caller, rec.rowcount, rec.fingerprint))
+    return "\n".join(lines)
+
+
+def html_report(limit=50):
+    '''
+    the same information as text_report, for the debug browser.
+    '''
+    html = ['<html><body><div align="center">',
+            "<h2>%s (%d)</h2>" % (_("Queries by caller"), len(_RECORDS)),
+            '<table width="100%" border="1">',
+            "<tr><th>%s</th><th>%s</th><th>%s</th><th>%s</th></tr>" % (
+                _("Caller"), _("Count"), _("Total ms"), _("Max ms"))]
+    for caller, count, total, max_ in summary()[:limit]:
+        html.append(
+            "<tr><td>%s</td><td>%d</td><td>%.1f</td><td>%.1f</td></tr>" % (
+                escape(caller), count, total * 1000, max_ * 1000))
+    html += ["</table>",
+             "<h2>%s</h2>" % _("Slow Queries"),
+             '<table width="100%" border="1">',
+             "<tr><th>ms</th><th>%s</th><th>%s</th><th>%s</th></tr>" % (
+                 _("Caller"), _("Rows"), _("Query"))]
+    for rec in slow_queries()[:limit]:
+        html.append(
+            "<tr><td>%.1f</td><td>%s</td><td>%s</td><td>%s</td></tr>" % (
+                rec.duration * 1000, escape(rec.caller), rec.rowcount,
+                escape(rec.fingerprint)))
+    html.append("</table></div></body></html>")
+    return "".join(html)
+
+
+def print_report():
+    print(text_report())
+
+
+class InstrumentedCursor(Cursor):
+    '''
+    a MySQLdb cursor which records each query it executes.
+    '''
+    _recording = False
+
+    def execute(self, query, args=None):
+        if self._recording:
+            return Cursor.execute(self, query, args)
+        self._recording = True
+        start = time.perf_counter()
+        try:
+            if SIMULATED_LATENCY:
+                time.sleep(SIMULATED_LATENCY)
+            return Cursor.execute(self, query, args)
+        finally:
+            self._recording = False
+            record(query, self.rowcount, time.perf_counter() - start)
+
+    def executemany(self, query, args):
+        # MySQLdb may implement executemany by repeated calls to execute
+        # these are recorded as one query.
+        self._recording = True
+        start = time.perf_counter()
+        try:
+            if SIMULATED_LATENCY:
+                time.sleep(SIMULATED_LATENCY)
+            return Cursor.executemany(self, query, args)
+        finally:
+            self._recording = False
+            record(query, self.rowcount, time.perf_counter() - start)
+
+
+class InstrumentedSSCursor(CursorUseResultMixIn, InstrumentedCursor):
+    '''
+    an unbuffered InstrumentedCursor. rows are read from the server as they
+    are fetched, so large results can be streamed.
+    the recorded duration does not include the fetching.
+    '''
@@ -25,6 +25,7 @@
 import logging
 
 from openmolar import connect
+from openmolar.dbtools import change_feed
 from openmolar.settings import localsettings
 
 LOGGER = logging.getLogger("openmolar")
@@ -80,6 +81,7 @@ def set_in_use(serialno):
     db = connect.connect()
     cursor = db.cursor()
     result = cursor.execute(QUERY1, values)
+    change_feed.record_change(cursor, "records_in_use", serialno)
     cursor.close()
     return result
 
@@ -93,22 +95,26 @@ def clear_in_use(serialno):
     values = (serialno, localsettings.surgeryno,)
     db = connect.connect()
     cursor = db.cursor()
-    cursor.execute(QUERY2, values)
+    if cursor.execute(QUERY2, values):
+        change_feed.record_change(cursor, "records_in_use", serialno)
     cursor.close()
     LOGGER.debug("cleared")
 
 
 def clear_surgery_records():
     '''
-    clear all records linked to this surgeryno
+    clear all records linked to this surgeryno.
+    old rows are pruned from the change feed at the same time.
     '''
     LOGGER.debug("clear_in_use surgeryno=%s", localsettings.surgeryno)
     values = (localsettings.surgeryno,)
     db = connect.connect()
     cursor = db.cursor()
-    cursor.execute(QUERY3, values)
+    if cursor.execute(QUERY3, values):
+        change_feed.record_change(cursor, "records_in_use")
     cursor.close()
     LOGGER.debug("cleared")
+    change_feed.prune()
 
 
 def set_locked(serialno):
@@ -121,6 +127,8 @@ def set_locked(serialno):
     db = connect.connect()
     cursor = db.cursor()
     result = cursor.execute(QUERY4, values)
+    if result:
+        change_feed.record_change(cursor, "records_in_use", serialno)
     cursor.close()
     return result
 
@@ -135,6 +143,8 @@ def clear_lock(serialno):
     db = connect.connect()
     cursor = db.cursor()
     result = cursor.execute(QUERY5, values)
+    if result:
+        change_feed.record_change(cursor, "records_in_use", serialno)
     cursor.close()
     return result
 
@@ -192,6 +202,50 @@ def get_usage_info(serialno):
         yield RecordInfo(row)
 
 
+class UsageMonitor(object):
+
+    '''
+    caches the usage information for a record, which is re-read only when
+    the change feed shows that the record's entries have changed.
+    '''
+
+    def __init__(self):
+        self.feed = change_feed.ChangeFeed("records_in_use")
+        self.serialno = None
+        self.usage_info = []
+
+    def get_usage_info(self, serialno):
+        changes = self.feed.changes()
+        if (serialno != self.serialno or changes is None or
+                serialno in changes):
+            self.usage_info = list(get_usage_info(serialno))
+            self.serialno = serialno
+        return self.usage_info
+
+    def reset(self):
+        self.feed.reset()
+        self.serialno = None
+        self.usage_info = []
+
+
+_MONITOR = UsageMonitor()
+
+
+def usage_info(serialno):
+    '''
+    the RecordInfo instances for serialno, re-read from the database only
+    when the record's usage has changed.
+    '''
+    return _MONITOR.get_usage_info(serialno)
+
+
+def reset_monitor():
+    '''
+    forget the cached usage information. (called when the server is changed)
+    '''
+    _MONITOR.reset()
+
+
 if __name__ == "__main__":
     LOGGER.setLevel(logging.DEBUG)
     sno = 24
@@ -24,6 +24,7 @@
 import logging
 
 from openmolar import connect
+from openmolar.dbtools.change_tracking import Tracked
 from openmolar.settings import localsettings
 
 LOGGER = logging.getLogger("openmolar")
@@ -58,6 +59,13 @@ CURRTRT_ATTS = (
     'lr5cmp', 'lr6cmp', 'lr7cmp', 'lr8cmp',
     'examt', 'examd', 'accd', 'cmpd', 'ftr')
 
+# the attributes from which treatment hashes are calculated, mapped to the
+# key under which TreatmentCourse caches those hashes.
+HASHED_ATTS = {"examt": "exam"}
+for att in CURRTRT_ROOT_ATTS:
+    HASHED_ATTS[att + "pl"] = att
+    HASHED_ATTS[att + "cmp"] = att
+
 QUERY = "SELECT "
 for field in CURRTRT_ATTS:
     QUERY += "%s, " % field
@@ -120,11 +128,12 @@ def delete_course(serialno, courseno):
     cursor.close()
 
 
-class TreatmentCourse(object):
+class TreatmentCourse(Tracked):
 
-    def __init__(self, sno, courseno):
+    def __init__(self, sno, courseno, rows=None):
         '''
         initiate the class with default variables, then load from database
+        (unless rows from QUERY are passed)
         '''
         self.dbstate = None
         self.serialno = sno
@@ -221,7 +230,7 @@ class TreatmentCourse(object):
         if self.courseno == 0:
             return
 
-        self.getCurrtrt()
+        self.getCurrtrt(rows)
 
     def __repr__(self):
         message = "TreatmentCourse for patient %s courseno %s\n" % (
@@ -266,14 +275,16 @@ class TreatmentCourse(object):
             items.append(("exam", self.examt))
         return items + list(self._non_tooth_items("cmp"))
 
-    def getCurrtrt(self):
-        db = connect.connect()
-        cursor = db.cursor()
-        cursor.execute(QUERY, (self.serialno, self.courseno))
-        for value in cursor.fetchall():
+    def getCurrtrt(self, rows=None):
+        if rows is None:
+            db = connect.connect()
+            cursor = db.cursor()
+            cursor.execute(QUERY, (self.serialno, self.courseno))
+            rows = cursor.fetchall()
+            cursor.close()
+        for value in rows:
             for i, field in enumerate(CURRTRT_ATTS):
-                self.__dict__[field] = value[i]
-        cursor.close()
+                setattr(self, field, value[i])
 
     @property
     def underTreatment(self):
@@ -346,52 +357,126 @@ class TreatmentCourse(object):
 
     @property
     def planned_tx_hash_tups(self):
+        completed = set(self._get_tx_hashes(True))
         for tup in self._get_tx_hashes():
-            if tup not in self.completed_tx_hash_tups:
+            if tup not in completed:
                 yield tup
 
-    def _get_tx_hashes(self, completed_only=False):
+    def __setattr__(self, name, value):
+        Tracked.__setattr__(self, name, value)
+        if name == "courseno":
+            self.__dict__["_hash_cache"] = {}
+            self.__dict__["_hash_index"] = None
+        elif name in HASHED_ATTS:
+            self._invalidate_hashes(HASHED_ATTS[name])
+
+    def _invalidate_hashes(self, att):
+        '''
+        forget the hashes for att (which has been altered), and remove them
+        from the hash index. they are recalculated when next needed.
+        '''
+        cache = self.__dict__.get("_hash_cache")
+        if not cache or att not in cache:
+            return
+        all_tups = cache.pop(att)[0]
+        index = self.__dict__.get("_hash_index")
+        if index is not None:
+            for hash_, att_, tx in all_tups:
+                index.pop(hash_, None)
+            self.__dict__["_stale_hash_atts"].add(att)
+
+    def _att_hashes(self, att):
+        '''
+        returns a tuple (all hashes, completed hashes) for the treatments of
+        a single root attribute (or "exam").
+        these are calculated once for each value of the attribute's plan and
+        completed strings.
+        '''
+        cache = self.__dict__.setdefault("_hash_cache", {})
+        try:
+            return cache[att]
+        except KeyError:
+            pass
+        if att == "exam":
+            if self.examt != "":
+                hash_ = localsettings.hash_func(
+                    "%sexam1%s" % (self.courseno, self.examt))
+                tups = ((hash_, "exam", self.examt + " "),)
+            else:
+                tups = ()
+            cache[att] = (tups, tups)
+        else:
+            completed = self.__dict__[att + "cmp"]
+            cache[att] = (
+                self._hash_treatments(
+                    att, completed + " " + self.__dict__[att + "pl"]),
+                self._hash_treatments(att, completed))
+        return cache[att]
+
+    def _hash_treatments(self, att, treats):
         '''
-        returns a tuple (unique hash, attribute, treatment)
         hashes will be unique as multiple identical items are indexed
         eg. eg "perio SP AC SP " is hashed as follows
         "%sperio1SP"% courseno
         "%sperio2SP"% courseno
         "%sperio1AC"% courseno
         '''
-        if self.examt != "":
+        tups = []
+        prev_tx, count = None, 1
+        for tx in sorted(treats.split(" ")):
+            if tx == "":
+                continue
+            if tx != prev_tx:
+                count = 1
+                prev_tx = tx
+            else:
+                count += 1
             hash_ = localsettings.hash_func(
-                "%sexam1%s" % (self.courseno, self.examt))
-            yield (hash_, "exam", self.examt + " ")
-
-        for att in CURRTRT_ROOT_ATTS:
-            treats = self.__dict__[att + "cmp"]
-            if not completed_only:
-                treats += " " + self.__dict__[att + "pl"]
-            treat_list = sorted(treats.split(" "))
-            prev_tx, count = None, 1
-
-            for tx in treat_list:
-                if tx == "":
-                    continue
-                if tx != prev_tx:
-                    count = 1
-                    prev_tx = tx
-                else:
-                    count += 1
-                hash_ = localsettings.hash_func(
-                    "%s%s%s%s" % (self.courseno, att, count, tx))
-                yield (hash_, att, tx + " ")
+                "%s%s%s%s" % (self.courseno, att, count, tx))
+            tups.append((hash_, att, tx + " "))
+        return tuple(tups)
+
+    def _get_tx_hashes(self, completed_only=False):
+        '''
+        returns a tuple (unique hash, attribute, treatment)
+        '''
+        i = 1 if completed_only else 0
+        for att in ("exam",) + CURRTRT_ROOT_ATTS:
+            for tup in self._att_hashes(att)[i]:
+                yield tup
+
+    @property
+    def hash_index(self):
+        '''
+        a dictionary {hash: (attribute, treatment)} of all treatments.
+        kept up to date as the plan and completed attributes are altered.
+        '''
+        index = self.__dict__.get("_hash_index")
+        if index is None:
+            index = {}
+            for hash_, att, tx in self._get_tx_hashes():
+                index[hash_] = (att, tx)
+            self.__dict__["_hash_index"] = index
+            self.__dict__["_stale_hash_atts"] = set()
+        else:
+            stale = self.__dict__["_stale_hash_atts"]
+            while stale:
+                for hash_, att, tx in self._att_hashes(stale.pop())[0]:
+                    index[hash_] = (att, tx)
+        return index
 
     def get_tx_from_hash(self, hash_):
         '''
         example
         imput a hash 039480284098
         get back ("ur1", "M")
+        hash_ may also be an estimates.TXHash
         '''
-        for tx_hash in self.tx_hashes:
-            if tx_hash[0] == hash_:
-                return tx_hash[1], tx_hash[2]
+        hash_ = getattr(hash_, "hash", hash_)
+        try:
+            return self.hash_index[hash_]
+        except KeyError:
+            pass
         LOGGER.warning("couldn't find treatment %s" % hash_)
         LOGGER.debug("listing existing hashes")
         for tx_hash in self.tx_hashes:
@@ -26,6 +26,7 @@ this module puts the "openmolar" modules onto the python path,
 and starts the gui
 '''
 
+import atexit
 import getopt
 import logging
 import os
@@ -34,6 +35,7 @@ import sys
 if sys.version < '3.0':
     sys.exit("This program requires a python3 runtime")
 
+from openmolar.settings import startup_profile
 from openmolar.settings import localsettings
 
 SHORTARGS = "vq"
@@ -42,7 +44,9 @@ LONGARGS = [
     "version",
     "firstrun",
     "ignore-schema-check",
-    "no-dev-login"
+    "no-dev-login",
+    "query-report",
+    "profile-startup"
 ]
 
 LOGGER = logging.getLogger("openmolar")
@@ -56,6 +60,8 @@ USAGE = '''%s
 --ignore-schema-check\t : %s
 --version            \t : %s
 --no-dev-login       \t : %s
+--query-report       \t : %s
+--profile-startup    \t : %s
 '''
 
 
@@ -63,7 +69,8 @@ def main():
     '''
     main function
     '''
-    from openmolar.qt4gui import maingui
+    with startup_profile.phase("import gui modules"):
+        from openmolar.qt4gui import maingui
     maingui.main()
 
 
@@ -81,7 +88,9 @@ def usage():
         _("proceed even if client and database versions clash "
           "(NOT ADVISABLE!)"),
         _("show the versioning and exit"),
-        _("Ignore dev login (advanced)")
+        _("Ignore dev login (advanced)"),
+        _("print a report of database query timings on exit"),
+        _("print a timeline of the application startup")
     ))
 
 
@@ -122,6 +131,11 @@ def run():
         if option == "--ignore-schema-check":
             localsettings.IGNORE_SCHEMA_CHECK = True
             LOGGER.warning("command line args demand no schema check")
+        if option == "--query-report":
+            from openmolar.dbtools import query_stats
+            atexit.register(query_stats.print_report)
+        if option == "--profile-startup":
+            startup_profile.ENABLED = True
     chosen_func()
 
 
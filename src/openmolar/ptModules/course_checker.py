@@ -128,7 +128,8 @@ class CourseChecker(object):
                     if m:
                         att = "%scmp" % m.groups()[0].lower()
                         tx = m.groups()[1] + " "
-                        self._daybook_course.__dict__[att] += tx
+                        setattr(self._daybook_course, att,
+                                getattr(self._daybook_course, att) + tx)
 
             if accd is None or (self.course.accd and self.course.accd < accd):
                 self._daybook_course.accd = self.course.accd
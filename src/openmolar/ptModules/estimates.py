@@ -21,22 +21,57 @@
 # #                                                                         # #
 # ########################################################################### #
 
+from collections import Counter
 import copy
 import logging
 import re
 import sys
+import weakref
 
+from openmolar.dbtools.change_tracking import Tracked
 from openmolar.settings import localsettings
 
 LOGGER = logging.getLogger("openmolar")
 
 
-class TXHash(object):
+class Owned(object):
+
+    '''
+    a mixin for objects which keep weak references to the containers which
+    index them, so that only those containers are told of a change.
+    the references are not copied or pickled.
+    '''
+
+    def add_owner(self, owner):
+        owners = self.__dict__.get("_owners")
+        if owners is None:
+            owners = weakref.WeakValueDictionary()
+            object.__setattr__(self, "_owners", owners)
+        owners[id(owner)] = owner
+
+    @property
+    def owners(self):
+        owners = self.__dict__.get("_owners")
+        return list(owners.values()) if owners else []
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_owners", None)
+        return state
+
+
+class TXHash(Owned, Tracked):
 
     def __init__(self, hash_, completed=False):
         self.hash = hash_
         self.completed = completed
 
+    def __setattr__(self, name, value):
+        Tracked.__setattr__(self, name, value)
+        if name == "hash":
+            for est in self.owners:
+                est.hashes_changed()
+
     def __hash__(self):
         '''
         new for python3 as the presence of the __eq__ method renders these
@@ -57,7 +92,7 @@ class TXHash(object):
         return "TXHash %s completed=%s" % (self.hash, self.completed)
 
 
-class Estimate(object):
+class Estimate(Owned, Tracked):
 
     '''
     this class has attributes suitable for storing in the estimates table
@@ -81,6 +116,21 @@ class Estimate(object):
 
         self.tx_hashes = []
 
+    def __setattr__(self, name, value):
+        Tracked.__setattr__(self, name, value)
+        if name in ("itemcode", "csetype"):
+            for estimates in self.owners:
+                estimates.key_changed()
+        elif name == "tx_hashes":
+            self.hashes_changed()
+
+    def hashes_changed(self):
+        '''
+        tx_hashes has been replaced, or one of its hashes altered.
+        '''
+        for estimates in self.owners:
+            estimates.hashes_changed()
+
     @property
     def completed(self):
         '''
@@ -95,6 +145,15 @@ class Estimate(object):
             return 0
         return 1
 
+    @property
+    def edit_stamp(self):
+        '''
+        a value which changes whenever the estimate (or one of its tx_hashes)
+        is altered.
+        '''
+        return (id(self), self.edit_number, len(self.tx_hashes),
+                max([tx_hash.edit_number for tx_hash in self.tx_hashes] + [0]))
+
     @property
     def n_completed(self):
         n_completed = 0
@@ -265,6 +324,127 @@ class Estimate(object):
         return len(self.tx_hashes) > 1
 
 
+class EstimateList(list):
+
+    '''
+    a list of estimates which counts how many estimates there are for each
+    (itemcode, csetype), so that fee lookups need not scan the list.
+    appending and removing estimates adjust the counts, anything else
+    (including altering the itemcode or csetype of a listed estimate)
+    causes a recount on the next lookup.
+    the estimates for each treatment hash are indexed in the same way.
+    '''
+
+    def __init__(self, estimates=()):
+        list.__init__(self, estimates)
+        self._counts = None
+        self._by_hash = None
+
+    def __reduce__(self):
+        return (EstimateList, (list(self),))
+
+    def _key(self, est):
+        est.add_owner(self)
+        return est.itemcode, est.csetype
+
+    def count_of(self, itemcode, csetype):
+        '''
+        the number of estimates with this itemcode and csetype
+        '''
+        if self._counts is None:
+            self._counts = Counter(self._key(est) for est in self)
+        return self._counts[(itemcode, csetype)]
+
+    def _index_hashes(self, est):
+        est.add_owner(self)
+        for tx_hash in est.tx_hashes:
+            tx_hash.add_owner(est)
+            self._by_hash.setdefault(tx_hash.hash, []).append(est)
+
+    def ests_from_hash(self, hash_):
+        '''
+        the estimates associated with a treatment hash.
+        hashes removed in place from an estimate's tx_hashes (rather than by
+        replacing the list) are still indexed, so are checked for here.
+        '''
+        if self._by_hash is None:
+            self._by_hash = {}
+            for est in self:
+                self._index_hashes(est)
+        hash_ = getattr(hash_, "hash", hash_)
+        ests, seen = [], set()
+        for est in self._by_hash.get(hash_, []):
+            if id(est) not in seen:
+                seen.add(id(est))
+                ests += [est for tx_hash in est.tx_hashes if tx_hash == hash_]
+        return ests
+
+    def key_changed(self):
+        '''
+        called when the itemcode or csetype of an estimate in the list is
+        altered.
+        '''
+        self._counts = None
+
+    def hashes_changed(self):
+        '''
+        called when the tx_hashes of an estimate in the list are altered.
+        '''
+        self._by_hash = None
+
+    def _invalidate(self):
+        self._counts = None
+        self._by_hash = None
+
+    def append(self, est):
+        list.append(self, est)
+        if self._counts is not None:
+            self._counts[self._key(est)] += 1
+        if self._by_hash is not None:
+            self._index_hashes(est)
+
+    def remove(self, est):
+        # estimates compare by value, so count the one actually removed.
+        index = self.index(est)
+        removed = self[index]
+        list.__delitem__(self, index)
+        if self._counts is not None:
+            self._counts[(removed.itemcode, removed.csetype)] -= 1
+        if self._by_hash is not None:
+            for tx_hash in removed.tx_hashes:
+                ests = self._by_hash.get(tx_hash.hash, [])
+                ests[:] = [est_ for est_ in ests if est_ is not removed]
+
+    def insert(self, index, est):
+        list.insert(self, index, est)
+        self._invalidate()
+
+    def extend(self, estimates):
+        list.extend(self, estimates)
+        self._invalidate()
+
+    def __iadd__(self, estimates):
+        self.extend(estimates)
+        return self
+
+    def pop(self, *args):
+        est = list.pop(self, *args)
+        self._invalidate()
+        return est
+
+    def clear(self):
+        list.clear(self)
+        self._invalidate()
+
+    def __setitem__(self, index, value):
+        list.__setitem__(self, index, value)
+        self._invalidate()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._invalidate()
+
+
 def strip_curlies(description):
     '''
     comments such as {2 of 2} are present in the estimates...
@@ -46,6 +46,15 @@ show_metadata = False
 # use these variables for the summary notes also?
 same_for_clinical = False
 
+OLDER_NOTES_URL = "om://older_notes"
+
+TRAILING_BREAKS = re.compile("(<br /> *)*$")
+LEADING_SPACE = re.compile(r"^\s+")
+
+# rendered notes for a date, most recently used last.
+MAX_CACHED_FRAGMENTS = 20000
+_FRAGMENT_CACHE = OrderedDict()
+
 HEADER = '''<html>
 <head>
 <link rel="stylesheet" href="%s" type="text/css">
@@ -54,10 +63,14 @@ HEADER = '''<html>
 <!-- HEADER -->''' % localsettings.stylesheet
 
 
-def get_notes_dict(serialno, today_only=False):
+def get_notes_dict(serialno, today_only=False, rows=None):
     '''
+    rows (from db_notes.NOTES_QUERY) may be passed if already fetched.
     '''
-    results_tuple = db_notes.notes(serialno, today_only)
+    if rows is None:
+        results_tuple = db_notes.notes(serialno, today_only)
+    else:
+        results_tuple = rows
 
     notes_dict = OrderedDict()
     for ndate, op1, op2, ntype, note in results_tuple:
@@ -78,22 +91,41 @@ def s_t_l(note):
     '''
     strip trailing linebreaks
     '''
-    return re.sub("(<br /> *)*$", "", note)
+    if not note.rstrip(" ").endswith("<br />"):
+        return note
+    return TRAILING_BREAKS.sub("", note)
 
 
-def get_notes_for_date(lines, full_notes=False):
+def _verbosity(lines, full_notes):
     '''
-    this is the actual user clinically relevant stuff!
+    the user variables which alter how lines are rendered.
+    '''
+    if not full_notes:
+        return ()
+    ntypes = " ".join(ntype for ntype, noteline in lines)
+    return (show_payments and "RECEIVED" in ntypes,
+            show_printed and "PRINT" in ntypes,
+            show_timestamps and ("opened" in ntypes or "closed" in ntypes))
+
+
+def _render_notes_for_date(lines, full_notes):
+    '''
+    render the notes for one date and set of operators.
+    returns html strings (treatments, notes, metadata). metadata is always
+    rendered (for full_notes), so that toggling show_metadata does not
+    invalidate the cache.
     '''
     def non_blocking_repl(m):
         return "&nbsp" * m.end()
     txs = []
     rev_txs = []
-    tx, note, metadata = "", "", ""
+    tx, note, metadata = [], [], []
     for ntype, noteline in lines:
         if "NOTE" in ntype and noteline != "":
-            note += "%s " % noteline.replace("<", "&lt;").replace(">", "&gt;")
-            note = re.sub(r"^\s+", non_blocking_repl, note)
+            text = "%s " % noteline.replace("<", "&lt;").replace(">", "&gt;")
+            if not note and text[0].isspace():
+                text = LEADING_SPACE.sub(non_blocking_repl, text)
+            note.append(text)
         else:
             if "TC" in ntype:
                 txs.append((ntype, noteline.strip("\n")))
@@ -108,31 +140,50 @@ def get_notes_for_date(lines, full_notes=False):
                     receipt_text = noteline.replace("sundries 0.00", "")
                     receipt_text = receipt_text.replace("treatment 0.00", "")
                     if show_payments:
-                        tx += "%s %s<br />" % (ntype, receipt_text)
+                        tx.append("%s %s<br />" % (ntype, receipt_text))
                 elif "PRINT" in ntype:
                     if show_printed:
-                        tx += "%s %s<br />" % (ntype, noteline)
+                        tx.append("%s %s<br />" % (ntype, noteline))
                 elif ntype in ("opened", "closed"):
                     if show_timestamps:
-                        note += "<i>%s %s</i><br />" % (ntype, noteline)
-                elif show_metadata:
-                    metadata += "<b>%s</b>%s<br />" % (ntype, noteline)
-
-    note = note.replace("\n", "<br />")
-
-    for tuple_ in set(txs):
-        n = txs.count(tuple_)
-        ntype, treatment = tuple_
+                        note.append("<i>%s %s</i><br />" % (ntype, noteline))
+                else:
+                    metadata.append("<b>%s</b>%s<br />" % (ntype, noteline))
+
+    counts = OrderedDict()
+    for tuple_ in txs:
+        counts[tuple_] = counts.get(tuple_, 0) + 1
+    for (ntype, treatment), n in counts.items():
         if n != 1:
-            tx += "<b>%d%s</b><br />" % (n, treatment)
+            tx.append("<b>%d%s</b><br />" % (n, treatment))
         else:
-            tx += "<b>%s</b><br />" % treatment
+            tx.append("<b>%s</b><br />" % treatment)
 
-    for tuple_ in rev_txs:
-        ntype, treatment = tuple_
-        tx += "<b>%s</b><br />" % treatment
+    for ntype, treatment in rev_txs:
+        tx.append("<b>%s</b><br />" % treatment)
 
-    return s_t_l(tx), s_t_l(note), s_t_l(metadata)
+    return (s_t_l("".join(tx)),
+            s_t_l("".join(note).replace("\n", "<br />")),
+            s_t_l("".join(metadata)))
+
+
+def get_notes_for_date(lines, full_notes=False):
+    '''
+    this is the actual user clinically relevant stuff!
+    returns html strings (treatments, notes, metadata)
+    rendered notes are cached, keyed on their content and the user
+    variables which affect them.
+    '''
+    key = (tuple(lines), full_notes, _verbosity(lines, full_notes))
+    try:
+        fragments = _FRAGMENT_CACHE.pop(key)
+    except KeyError:
+        fragments = _render_notes_for_date(lines, full_notes)
+        if len(_FRAGMENT_CACHE) >= MAX_CACHED_FRAGMENTS:
+            _FRAGMENT_CACHE.popitem(last=False)
+    _FRAGMENT_CACHE[key] = fragments
+    tx, note, metadata = fragments
+    return tx, note, metadata if show_metadata else ""
 
 
 def get_rec_summary(op, lines):
@@ -186,76 +237,73 @@ def rec_notes(notes_dict, startdate=None):
     return retarg
 
 
-def summary_notes(notes_dict):
-    return notes(notes_dict, same_for_clinical)
+def summary_notes(notes_dict, older_notes=False):
+    return notes(notes_dict, same_for_clinical, older_notes)
 
 
-def notes(notes_dict, full_notes=True):
+def notes(notes_dict, full_notes=True, older_notes=False):
     '''
     returns an html string of notes...
+    if older_notes, a link to load older notes is put above the table.
     '''
-
-    retarg = HEADER + '''
+    html = [HEADER]
+    if older_notes:
+        html.append('<a href="%s">%s</a>' % (OLDER_NOTES_URL,
+                                             _("Load older notes")))
+    html.append('''
         <table class="table">
             <tr>
                 <th class="date">Date</th>
                 <th class="ops">ops</th>
                 <th class="tx">Tx</th>
                 <th class="notes">Notes</th>
-        '''
-
-    keys = list(notes_dict.keys())
+        ''')
 
     if full_notes and show_metadata:
-        retarg += '<th class="reception">metadata</th>'
+        html.append('<th class="reception">metadata</th>')
 
-    retarg += '</tr>\n'
+    html.append('</tr>\n')
 
-    previousdate = ""  # necessary to group notes on same day
-    rowspan = 1
-    newline = ""
-    for key in keys:
-        date, op = key
-        data = notes_dict[key]
+    # render the rows first, grouping those on the same day, so that the
+    # rowspan of each date cell is known before it is written.
+    today = localsettings.currentDay()
+    days = []
+    for (date, op), data in notes_dict.items():
         tx, notes, metadata = get_notes_for_date(data, full_notes)
         if tx == "" and notes == "" and not show_metadata:
             continue
-        newline += "<tr>\n"
-        if date != previousdate:
-            previousdate = date
-            rowspan = 1
-            retarg += newline
-            link = ""
-
-            newline = '        <td class="date">%s %s</td>' % (
-                localsettings.notesDate(date), link)
-        else:
-            # alter the previous html, so that the rows are spanned
-            rowspan += 1
-            newline = re.sub(
-                'class="date"( rowspan="\d")*',
-                'class="date" rowspan="%d"' % rowspan, newline)
 
         subline = '<td class="ops">%s' % op
-
-        if (date == localsettings.currentDay() and
-                op == localsettings.operator):
+        if date == today and op == localsettings.operator:
             subline += \
                 '<br /><a href="om://edit_notes?__SNO__">%s</a>' % _("Edit")
 
-        newline += '''
+        row = '''
         %s</td>
         <td class="tx">%s</td>
         <td class="notes">%s</td>''' % (subline, tx, notes)
 
         if show_metadata:
-            newline += '<td class="reception">%s</td>\n</tr>\n' % metadata
+            row += '<td class="reception">%s</td>\n</tr>\n' % metadata
         else:
-            newline += '\n</tr>\n'
-    retarg += newline
-    retarg += '</table></div></body></html>'
+            row += '\n</tr>\n'
 
-    return retarg
+        if days and days[-1][0] == date:
+            days[-1][1].append(row)
+        else:
+            days.append((date, [row]))
+
+    for date, rows in days:
+        rowspan = ' rowspan="%d"' % len(rows) if len(rows) > 1 else ""
+        html.append('<tr>\n        <td class="date"%s>%s </td>' % (
+            rowspan, localsettings.notesDate(date)))
+        html.append(rows[0])
+        for row in rows[1:]:
+            html.append("<tr>\n")
+            html.append(row)
+    html.append('</table></div></body></html>')
+
+    return "".join(html)
 
 
 def todays_notes(serialno):
@@ -175,7 +175,7 @@ def completedFillsToStatic(pt):
     for tooth, prop in items:
         tooth = tooth.lower()
         if re.match("EX", prop):
-            pt.__dict__["%sst" % tooth] = "TM "
+            setattr(pt, "%sst" % tooth, "TM ")
         elif len(prop) > 33:
             pass
         else:
@@ -187,7 +187,7 @@ def completedFillsToStatic(pt):
                 new = " ".join([s for s in existing[i:] if s != ""]) + " "
                 correct = len(new) < 34
                 i += 1
-            pt.__dict__["%sst" % tooth] = new
+            setattr(pt, "%sst" % tooth, new)
 
 
 def reverse_completedFillsToStatic(pt):
@@ -210,7 +210,7 @@ def reverse_completedFillsToStatic(pt):
             pass  # property not found
         existing.reverse()
         new = " ".join([s for s in existing if s != ""]) + " "
-        pt.__dict__["%sst" % tooth] = new
+        setattr(pt, "%sst" % tooth, new)
 
 
 if __name__ == "__main__":
@@ -70,10 +70,22 @@ class ClinicianSelectModel(QtCore.QAbstractListModel):
             retlist.append(localsettings.apptix.get(dent))
         return tuple(retlist)
 
-    def clinician_list(self, row, date):
+    def clinician_list(self, row, date, day_data=None):
         '''
         returns a tuple of values showing who is working.
+        if day_data (an appointments.WeekDayData) is given, it is used
+        instead of querying the database.
         '''
+        if day_data is not None:
+            if row == 0:
+                return day_data.working_dents(include_non_working=False)
+            elif row == 1:
+                return day_data.working_dents(localsettings.activedent_ixs,
+                                              include_non_working=False)
+            elif row == 2:
+                return day_data.working_dents(localsettings.activehyg_ixs,
+                                              include_non_working=False)
+            return day_data.all_clinicians()
         if row == 0:
             return appointments.getWorkingDents(date,
                                                 include_non_working=False)
@@ -85,7 +85,7 @@ def deleteComments(om_gui):
         om_gui.ui.staticChartWidget.commentedTeeth.remove(tooth)
         om_gui.ui.staticChartWidget.update()
     existing = om_gui.pt.__dict__[tooth + "st"]
-    om_gui.pt.__dict__[tooth + "st"] = re.sub("![^ ]* ", "", existing)
+    setattr(om_gui.pt, tooth + "st", re.sub("![^ ]* ", "", existing))
 
 
 def updateCharts(om_gui, arg):
@@ -97,7 +97,7 @@ def updateCharts(om_gui, arg):
 
     tooth = om_gui.ui.toothPropsWidget.selectedTooth
     if om_gui.selectedChartWidget == "st":
-        om_gui.pt.__dict__[tooth + om_gui.selectedChartWidget] = arg
+        setattr(om_gui.pt, tooth + om_gui.selectedChartWidget, arg)
         # update the patient!!
         om_gui.ui.staticChartWidget.setToothProps(tooth, arg)
         om_gui.ui.summaryChartWidget.setToothProps(tooth, arg)
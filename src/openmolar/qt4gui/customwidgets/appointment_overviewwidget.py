@@ -209,6 +209,16 @@ class AppointmentOverviewWidget(QtWidgets.QWidget):
     def setFlags(self, dent):
         self.flagDict[dent.ix] = dent.flag
 
+    def load_day_data(self, day_data):
+        '''
+        set appointments, blocks and lunches for each of self.dents
+        from an appointments.WeekDayData instance
+        '''
+        for dent in self.dents:
+            self.appts[dent.ix] = day_data.appts.get(dent.ix, ())
+            self.eTimes[dent.ix] = day_data.blocks.get(dent.ix, ())
+            self.lunches[dent.ix] = day_data.lunches.get(dent.ix, ())
+
     def sizeHint(self):
         return QtCore.QSize(40, 600)
 
@@ -308,6 +308,21 @@ class AppointmentWidget(QtWidgets.QFrame):
         '''
         self.locations = locations
 
+    def update_locations(self, locations):
+        '''
+        apply a new dictionary of patient locations to the appointments
+        already in the book, and redraw.
+        '''
+        self.locations = locations
+        changed = False
+        for app in self.canvas.appts + self.canvas.doubleAppts:
+            location = locations.get(app.serialno)
+            if app.location != location:
+                app.location = location
+                changed = True
+        if changed:
+            self.update()
+
     def addSlot(self, slot):
         '''
         adds a slot to the widget's data
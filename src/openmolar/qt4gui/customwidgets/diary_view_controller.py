@@ -88,9 +88,10 @@ class DiaryViewController(QtWidgets.QWidget):
         if dl.exec_():
             self.set_mode(dl.mode)
 
-    def clinician_days(self, adate):
+    def clinician_days(self, adate, day_data=None):
         i = self.clinicianSelection_comboBox.currentIndex()
-        return tuple(self.clinician_select_model.clinician_list(i, adate))
+        return tuple(
+            self.clinician_select_model.clinician_list(i, adate, day_data))
 
     def clinician_list(self, adate):
         '''
@@ -25,6 +25,7 @@
 schedule_control.py provides the DiaryScheduleController class for openmolar.
 '''
 
+import datetime
 from functools import partial
 import logging
 
@@ -576,14 +577,11 @@ class DiaryScheduleController(QtWidgets.QStackedWidget):
                 iterset = [self.appointment_model.currentAppt.to_freeslot()]
             else:
                 iterset = self.primary_slots
-            for app1_slot in iterset:
-                for app2_slot in self.secondary_slots:
-                    wait = app1_slot.wait_time(self.app1_length,
-                                               self.app2_length,
-                                               app2_slot)
-                    if wait is not None and wait <= MAX_WAIT:
-                        app2_slots.append(app2_slot)
-                        app1_slots.add(app1_slot)
+            for app1_slot, app2_slot in appointments.joint_slot_pairs(
+                    iterset, self.secondary_slots,
+                    self.app1_length, self.app2_length, MAX_WAIT):
+                app2_slots.append(app2_slot)
+                app1_slots.add(app1_slot)
             if not self.app1_is_scheduled:
                 self.set_primary_slots(app1_slots)
 
@@ -629,14 +627,11 @@ class DiaryScheduleController(QtWidgets.QStackedWidget):
                 iterset = [self.appointment_model.currentAppt.to_freeslot()]
             else:
                 iterset = self.primary_slots
-            for app1_slot in iterset:
-                for app2_slot in self.secondary_slots:
-                    wait = app1_slot.wait_time(self.app1_length,
-                                               self.app2_length,
-                                               app2_slot)
-                    if wait is not None and wait <= MAX_WAIT:
-                        app2_slots.append(app2_slot)
-                        app1_slots.add(app1_slot)
+            for app1_slot, app2_slot in appointments.joint_slot_pairs(
+                    iterset, self.secondary_slots,
+                    self.app1_length, self.app2_length, MAX_WAIT):
+                app2_slots.append(app2_slot)
+                app1_slots.add(app1_slot)
             if not self.app1_is_scheduled:
                 self.set_primary_slots(app1_slots)
 
@@ -646,15 +641,41 @@ class DiaryScheduleController(QtWidgets.QStackedWidget):
     def chosen_2nd_slots(self):
         if not (self.appointment_model.currentAppt is None or
                 self.appointment_model.secondaryAppt is None):
-            for app2_slot in self.secondary_slots:
-                wait = self.chosen_slot.wait_time(self.app1_length,
-                                                  self.app2_length,
-                                                  app2_slot)
-                if wait is not None and wait <= MAX_WAIT:
-                    yield app2_slot
+            chosen_slot = self.chosen_slot
+            if chosen_slot is None:
+                return
+            for app1_slot, app2_slot in appointments.joint_slot_pairs(
+                    [chosen_slot], self.secondary_slots,
+                    self.app1_length, self.app2_length, MAX_WAIT):
+                yield app2_slot
         else:
             LOGGER.debug("no appointments selected")
 
+    def next_possible_date(self, date_, forwards=True):
+        '''
+        date_ is the (python) date the diary would otherwise step to.
+        use the availability index to skip days on which appointment 1
+        cannot possibly fit, rather than laying them out one at a time.
+        '''
+        if (self.mode != self.SCHEDULE_MODE or not self.is_searching or
+                self.app1_is_scheduled or not self.appt1_clinicians):
+            return date_
+        if not localsettings.currentDay() <= date_ <= localsettings.BOOKEND:
+            return date_
+        # busy_serialno is not passed, so the index never rules out a day
+        # which the day view would offer.
+        index = appointments.availability_index(
+            override_emergencies=self.ignore_emergency_spaces())
+        found = index.next_date(date_, self.appt1_clinicians,
+                                self.app1_length, forwards,
+                                self.excluded_days)
+        if found is not None:
+            return found
+        LOGGER.debug("availability index has no suitable date")
+        if forwards:
+            return localsettings.BOOKEND + datetime.timedelta(days=1)
+        return localsettings.currentDay() - datetime.timedelta(days=1)
+
     @property
     def last_appt_date(self):
         '''
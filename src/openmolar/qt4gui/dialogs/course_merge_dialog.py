@@ -126,14 +126,14 @@ class CourseMergeDialog(ExtendableDialog):
             if self.tx_course1.examt > new_course.examt:
                 new_course.examt = self.tx_course1.examt
             for att in self._merge_atts:
-                value1 = new_course.__dict__[att]
-                value2 = self.tx_course1.__dict__[att]
+                value1 = getattr(new_course, att)
+                value2 = getattr(self.tx_course1, att)
                 if value1 in (None, ""):
-                    new_course.__dict__[att] = value2
+                    setattr(new_course, att, value2)
                 elif value2 in (None, ""):
                     pass
                 else:
-                    new_course.__dict__[att] += value2
+                    setattr(new_course, att, value1 + value2)
             self._merged_course = new_course
         return self._merged_course
 
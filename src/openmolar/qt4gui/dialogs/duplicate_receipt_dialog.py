@@ -153,10 +153,7 @@ class DuplicateReceiptDialog(BaseDialog):
         ix = self.sender().ix
         print("reprint document %s" % ix)
         try:
-            data, version = docsprinted.getData(ix)
-            f = open(localsettings.TEMP_PDF, "wb")
-            f.write(data)
-            f.close()
+            docsprinted.copy_to_path(ix, localsettings.TEMP_PDF)
             localsettings.openPDF()
         except Exception:
             LOGGER.exception("view PDF error")
@@ -29,18 +29,13 @@ from PyQt5 import QtWidgets
 
 from openmolar.settings import localsettings
 from openmolar.connect import connect
+from openmolar.dbtools import locations
 
 from openmolar.qt4gui.customwidgets.warning_label import WarningLabel
 from openmolar.qt4gui.dialogs.base_dialogs import BaseDialog
 
 LOGGER = logging.getLogger("openmolar")
 
-UPDATE_LOC_QUERY = 'REPLACE into locations (serialno, location) values (%s, %s)'
-
-DELETE_QUERY = 'DELETE FROM locations WHERE serialno=%s'
-
-DELETE_ALL_QUERY = 'DELETE FROM locations'
-
 GET_NAME_QUERY = \
     'SELECT CONCAT(fname, " ", sname) from new_patients where serialno=%s'
 
@@ -64,11 +59,7 @@ class ClearLocationsDialog(BaseDialog):
     def exec_(self):
         result = BaseDialog.exec_(self)
         if result:
-            db = connect()
-            cursor = db.cursor()
-            cursor.execute(DELETE_ALL_QUERY)
-            cursor.close()
-            db.commit()
+            locations.clear_all_locations()
 
         return result
 
@@ -116,21 +107,13 @@ class PatientLocationDialog(BaseDialog):
         key = rev_dict[location]
         self.message = "Patient %s is in %s" % (self.serialno, location)
         LOGGER.debug(self.message)
-        db = connect()
-        cursor = db.cursor()
-        cursor.execute(UPDATE_LOC_QUERY, (self.serialno, key))
-        cursor.close()
-        db.commit()
+        locations.set_location(self.serialno, key)
         self.accept()
 
     def clear_patient(self):
         self.message = "Patient %s has left" % self.serialno
         LOGGER.debug(self.message)
-        db = connect()
-        cursor = db.cursor()
-        cursor.execute(DELETE_QUERY, (self.serialno,))
-        cursor.close()
-        db.commit()
+        locations.clear_location(self.serialno)
         self.accept()
 
 
@@ -61,6 +61,7 @@ class PrintRecordDialog(BaseDialog):
                     <img src="%s" width="80%%" />
                     </div>
                     <hr />''' % self.chartimage
+        self.pt.load_all_notes()
         html += formatted_notes.notes(self.pt.notes_dict)
         self.web_view.setHtml(html)
 
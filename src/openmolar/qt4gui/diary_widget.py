@@ -98,12 +98,15 @@ class DiaryWidget(Advisor):
     message_alert = None
     laid_out = False
     current_weekViewClinicians = set()
+    signature_dates = None
 
     def __init__(self, parent=None):
         Advisor.__init__(self, parent)
         self.ui = Ui_diary_widget.Ui_Form()
         self.ui.setupUi(self)
         self.appointmentData = appointments.DayAppointmentData()
+        self.diary_signatures = {}
+        self.day_locations = {}
 
         self.schedule_controller = DiaryScheduleController(self)
         self.view_controller = DiaryViewController(self)
@@ -576,12 +579,81 @@ class DiaryWidget(Advisor):
     def check_update(self):
         '''
         this function is called automatically every 30 seconds.
+        the books on display are probed for changes, and only those which
+        have changed are re-read and redrawn.
         '''
         # LOGGER.debug("check_update")
-        if self.isVisible():
+        if not self.isVisible():
+            self.triangles()
+            return
+        if self.signature_dates != self.displayed_dates():
             self.layout_diary(True)
-        else:
+            return
+        i = self.ui.diary_tabWidget.currentIndex()
+        signatures = appointments.diary_signatures(
+            *self.signature_dates, include_slots=i in (0, 1, 4))
+        changed = appointments.changed_books(
+            self.diary_signatures, signatures)
+        appointments.invalidate_changed_books(changed)
+        incremental = self.schedule_controller.mode in (self.VIEW_MODE,
+                                                        self.NOTES_MODE)
+        if i == 0 and self.viewing_day:
+            patient_locations = locations.locations()
+            self.update_locations(patient_locations)
+            apptixs = set()
+            for table, adate, apptix in changed:
+                if table != "aslot":
+                    incremental = False
+                    apptixs.add(apptix)
+                elif apptix in self.appointmentData.workingDents:
+                    apptixs.add(apptix)
+            if not apptixs:
+                # changes (if any) are to books which are not displayed.
+                self.diary_signatures = signatures
+                self.triangles()
+            elif incremental:
+                self.diary_signatures = signatures
+                self.refresh_books(apptixs, patient_locations)
+            else:
+                self.layout_diary(True)
+        elif not changed:
             self.triangles()
+        elif i == 1 and self.viewing_week and incremental:
+            self.diary_signatures = signatures
+            self.refresh_week_days(set(adate for table, adate, apptix
+                                       in changed))
+        else:
+            self.layout_diary(True)
+
+    def displayed_dates(self):
+        '''
+        the dates (start inclusive, end exclusive) shown on the current tab
+        '''
+        date_ = self.selected_date()
+        i = self.ui.diary_tabWidget.currentIndex()
+        if i == 1:
+            start = date_.addDays(1 - date_.dayOfWeek())
+            end = start.addDays(7)
+        elif i == 2:
+            start = QtCore.QDate(date_.year(), date_.month(), 1)
+            end = start.addMonths(1)
+        elif i == 3:
+            start = QtCore.QDate(date_.year(), 1, 1)
+            end = start.addYears(1)
+        else:
+            start = date_
+            end = date_.addDays(1)
+        return start.toPyDate(), end.toPyDate()
+
+    def record_signatures(self):
+        '''
+        probe the books which are about to be laid out, so that check_update
+        can tell what has changed since.
+        '''
+        self.signature_dates = self.displayed_dates()
+        self.diary_signatures = appointments.diary_signatures(
+            *self.signature_dates,
+            include_slots=self.ui.diary_tabWidget.currentIndex() in (0, 1, 4))
 
     def aptFontSize(self, e):
         '''
@@ -762,6 +834,7 @@ class DiaryWidget(Advisor):
         grab year memos
         '''
         LOGGER.debug("DiaryWidget.layout_year")
+        self.record_signatures()
 
         year = self.selected_date().year()
         startdate = datetime.date(year, 1, 1)
@@ -820,6 +893,7 @@ class DiaryWidget(Advisor):
         grab month memos
         '''
         LOGGER.debug("DiaryWidget.layout_month")
+        self.record_signatures()
 
         qdate = self.selected_date()
         startdate = datetime.date(qdate.year(), qdate.month(), 1)
@@ -848,6 +922,7 @@ class DiaryWidget(Advisor):
             return
 
         LOGGER.debug("DiaryWidget.layout_weekView")
+        self.record_signatures()
 
         self.ui.week_view_control_frame.setLayout(self.control_layout)
 
@@ -858,32 +933,23 @@ class DiaryWidget(Advisor):
         weekdates = []
 
         for day in range(7):
-            weekday = (date_.addDays(day + 1 - dayno))
-            weekdates.append(weekday)
-            header = self.ui.apptoverviewControls[day]
-            header.setDate(weekday)
-            pydate = weekday.toPyDate()
-            memo = appointments.getBankHol(pydate)
-            gm = appointments.getGlobalMemo(pydate)
-            header.setMemo("<br />".join((memo, gm)))
+            weekdates.append(date_.addDays(day + 1 - dayno))
 
-        for ov in self.ui.apptoverviews:
-            ov.date = weekdates[self.ui.apptoverviews.index(ov)]
-            ov.clear()
-            ov.mode = self.schedule_controller.mode
+        # - all the data for the week in 3 queries
+        week = appointments.week_data(weekdates[0].toPyDate())
 
-            ov.dents = \
-                self.view_controller.clinician_days(ov.date.toPyDate())
+        for day in range(7):
+            header = self.ui.apptoverviewControls[day]
+            header.setDate(weekdates[day])
+            header.setMemo("<br />".join((week[day].bank_holiday,
+                                          week[day].global_memo)))
 
-            for dent in ov.dents:
-                self.current_weekViewClinicians.add(dent.ix)
+        for day, ov in enumerate(self.ui.apptoverviews):
+            ov.date = weekdates[day]
+            self.init_overview(ov, week[day])
 
-            ov.init_dicts()
             for dent in ov.dents:
-                ov.setStartTime(dent)
-                ov.setEndTime(dent)
-                ov.setMemo(dent)
-                ov.setFlags(dent)
+                self.current_weekViewClinicians.add(dent.ix)
 
         # if scheduling.. add slots to the widgets
 
@@ -904,22 +970,83 @@ class DiaryWidget(Advisor):
                     if slot.date_time.date() == ov.date.toPyDate():
                         ov.addSlot(slot)
 
+        # add appointments, lunches and blocks
+        for day, ov in enumerate(self.ui.apptoverviews):
+            ov.load_day_data(week[day])
+
+        self.chosen_slot_changed(triggered=False)
+
         for ov in self.ui.apptoverviews:
+            ov.update()
+
+    def init_overview(self, ov, day_data):
+        '''
+        reset one day of the week view for the clinicians in day_data
+        '''
+        ov.clear()
+        ov.mode = self.schedule_controller.mode
+
+        ov.dents = self.view_controller.clinician_days(
+            ov.date.toPyDate(), day_data)
+
+        ov.init_dicts()
+        for dent in ov.dents:
+            ov.setStartTime(dent)
+            ov.setEndTime(dent)
+            ov.setMemo(dent)
+            ov.setFlags(dent)
+
+    def refresh_week_days(self, dates):
+        '''
+        re-read and redraw only those days of the week view which are in dates
+        '''
+        LOGGER.debug("DiaryWidget.refresh_week_days %s", sorted(dates))
+        for day, ov in enumerate(self.ui.apptoverviews):
             date_ = ov.date.toPyDate()
-            for dent in ov.dents:
-                ov.appts[dent.ix] = appointments.day_summary(date_, dent.ix)
+            if date_ not in dates:
+                continue
+            day_data = appointments.week_data(date_, 1)[0]
+            self.ui.apptoverviewControls[day].setMemo(
+                "<br />".join((day_data.bank_holiday, day_data.global_memo)))
+            self.init_overview(ov, day_data)
+            ov.load_day_data(day_data)
+            ov.update()
 
-        # add lunches and blocks
+        self.current_weekViewClinicians = set()
         for ov in self.ui.apptoverviews:
-            date_ = ov.date.toPyDate()
             for dent in ov.dents:
-                ov.eTimes[dent.ix] = appointments.getBlocks(date_, dent.ix)
-                ov.lunches[dent.ix] = appointments.getLunch(date_, dent.ix)
+                self.current_weekViewClinicians.add(dent.ix)
 
-        self.chosen_slot_changed(triggered=False)
+    def refresh_books(self, apptixs, patient_locations):
+        '''
+        re-read and redraw only the day view books of the clinicians in apptixs
+        '''
+        LOGGER.debug("DiaryWidget.refresh_books %s", apptixs)
+        self.day_locations = patient_locations
+        self.appointmentData.refresh_appointments(apptixs)
+        for book in self.apptBookWidgets:
+            if book.dentist is None or book.dentist not in apptixs:
+                continue
+            book.clearAppts()
+            book.set_locations(patient_locations)
+            for app in self.appointmentData.dentAppointments(book.dentist):
+                book.setAppointment(app)
+        self.triangles(False)
+        for book in self.apptBookWidgets:
+            if book.dentist in apptixs:
+                book.update()
 
-        for ov in self.ui.apptoverviews:
-            ov.update()
+    def update_locations(self, patient_locations):
+        '''
+        show changed patient locations on the day view books in place,
+        without re-reading the appointments.
+        '''
+        if not self.viewing_day or patient_locations == self.day_locations:
+            return
+        LOGGER.debug("DiaryWidget.update_locations")
+        self.day_locations = patient_locations
+        for book in self.apptBookWidgets:
+            book.update_locations(patient_locations)
 
     def layout_dayView(self, automatic=False):
         '''
@@ -929,6 +1056,7 @@ class DiaryWidget(Advisor):
             return
 
         LOGGER.debug("DiaryWidget.layout_dayView")
+        self.record_signatures()
         self.ui.emergency_dayview_scroll_bar.hide()
         self.ui.dayCalendar_frame.setLayout(self.calendar_layout)
         self.ui.day_view_control_frame.setLayout(self.control_layout)
@@ -946,6 +1074,7 @@ class DiaryWidget(Advisor):
         self.appointmentData.setDate(date_)
         self.appointmentData.getAppointments(dents)
         patient_locations = locations.locations()
+        self.day_locations = patient_locations
 
         if self.schedule_controller.mode == self.SCHEDULING_MODE:
             # self.schedule_controller.clear_slots()
@@ -1084,6 +1213,7 @@ class DiaryWidget(Advisor):
         '''
         if self.ui.diary_tabWidget.currentIndex() != 4:
             return
+        self.record_signatures()
         self.ui.agenda_calendar_frame.setLayout(self.calendar_layout)
         self.ui.agenda_control_frame.setLayout(self.control_layout)
 
@@ -1357,6 +1487,9 @@ class DiaryWidget(Advisor):
                     date_ = date_.addDays(-1)
             else:
                 date_ = date_.addDays(-1)
+        if self.schedule_controller.mode == self.SCHEDULING_MODE:
+            date_ = QtCore.QDate(self.schedule_controller.next_possible_date(
+                date_.toPyDate(), forwards))
         self.signals_calendar(False)
         self.set_date(date_)
         self.signals_calendar()
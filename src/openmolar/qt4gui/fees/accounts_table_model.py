@@ -0,0 +1,263 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+provides AccountsTableModel, the model behind the accounts table.
+rows are streamed from the database by an AccountsLoaderThread, and added to
+the model a batch at a time, so the table is usable whilst it fills.
+'''
+
+import datetime
+import logging
+
+from PyQt5 import QtCore
+from PyQt5 import QtGui
+
+from openmolar import connect
+from openmolar.dbtools import accounts
+from openmolar.settings import localsettings
+
+LOGGER = logging.getLogger("openmolar")
+
+DENT_COL, SNO_COL, LAST_TX_COL, TC_COL, MONEY_COL = 0, 1, 5, 6, 7
+
+# columns of the debts table holding checkboxes for letters A, B and C
+TONE_COLS = (11, 12, 13)
+TONES = ("A", "B", "C")
+
+
+class AccountsLoaderThread(QtCore.QThread):
+    '''
+    streams rows from accounts.stream_details, emitting each batch.
+    '''
+    rows_signal = QtCore.pyqtSignal(object)
+
+    def __init__(self, kwargs, parent=None):
+        super(AccountsLoaderThread, self).__init__(parent)
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.exception = None
+
+    def run(self):
+        LOGGER.debug("loading accounts in background thread")
+        try:
+            for rows in accounts.stream_details(**self.kwargs):
+                if self.cancelled:
+                    break
+                self.rows_signal.emit(rows)
+        except Exception as exc:
+            LOGGER.exception("error loading accounts")
+            self.exception = exc
+        finally:
+            connect.params.release_connection()
+
+
+class AccountsTableModel(QtCore.QAbstractTableModel):
+    '''
+    patients in debt (or in credit).
+    cell values are only formatted as the view asks for them.
+    '''
+    rows_loaded_signal = QtCore.pyqtSignal()
+    finished_signal = QtCore.pyqtSignal(object)  # exception or None
+
+    def __init__(self, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.show_debts = True
+        self.total = 0
+        self._rows = []
+        self._tones = {}  # serialno: set of checked tone columns
+        self._loader = None
+
+    @property
+    def headers(self):
+        headers = [_("Dent"), _("Serialno"), "", _("Name"), _("Status"),
+                   _("Last Tx"), _("T/C")]
+        if self.show_debts:
+            headers.extend([_("Fees"), _("Last Bill"), _("Type"),
+                            _("Number")] + list(TONES))
+        else:
+            headers.append(_("Credit"))
+        headers.append(_("Memo"))
+        return headers
+
+    @property
+    def is_loading(self):
+        return self._loader is not None
+
+    def load(self, show_debts, amount, conditions, values):
+        '''
+        clear the model, and start streaming rows into it.
+        '''
+        self.cancel()
+        self.beginResetModel()
+        self.show_debts = show_debts
+        self.total = 0
+        self._rows = []
+        self._tones = {}
+        self.endResetModel()
+        self._loader = AccountsLoaderThread(
+            {"greater_than": show_debts,
+             "amount": amount,
+             "extra_conditions": conditions,
+             "extra_values": values},
+            self)
+        self._loader.rows_signal.connect(self.add_rows)
+        self._loader.finished.connect(self._loader_finished)
+        self._loader.start()
+
+    def cancel(self):
+        '''
+        stop listening to a load in progress.
+        '''
+        if self._loader is not None:
+            self._loader.cancelled = True
+            self._loader.rows_signal.disconnect(self.add_rows)
+            self._loader.finished.disconnect(self._loader_finished)
+            self._loader = None
+
+    def _loader_finished(self):
+        exception = self._loader.exception
+        self._loader = None
+        self.finished_signal.emit(exception)
+
+    def add_rows(self, rows):
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first,
+                             first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+        for row in rows:
+            self.total += row[MONEY_COL] if self.show_debts \
+                else -row[MONEY_COL]
+        self.rows_loaded_signal.emit()
+
+    def _value(self, row, col):
+        '''
+        the database value for a column of the table.
+        '''
+        db_row = self._rows[row]
+        if col == len(self.headers) - 1:
+            return db_row[11]
+        if col in TONE_COLS:
+            return None
+        return db_row[col]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (orientation == QtCore.Qt.Horizontal and
+                role == QtCore.Qt.DisplayRole):
+            return self.headers[section]
+        return None
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if self.show_debts and index.column() in TONE_COLS:
+            flags |= QtCore.Qt.ItemIsUserCheckable
+        return flags
+
+    def text(self, row, col):
+        '''
+        the value of a cell, as a string.
+        '''
+        val = self._value(row, col)
+        if val is None:
+            return ""
+        if col == DENT_COL:
+            return localsettings.ops.get(val, "")
+        if col == TC_COL and not val:
+            return _("Under Treatment")
+        if col == MONEY_COL:
+            if not self.show_debts:
+                val = -val
+            return ("%.02f" % float(val / 100)).rjust(8, " ")
+        return str(val)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if role == QtCore.Qt.DisplayRole:
+            val = self._value(row, col)
+            if isinstance(val, datetime.date):
+                return QtCore.QDate(val)
+            return self.text(row, col) or None
+        if role == QtCore.Qt.CheckStateRole:
+            if self.show_debts and col in TONE_COLS:
+                checked = self._tones.get(self.serialno(row), ())
+                return QtCore.Qt.Checked if col in checked \
+                    else QtCore.Qt.Unchecked
+        elif col == MONEY_COL:
+            if role == QtCore.Qt.ForegroundRole:
+                return QtGui.QBrush(
+                    QtCore.Qt.red if self.show_debts else QtCore.Qt.darkBlue)
+            if role == QtCore.Qt.TextAlignmentRole:
+                return QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if (role != QtCore.Qt.CheckStateRole or not self.show_debts or
+                index.column() not in TONE_COLS):
+            return False
+        checked = self._tones.setdefault(self.serialno(index.row()), set())
+        if value == QtCore.Qt.Checked:
+            checked.add(index.column())
+        else:
+            checked.discard(index.column())
+        self.dataChanged.emit(index, index)
+        return True
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        if column in TONE_COLS and self.show_debts:
+            def key(row):
+                return sorted(self._tones.get(row[SNO_COL], ()))
+        else:
+            def key(row):
+                val = row[11] if column == len(self.headers) - 1 \
+                    else row[column]
+                # None sorts first, and mixed types (eg. T/C holds a date
+                # or 0) are grouped rather than compared.
+                return (val is not None, type(val).__name__, val)
+        self.layoutAboutToBeChanged.emit()
+        self._rows.sort(key=key, reverse=order == QtCore.Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+    def serialno(self, row):
+        return self._rows[row][SNO_COL]
+
+    def chosen_letters(self):
+        '''
+        (serialno, tone) for each letter checked by the user, in table order.
+        '''
+        for row in range(len(self._rows)):
+            checked = self._tones.get(self.serialno(row), ())
+            for col in TONE_COLS:
+                if col in checked:
+                    yield self.serialno(row), TONES[TONE_COLS.index(col)]
@@ -26,12 +26,14 @@ this module provides a model class so that feescales can be displayed
 (and in the long term adjusted?)
 '''
 
+from collections import OrderedDict
 import logging
 
 from PyQt5 import QtCore
 from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 from openmolar.settings import localsettings
+from openmolar.settings.fee_tables import SearchIndex
 
 HIDE_RARE_CODES = 1  # fee items can be flagged as "obscure" in the XML
 
@@ -42,6 +44,9 @@ HIDE_RARE_CODES = 1  # fee items can be flagged as "obscure" in the XML
 
 LOGGER = logging.getLogger("openmolar")
 
+# itemcode, usercode, description and brief description
+SEARCHABLE_COLUMNS = (0, 1, 2, 3)
+
 
 class TreeItem(object):
 
@@ -132,7 +137,10 @@ class treeModel(QtCore.QAbstractItemModel):
 
         self.setupModelData()
         self.foundItems = []
+        self._found_cells = set()
         self.search_phrase = ""
+        self._search_index = None
+        self._cells = []
 
     def columnCount(self, parent):
         if parent.isValid():
@@ -147,7 +155,8 @@ class treeModel(QtCore.QAbstractItemModel):
         item = index.internalPointer()
         if role == QtCore.Qt.DisplayRole:
             return item.data(index.column())
-        if role == QtCore.Qt.BackgroundRole and index in self.foundItems:
+        if (role == QtCore.Qt.BackgroundRole and
+                (item, index.column()) in self._found_cells):
             return QtGui.QBrush(QtGui.QColor("yellow"))
         if role == QtCore.Qt.TextAlignmentRole:
             if index.column() > 3:
@@ -251,38 +260,55 @@ class treeModel(QtCore.QAbstractItemModel):
                 branch.appendChild(
                     TreeItem(self.table, key, feeItem, branch, row))
 
-    def searchNode(self, node, columns=()):
+    def build_search_index(self):
         '''
-        a function called recursively, looking at all nodes beneath node
+        index the displayed text of the searchable columns of every node
+        in the tree (so hidden items are not found).
         '''
-        matchflags = QtCore.Qt.MatchFlags(QtCore.Qt.MatchContains)
-        child = node.childItems[0]
-        # columns = range(child.columnCount()) ## <-- would search entire model
-        for column in columns:
-            start_index = self.createIndex(0, column, child)
-
-            indexes = self.match(start_index,
-                                 QtCore.Qt.DisplayRole,
-                                 self.search_phrase,
-                                 -1,
-                                 matchflags)
+        self._search_index = SearchIndex()
+        self._cells = []
 
-            for index in indexes:
-                self.foundItems.append(index)
+        def index_children(node):
+            for row, item in enumerate(node.childItems):
+                for column in SEARCHABLE_COLUMNS:
+                    text = item.data(column)
+                    if text:
+                        self._search_index.add(len(self._cells), text)
+                        self._cells.append((row, column, item))
+                index_children(item)
 
-        for child in node.childItems:
-            if child.childCount():
-                self.searchNode(child, columns)
+        index_children(self.rootItem)
+        LOGGER.debug("fee search index holds %d cells" % len(self._cells))
 
     def search(self, search_phrase, columns=()):
         self.foundItems = []
+        self._found_cells = set()
         self.search_phrase = search_phrase
         if search_phrase == "":
             return True
-        self.searchNode(self.rootItem, columns)
+        if self._search_index is None:
+            self.build_search_index()
+        for key in sorted(self._search_index.search(search_phrase)):
+            row, column, item = self._cells[key]
+            if column in columns:
+                self.foundItems.append(self.createIndex(row, column, item))
+                self._found_cells.add((item, column))
 
         return self.foundItems != []
 
+    @property
+    def found_parents(self):
+        '''
+        indexes of the nodes which need expanding to show the found items
+        '''
+        parents = OrderedDict()
+        for index in self.foundItems:
+            item = index.internalPointer().parentItem
+            while item not in (None, self.rootItem) and item not in parents:
+                parents[item] = self.createIndex(item.row(), 0, item)
+                item = item.parentItem
+        return list(parents.values())
+
 
 if __name__ == "__main__":
     def resize(arg):
@@ -29,7 +29,6 @@ script, concerning fees, accounts and graphical feescale display.
 import logging
 
 from PyQt5 import QtCore
-from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 
 from openmolar.settings import localsettings
@@ -182,13 +181,12 @@ def loadFeesTable(om_gui):
     i = om_gui.ui.chooseFeescale_comboBox.currentIndex()
 
     tableKeys = sorted(localsettings.FEETABLES.tables.keys())
-    om_gui.fee_models = []
+    # models are created when a feescale is first displayed
+    om_gui.fee_models = [None] * len(tableKeys)
     om_gui.ui.chooseFeescale_comboBox.clear()
 
     for key in tableKeys:
         table = localsettings.FEETABLES.tables[key]
-        model = fee_table_model.treeModel(table)
-        om_gui.fee_models.append(model)
         om_gui.ui.chooseFeescale_comboBox.addItem(table.briefName)
 
     text = "%d %s" % (len(om_gui.fee_models), _("Fee Scales Available"))
@@ -198,6 +196,37 @@ def loadFeesTable(om_gui):
         om_gui.ui.chooseFeescale_comboBox.setCurrentIndex(i)
 
 
+def fee_model(om_gui, i):
+    '''
+    the tree model for feescale i, created if necessary.
+    '''
+    model = om_gui.fee_models[i]
+    if model is None:
+        model = fee_table_model.treeModel(localsettings.FEETABLES.tables[i])
+        om_gui.fee_models[i] = model
+    return model
+
+
+def release_archived_feescales(om_gui, idle_for):
+    '''
+    free the memory used by feescales which are no longer current, and
+    have not been used for idle_for seconds. they are reloaded when needed.
+    the displayed feescale, and that of the loaded patient, are kept.
+    '''
+    if localsettings.FEETABLES is None:
+        return
+    tables = localsettings.FEETABLES.tables
+    keep = []
+    displayed = om_gui.ui.chooseFeescale_comboBox.currentIndex()
+    if displayed in tables:
+        keep.append(tables[displayed])
+    if om_gui.pt and om_gui.pt.serialno != 0:
+        keep.append(om_gui.pt.fee_table)
+    for i in localsettings.FEETABLES.unload_archived_tables(keep, idle_for):
+        if i < len(om_gui.fee_models):
+            om_gui.fee_models[i] = None
+
+
 def feetester(om_gui):
     '''
     raise an app which allows a few tests of the feetable logic
@@ -288,47 +317,52 @@ def table_clicked(om_gui, index):
             _apply(choice)
 
 
-def feeSearch(om_gui):
+def feeSearch(om_gui, as_you_type=False):
     '''
     user has finished editing the
     feesearchLineEdit - time to refill the searchList
+    if as_you_type, the user is still typing, so failure is not reported
+    with a message box.
     '''
-    def ensureVisible(index):
-        ''' expand all parents of a found leaf'''
-        parentIndex = model.parent(index)
-        om_gui.ui.feeScales_treeView.setExpanded(parentIndex, True)
-        if parentIndex.internalPointer() is not None:
-            ensureVisible(parentIndex)
-
     search_phrase = om_gui.ui.feeSearch_lineEdit.text()
+    try:
+        model = fee_model(
+            om_gui, om_gui.ui.chooseFeescale_comboBox.currentIndex())
+    except (IndexError, KeyError):  # feescales not loaded yet
+        return
     if search_phrase == "":
+        if as_you_type:
+            model.search("")
+            om_gui.ui.feesearch_results_label.setText("")
+            om_gui.ui.feeScales_treeView.viewport().update()
         return
-    model = om_gui.fee_models[
-        om_gui.ui.chooseFeescale_comboBox.currentIndex()]
 
     if om_gui.ui.search_itemcodes_radioButton.isChecked():
         columns = [0]
     else:  # om_gui.ui.search_descriptions_radioButton.isChecked():
-        columns = [2, 3]
+        columns = [1, 2, 3]
 
-    om_gui.wait(True)
+    tree_view = om_gui.ui.feeScales_treeView
     if model.search(search_phrase, columns):
-        om_gui.ui.feeScales_treeView.collapseAll()
-        indexes = model.foundItems
-
+        tree_view.setUpdatesEnabled(False)
+        tree_view.collapseAll()
+        for index in model.found_parents:
+            tree_view.setExpanded(index, True)
+        tree_view.setUpdatesEnabled(True)
         om_gui.ui.feesearch_results_label.setText(
-            "%d %s %s" % (len(indexes), _("Items containing"), search_phrase))
-        for index in indexes:
-            ensureVisible(index)
-        om_gui.wait(False)
+            "%d %s %s" % (len(model.foundItems), _("Items containing"),
+                          search_phrase))
     else:
-        om_gui.wait(False)
+        tree_view.viewport().update()
         message = _("phrase not found in feetable")
         if om_gui.ui.search_itemcodes_radioButton.isChecked():
             message += " " + _("itemcodes")
         else:
             message += " " + _("usercodes or descriptions")
-        om_gui.advise(message, 1)
+        if as_you_type:
+            om_gui.ui.feesearch_results_label.setText(message)
+        else:
+            om_gui.advise(message, 1)
 
 
 def chooseFeescale(om_gui, i):
@@ -351,7 +385,7 @@ def chooseFeescale(om_gui, i):
     om_gui.ui.feesearch_results_label.setText("")
 
     try:
-        om_gui.ui.feeScales_treeView.setModel(om_gui.fee_models[i])
+        om_gui.ui.feeScales_treeView.setModel(fee_model(om_gui, i))
     except IndexError:
         print(i, len(om_gui.fee_models))
         om_gui.advise(_("fee table error"), 2)
@@ -409,74 +443,38 @@ def populateAccountsTable(om_gui):
     if not dl.exec_():
         return
     om_gui.advise(_("Loading Accounts Table"))
-    om_gui.wait()
-    rows = accounts.details(greater_than=dl.show_debts,
-                            amount=dl.min_amount,
-                            extra_conditions=dl.conditions,
-                            extra_values=dl.values)
-    om_gui.ui.accounts_tableWidget.clear()
-    om_gui.ui.accounts_tableWidget.setSortingEnabled(False)
-    om_gui.ui.accounts_tableWidget.setRowCount(len(rows))
-
-    headers = [_("Dent"), _("Serialno"), "", _("Name"), _("Status"),
-               _("Last Tx"), _("T/C")]
-    if dl.show_debts:
-        headers.extend([_("Fees"), _("Last Bill"), _("Type"), _("Number"),
-                        "A", "B", "C"])
-    else:
-        headers.append(_("Credit"))
-    headers.append(_("Memo"))
-
-    om_gui.ui.accounts_tableWidget.setColumnCount(len(headers))
-    om_gui.ui.accounts_tableWidget.setHorizontalHeaderLabels(headers)
-    om_gui.ui.accounts_tableWidget.verticalHeader().hide()
-    om_gui.ui.accounts_tableWidget.horizontalHeader().setStretchLastSection(
-        True)
-    total = 0
-    om_gui.ui.accounts_tableWidget.setSortingEnabled(False)
-
-    for rowno, row in enumerate(rows):
-        for col, val in enumerate(row):
-            if col in (8, 9, 10) and not dl.show_debts:
-                continue
-            if val is not None:
-                item = QtWidgets.QTableWidgetItem()
-                if col == 0:
-                    item.setText(localsettings.ops.get(val))
-                elif col in (5, 8):
-                    item.setData(QtCore.Qt.DisplayRole, QtCore.QDate(val))
-                elif col == 6:
-                    if not val:
-                        item.setText(_("Under Treatment"))
-                    else:
-                        item.setData(QtCore.Qt.DisplayRole, QtCore.QDate(val))
-                elif col == 7:
-                    if dl.show_debts:
-                        total += val
-                        item.setForeground(QtGui.QBrush(QtCore.Qt.red))
-                        money = "%.02f" % float(val / 100)
-                    else:
-                        total += -val
-                        item.setForeground(QtGui.QBrush(QtCore.Qt.darkBlue))
-                        money = "%.02f" % float(-val / 100)
-                    item.setData(QtCore.Qt.DisplayRole, money.rjust(8, " "))
-                    item.setTextAlignment(
-                        QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
-                else:
-                    item.setText(str(val))
-                gui_col = col
-                if col == 11:
-                    gui_col = 14 if dl.show_debts else 8
-                om_gui.ui.accounts_tableWidget.setItem(rowno, gui_col, item)
-        if dl.show_debts:
-            for col in range(11, 14):
-                item = QtWidgets.QTableWidgetItem()
-                item.setCheckState(QtCore.Qt.Unchecked)
-                om_gui.ui.accounts_tableWidget.setItem(rowno, col, item)
-    om_gui.ui.accounts_tableWidget.sortItems(5, QtCore.Qt.DescendingOrder)
-    om_gui.ui.accounts_tableWidget.setSortingEnabled(True)
-    for i in range(om_gui.ui.accounts_tableWidget.columnCount()):
-        om_gui.ui.accounts_tableWidget.resizeColumnToContents(i)
-    om_gui.ui.accountsTotal_doubleSpinBox.setValue(total / 100)
-    om_gui.wait(False)
-    om_gui.ui.printSelectedAccounts_pushButton.setEnabled(dl.show_debts)
+    table = om_gui.ui.accounts_tableView
+    # rows arrive in order of last treatment, so sorting is re-enabled
+    # (with that order indicated) only when all are loaded.
+    table.setSortingEnabled(False)
+    table.model().load(show_debts=dl.show_debts,
+                       amount=dl.min_amount,
+                       conditions=dl.conditions,
+                       values=dl.values)
+    om_gui.ui.accountsTotal_doubleSpinBox.setValue(0)
+    om_gui.ui.printSelectedAccounts_pushButton.setEnabled(False)
+
+
+def accounts_rows_loaded(om_gui):
+    '''
+    a batch of rows has been added to the accounts table model
+    '''
+    model = om_gui.ui.accounts_tableView.model()
+    if model.rowCount() <= accounts.BATCH_SIZE:
+        # size the columns to the first batch only.
+        om_gui.ui.accounts_tableView.resizeColumnsToContents()
+    om_gui.ui.accountsTotal_doubleSpinBox.setValue(model.total / 100)
+
+
+def accounts_loaded(om_gui, exception):
+    '''
+    the accounts table model has finished loading
+    '''
+    table = om_gui.ui.accounts_tableView
+    if exception is not None:
+        om_gui.advise("%s<hr />%s" % (_("Error loading accounts"),
+                                      exception), 2)
+    table.horizontalHeader().setSortIndicator(5, QtCore.Qt.DescendingOrder)
+    table.setSortingEnabled(True)
+    om_gui.ui.printSelectedAccounts_pushButton.setEnabled(
+        table.model().show_debts)
@@ -0,0 +1,59 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+provides FeescaleLoaderThread, which parses the feescales in the background
+whilst the rest of the application is initialised.
+'''
+
+import logging
+
+from PyQt5 import QtCore
+
+from openmolar import connect
+from openmolar.settings import localsettings
+
+LOGGER = logging.getLogger("openmolar")
+
+
+class FeescaleLoaderThread(QtCore.QThread):
+    '''
+    calls localsettings.loadFeeTables, using a connection lent by the
+    connection pool.
+    any exception is held as an attribute, to be reported by the gui thread.
+    '''
+
+    def __init__(self, parent=None):
+        super(FeescaleLoaderThread, self).__init__(parent)
+        self.exception = None
+
+    def run(self):
+        LOGGER.debug("loading feescales in background thread")
+        try:
+            localsettings.loadFeeTables()
+        except Exception as exc:
+            LOGGER.exception("error loading feescales")
+            self.exception = exc
+        finally:
+            connect.params.release_connection()
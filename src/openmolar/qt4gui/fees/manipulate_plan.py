@@ -93,7 +93,9 @@ def add_treatments_to_plan(om_gui, treatments, completed=False):
         tx_hash = TXHash(hash_)
 
         dentid = pt.course_dentist
-        pt.treatment_course.__dict__["%spl" % att] += "%s " % shortcut
+        plan_att = "%spl" % att
+        setattr(pt.treatment_course, plan_att,
+                getattr(pt.treatment_course, plan_att) + "%s " % shortcut)
 
         # check for deciduous tooth.
         if re.match("[ul][lr][1-8]", att):
@@ -133,11 +135,10 @@ def add_treatment_to_estimate(om_gui, att, shortcut, dentid, tx_hashes,
         if itemcode != "-----":
             return itemcode, table
         LOGGER.debug("%s %s not matched by %s" % (att, shortcut, table))
-        for alt_table in localsettings.FEETABLES.tables.values():
-            if alt_table == table or not alt_table.is_current:
-                continue
-            alt_code = alt_table.getToothCode(att, shortcut)
-            if alt_code != "-----":
+        for alt_table, alt_code in \
+                localsettings.FEETABLES.tables_matching_tooth_code(
+                    att, shortcut):
+            if alt_table != table:
                 if QtWidgets.QMessageBox.question(
                     om_gui,
                     _("Confirm"),
@@ -160,11 +161,9 @@ def add_treatment_to_estimate(om_gui, att, shortcut, dentid, tx_hashes,
         if itemcode != "-----":
             return itemcode, table
         LOGGER.debug("%s not matched by %s" % (usercode, table))
-        for alt_table in localsettings.FEETABLES.tables.values():
-            if alt_table == table or not alt_table.is_current:
-                continue
-            alt_code = alt_table.getItemCodeFromUserCode(usercode)
-            if alt_code != "-----":
+        for alt_table, alt_code in \
+                localsettings.FEETABLES.tables_matching_user_code(usercode):
+            if alt_table != table:
                 if QtWidgets.QMessageBox.question(
                         om_gui, _("Confirm"),
                         "<p><b>%s</b> %s.</p><p>%s <em>%s</em></p><hr />%s" % (
@@ -655,7 +654,8 @@ def fromFeeTable(om_gui, fee_item, sub_index):
     for att in atts:
         if "%spl" % att not in pt.treatment_course.__dict__:
             att = "other"
-        pt.treatment_course.__dict__[att + "pl"] += "%s " % shortcut
+        setattr(pt.treatment_course, att + "pl",
+                getattr(pt.treatment_course, att + "pl") + "%s " % shortcut)
         new_plan = pt.treatment_course.__dict__[att + "pl"]
 
         descr = fee_item.description
@@ -930,7 +930,7 @@ def remove_treatments_from_plan_and_est(om_gui, treatments, completed=False):
                 if est.tx_hashes == []:
                     om_gui.pt.estimates.remove(est)
 
-        pt.treatment_course.__dict__[p_att] = new_val
+        setattr(pt.treatment_course, p_att, new_val)
 
         if re.match("[ul][lr[1-8]", att):
             plan = pt.treatment_course.__dict__["%spl" % att]
@@ -1170,11 +1170,11 @@ def tx_hash_complete(om_gui, tx_hash):
             att = localsettings.convert_deciduous(att)
             plan = pt.treatment_course.__dict__[att + "pl"].replace(
                 treat_code, "", 1)
-            pt.treatment_course.__dict__[att + "pl"] = plan
+            setattr(pt.treatment_course, att + "pl", plan)
 
             completed = pt.treatment_course.__dict__[att + "cmp"] \
                 + treat_code
-            pt.treatment_course.__dict__[att + "cmp"] = completed
+            setattr(pt.treatment_course, att + "cmp", completed)
 
             if re.match("[ul][lr][1-8]", att):
                 charts_gui.updateChartsAfterTreatment(
@@ -1254,12 +1254,12 @@ def tx_hash_reverse(om_gui, tx_hash):
 
             old_completed = pt.treatment_course.__dict__[att + "cmp"]
             new_completed = old_completed.replace(treat_code, "", 1)
-            pt.treatment_course.__dict__[att + "cmp"] = new_completed
+            setattr(pt.treatment_course, att + "cmp", new_completed)
 
             old_plan = pt.treatment_course.__dict__[att + "pl"]
             # doubly cautious here to ensure single space separation
             new_plan = "%s %s " % (old_plan.strip(" "), treat_code.strip(" "))
-            pt.treatment_course.__dict__[att + "pl"] = new_plan
+            setattr(pt.treatment_course, att + "pl", new_plan)
 
             if re.findall("[ul][lr][1-8]", att):
                 charts_gui.updateChartsAfterTreatment(
@@ -1308,6 +1308,8 @@ if __name__ == "__main__":
     app = QtWidgets.QApplication([])
     mw = maingui.OpenmolarGui()
     mw.getrecord(11956)
+    while mw.patient_loader.is_loading:  # records are loaded in a thread
+        app.processEvents()
     # disable the functions called
     mw.load_newEstPage = lambda: None
 
@@ -161,6 +161,9 @@ class ForumWidget(QtWidgets.QWidget):
     read_ids = set([])
     new_read_ids = set([])
     important_post_toggles = {}
+    last_ix = 0
+    _loaded_for = None
+    _alt_bg = False
 
     def __init__(self, parent=None):
         QtWidgets.QWidget.__init__(self, parent)
@@ -212,6 +215,8 @@ class ForumWidget(QtWidgets.QWidget):
         layout = QtWidgets.QVBoxLayout(self)
         layout.addWidget(self.splitter)
 
+        self.tree_items = {}
+
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.check_for_new_posts)
 
@@ -250,6 +255,8 @@ class ForumWidget(QtWidgets.QWidget):
     def refresh_button_clicked(self):
         LOGGER.debug("user forcing forum refresh")
         self.apply_new_reads()
+        if self._forum_user:
+            forum.recount_unread_posts(self._forum_user)
         self.loadForum()
 
     def showEvent(self, event=None):
@@ -258,7 +265,7 @@ class ForumWidget(QtWidgets.QWidget):
         if not self.spliiter_resized:
             self.splitter.setSizes([self.width()*.7, self.width()*.3])
         self.spliiter_resized = True
-        QtCore.QTimer.singleShot(100, self.loadForum)
+        QtCore.QTimer.singleShot(100, self.sync_forum)
 
     def hideEvent(self, event=None):
         self.apply_new_reads()
@@ -342,6 +349,10 @@ class ForumWidget(QtWidgets.QWidget):
 
     def clear(self):
         self.tree_widget.clear()
+        self.tree_items = {}
+        self.last_ix = 0
+        self._loaded_for = None
+        self._alt_bg = False
         self.browser_user_label.setText(_("No User Set"))
         self.clear_browser()
         self.new_read_ids = set([])
@@ -376,19 +387,41 @@ class ForumWidget(QtWidgets.QWidget):
                 "%s %s" % (_("Browing Forum as"), user))
 
         self.wait()
-        twidg = self.tree_widget
-        posts = forum.getPosts(user, self.show_deleted_cb.isChecked())
-        parentItems = {None: twidg}
+        include_closed = self.show_deleted_cb.isChecked()
+        self.add_posts(user, forum.getPosts(user, include_closed))
+        self._loaded_for = (user, include_closed)
+        self.wait(False)
+
+    def sync_forum(self):
+        '''
+        fetch only posts newer than those already in the tree, and add them.
+        if the tree was loaded for another user (or the archive option has
+        changed) the whole forum is reloaded.
+        '''
+        user = self.forum_user()
+        include_closed = self.show_deleted_cb.isChecked()
+        if not user or self._loaded_for != (user, include_closed):
+            self.loadForum()
+            return
+        self.apply_new_reads()
+        posts = forum.getPosts(user, include_closed, since_ix=self.last_ix)
+        LOGGER.debug("forum sync found %d new posts", len(posts))
+        if posts:
+            self.add_posts(user, posts)
 
-        alt_bg = False
+    def add_posts(self, user, posts):
+        '''
+        add posts to the tree, beneath their parents if already present.
+        '''
+        twidg = self.tree_widget
         for post in posts:
             try:
-                parentItem = parentItems[post.parent_ix]
+                parentItem = self.tree_items[post.parent_ix]
                 brush = parentItem.background(0)
             except KeyError:
                 parentItem = twidg
-                alt_bg = not alt_bg
-                brush = self.ALT_BRUSH if alt_bg else self.NORM_BRUSH
+                self._alt_bg = not self._alt_bg
+                brush = self.ALT_BRUSH if self._alt_bg else self.NORM_BRUSH
             item = QtWidgets.QTreeWidgetItem(parentItem)
             item.setText(0, post.topic)
             item.setData(0, QtCore.Qt.UserRole, post)
@@ -415,15 +448,14 @@ class ForumWidget(QtWidgets.QWidget):
                     item.setFont(i, self.bold_font)
                 if post.important:
                     item.setForeground(i, self.RED_BRUSH)
-            parentItems[post.ix] = item
+            self.tree_items[post.ix] = item
+            self.last_ix = max(self.last_ix, post.ix)
 
         twidg.expandAll()
 
         for i in range(twidg.columnCount()):
             twidg.resizeColumnToContents(i)
 
-        self.wait(False)
-
         twidg.verticalScrollBar().setValue(twidg.verticalScrollBar().maximum())
 
     def forumItemSelected(self):
@@ -567,7 +599,7 @@ class ForumWidget(QtWidgets.QWidget):
             post.recipient = dl.to_comboBox.currentText()
         ix = forum.commitPost(post)
         self.read_ids.add(ix)
-        self.loadForum()
+        self.sync_forum()
 
     def mark_all_as_read(self):
         '''
@@ -586,8 +618,9 @@ class ForumWidget(QtWidgets.QWidget):
                 post = item.data(0, QtCore.Qt.UserRole)
                 if post.ix not in self.read_ids:
                     self.new_read_ids.add(post.ix)
+                for i in range(5):
+                    item.setFont(i, QtWidgets.QApplication.font())
         self.apply_new_reads()
-        self.loadForum()
 
     def forumReply(self):
         '''
@@ -614,7 +647,7 @@ class ForumWidget(QtWidgets.QWidget):
             newpost.recipient = dl.to_comboBox.currentText()
             ix = forum.commitPost(newpost)
             self.read_ids.add(ix)
-        self.loadForum()
+        self.sync_forum()
 
     def forumParent(self):
         '''
@@ -41,7 +41,7 @@ from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 
 from openmolar.connect import params
-from openmolar.settings import localsettings, utilities
+from openmolar.settings import localsettings, startup_profile, utilities
 from openmolar.qt4gui import colours
 
 # - fee modules which interact with the gui
@@ -51,6 +51,8 @@ from openmolar.qt4gui.fees import manipulate_plan
 from openmolar.qt4gui.fees import daybook_module
 from openmolar.qt4gui.fees import cashbook_module
 from openmolar.qt4gui.fees import fee_table_model
+from openmolar.qt4gui.fees.feescale_loader import FeescaleLoaderThread
+from openmolar.qt4gui.fees.accounts_table_model import AccountsTableModel
 from openmolar.qt4gui.fees.treatment_list_models \
     import PlannedTreatmentListModel, CompletedTreatmentListModel
 
@@ -151,6 +153,7 @@ from openmolar.dbtools import schema_version
 from openmolar.dbtools import referral
 from openmolar.dbtools import records_in_use
 from openmolar.dbtools import locations
+from openmolar.dbtools import query_stats
 
 # -modules which act upon the pt class type (and subclasses)
 from openmolar.ptModules import patientDetails
@@ -168,6 +171,7 @@ from openmolar.qt4gui.printing import bulk_mail
 
 # -custom widgets
 from openmolar.qt4gui.diary_widget import DiaryWidget
+from openmolar.qt4gui.patient_loader import PatientLoader, PatientPrefetcher
 from openmolar.qt4gui.pt_diary_widget import PtDiaryWidget
 from openmolar.qt4gui.forum_widget import ForumWidget
 from openmolar.qt4gui.customwidgets import chartwidget
@@ -181,6 +185,13 @@ from openmolar.backports.advisor import Advisor
 
 LOGGER = logging.getLogger("openmolar")
 
+# milliseconds after the last keypress before the feescale is searched
+FEE_SEARCH_DELAY = 300
+
+# milliseconds between checks for archived feescales to release. a feescale
+# is released once it has been unused for this long.
+FEESCALE_RELEASE_INTERVAL = 600000
+
 
 class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
 
@@ -196,6 +207,8 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
     notes_loaded = False
     _db_connnection_progress_dialog = None
     _reloading_record = False
+    _feescales_handled = False
+    _initiated = False
 
     def __init__(self, parent=None):
         QtWidgets.QMainWindow.__init__(self, parent)
@@ -216,17 +229,42 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         # -make a deep copy to check for changes
         self.pt = patient_class.patient(0)
 
+        self.patient_loader = PatientLoader(self)
+        self.patient_prefetcher = PatientPrefetcher(self)
+        self.loading_dialog = QtWidgets.QProgressDialog(self)
+        self.loading_dialog.setWindowModality(QtCore.Qt.NonModal)
+        self.loading_dialog.setRange(0, 0)
+        self.loading_dialog.setCancelButtonText(_("Cancel"))
+        # reset stops QProgressDialog showing itself after 4 seconds.
+        self.loading_dialog.reset()
+
         self.selectedChartWidget = "st"  # other values are "pl" or "cmp"
         self.editPageVisited = False
         self.forum_notified = False
         self.fee_models = []
+        # search the feescale once the user pauses typing.
+        self.fee_search_timer = QtCore.QTimer(self)
+        self.fee_search_timer.setSingleShot(True)
+        self.fee_search_timer.setInterval(FEE_SEARCH_DELAY)
+        # archived feescales are loaded when used, and released periodically
+        self.feescale_release_timer = QtCore.QTimer(self)
+        self.feescale_release_timer.setInterval(FEESCALE_RELEASE_INTERVAL)
+        # feescales are parsed in the background whilst the app initiates
+        self.feescale_loader = FeescaleLoaderThread(self)
+        # startup is complete when all of these have finished.
+        self._startup_steps = set(["initiate", "feescales"])
         self.wikiloaded = False
 
-        self.addCustomWidgets()
+        with startup_profile.phase("add custom widgets"):
+            self.addCustomWidgets()
         self.labels_and_tabs()
 
         self.letters = bulk_mail.bulkMails(self)
         self.ui.bulk_mailings_treeView.setModel(self.letters.bulk_model)
+        self.ui.accounts_tableView.setModel(AccountsTableModel(self))
+        self.ui.accounts_tableView.verticalHeader().hide()
+        self.ui.accounts_tableView.horizontalHeader().setStretchLastSection(
+            True)
         self.ui.actionSurgery_Mode.setChecked(
             localsettings.station == "surgery")
         self.setupSignals()
@@ -265,7 +303,15 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         initiate settings etc.
         '''
         LOGGER.debug("Initiate")
+        # at startup, this thread runs whilst the settings are fetched from
+        # the database. later calls (eg. after adding a clinician) reload the
+        # feescales on this thread once the settings are current.
+        if not self._initiated:
+            self.feescale_loader.start()
         localsettings.initiate()
+        if self._initiated:
+            self.reload_feescales()
+        self._initiated = True
         self.setWindowTitle("OpenMolar - %s '%s'" % (
             _("connected to"), params.database_name))
 
@@ -283,13 +329,23 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         self.ui.actionCheck_Recall_Date_on_Exit_Record.setChecked(
             localsettings.CHECK_RECALL_ON_EXIT_RECORD)
         QtCore.QTimer.singleShot(500, self.load_todays_patients_combobox)
-        QtCore.QTimer.singleShot(1000, self.load_fee_tables)
         self.records_in_use_timer.start(5000)  # fire every 5 seconds
         self.records_in_use_timer.timeout.connect(self.check_records_in_use)
         self.set_referral_centres()
-        self.diary_widget.initiate()
+        with startup_profile.phase("initiate diary"):
+            self.diary_widget.initiate()
+        self.patient_prefetcher.start()
         QtCore.QTimer.singleShot(12000, self.check_version)
         self.forum_widget.log_in_successful()
+        self.startup_step_finished("initiate")
+
+    def startup_step_finished(self, step):
+        '''
+        a step of the application startup has finished.
+        '''
+        self._startup_steps.discard(step)
+        if not self._startup_steps:
+            startup_profile.startup_complete()
 
     def check_first_run(self):
         '''
@@ -334,6 +390,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
                 if dl.reception_radioButton.isChecked():
                     localsettings.station = "reception"
                 localsettings.setOperator(dl.user1, dl.user2)
+                startup_profile.mark("login accepted")
                 self.advise("%s %s %s" % (
                     _("Login by"), localsettings.operator, "accepted"))
                 self.check_schema()
@@ -362,6 +419,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         else:
             dl.background_exec()
 
+    @startup_profile.timed("check schema")
     def check_schema(self):
         '''
         check to see the client schema matches the server version
@@ -499,6 +557,8 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
             self.phrasebook_editor.raise_()
             self.phrasebook_editor.closeEvent(event)
 
+        self.patient_loader.wait()
+        self.patient_prefetcher.wait()
         utilities.deleteTempFiles()
 
     def fullscreen(self):
@@ -778,6 +838,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         if ci == 6:
             # -user is viewing the feetable
             if not self.feestableLoaded:
+                self.wait_for_feescales()
                 fees_module.loadFeesTable(self)
             if self.pt.serialno != 0:
                 self.ui.chooseFeescale_comboBox.setCurrentIndex(
@@ -933,6 +994,10 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         scroll to the bottom
         '''
         wv = self.sender()
+        if wv.property("showing_older_notes"):
+            # older notes are at the top, where the user clicked for them.
+            wv.setProperty("showing_older_notes", False)
+            return
         wv.scroll_to_bottom()
 
     def load_newEstPage(self):
@@ -1089,10 +1154,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
                 QtWidgets.QMessageBox.Yes)
             if result == QtWidgets.QMessageBox.Yes:
                 try:
-                    data, version = docsprinted.getData(ix)
-                    f = open(localsettings.TEMP_PDF, "wb")
-                    f.write(data)
-                    f.close()
+                    docsprinted.copy_to_path(ix, localsettings.TEMP_PDF)
                     localsettings.openPDF()
                 except Exception:  # general exception used as could be many
                     LOGGER.exception("view PDF error")
@@ -1161,10 +1223,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
             try:
                 fpath = os.path.join(localsettings.LOCALFILEDIRECTORY,
                                      "import_temp")
-                f = open(fpath, "wb")
-                for data in docsimported.getData(ix):
-                    f.write(data[0])
-                f.close()
+                docsimported.write_to_file(ix, fpath)
                 localsettings.openFile(fpath)
             except Exception:
                 LOGGER.exception("unable to open stored document")
@@ -1287,12 +1346,18 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         self.updateDetails()
         self.editPageVisited = False
 
-    def accountsTableClicked(self, row, column):
+    def accountsTableClicked(self, index):
         '''
         user has clicked on the accounts table - load the patient record
         '''
-        sno = self.ui.accounts_tableWidget.item(row, 1).text()
-        self.getrecord(int(sno))
+        sno = self.ui.accounts_tableView.model().serialno(index.row())
+        self.getrecord(sno)
+
+    def accounts_model_rows_loaded(self):
+        fees_module.accounts_rows_loaded(self)
+
+    def accounts_model_finished(self, exception):
+        fees_module.accounts_loaded(self, exception)
 
     def getrecord(self,
                   serialno,
@@ -1321,37 +1386,92 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
             self.advise(_("Not loading patient"))
             return
 
+        elif serialno == self.patient_loader.serialno:
+            LOGGER.info("record %s is already being loaded", serialno)
+            return
+
         if self.pt:
             current_address = self.pt.address_tuple
         else:
             current_address = localsettings.LAST_ADDRESS
 
         self.clearRecord()
+        # the patient is built in a background thread, and passed to
+        # patient_loaded (or patient_load_failed) when ready.
+        self.patient_loader.load(
+            serialno, (current_address, addToRecentSnos, newPatientReload))
+
+    def patient_loading(self, serialno):
+        '''
+        the patient loader has started loading serialno
+        (or has become idle, if serialno is None)
+        '''
+        if serialno is None:
+            self.loading_dialog.reset()
+            return
+        self.loadedPatient_label.setText(
+            "%s %s" % (_("Loading record"), serialno))
+        self.loading_dialog.setLabelText(
+            "%s %s" % (_("Loading record"), serialno))
+        # only show the dialog if loading takes a noticeable time.
+        QtCore.QTimer.singleShot(500, self.show_loading_dialog)
+
+    def show_loading_dialog(self):
+        if self.patient_loader.is_loading:
+            self.loading_dialog.show()
+
+    def cancel_patient_load(self):
+        '''
+        user has cancelled the loading of a record
+        '''
+        self.patient_loader.cancel()
+        self.loadedPatient_label.setText(_("No Patient Loaded"))
+        self.advise(_("Loading of record cancelled"))
+
+    def patient_loaded(self, pt, options):
+        '''
+        the patient loader has built the patient object requested by getrecord
+        '''
+        current_address, addToRecentSnos, newPatientReload = options
+        self.wait_for_feescales()
+        self.pt = pt
+        self.pt_diary_widget.set_patient(self.pt)
+        # update saved last address
+        if (current_address == localsettings.BLANK_ADDRESS or
+                self.pt.address_tuple != current_address):
+            localsettings.LAST_ADDRESS = current_address
+            localsettings.last_family_no = self.pt.familyno
+
         try:
-            # update saved last address
-            self.pt = patient_class.patient(serialno)
-            self.pt_diary_widget.set_patient(self.pt)
-            if (current_address == localsettings.BLANK_ADDRESS or
-                    self.pt.address_tuple != current_address):
-                localsettings.LAST_ADDRESS = current_address
-                localsettings.last_family_no = self.pt.familyno
+            self.loadpatient(newPatientReload=newPatientReload)
+        except Exception as e:
+            message = _("Error populating interface")
+            LOGGER.exception(message)
+            self.advise("<b>%s</b><hr /><pre>%s" % (message, e), 2)
 
-            try:
-                self.loadpatient(newPatientReload=newPatientReload)
-            except Exception as e:
-                message = _("Error populating interface")
-                LOGGER.exception(message)
-                self.advise("<b>%s</b><hr /><pre>%s" % (message, e), 2)
+        self.update_record_history(pt.serialno, addToRecentSnos)
 
-        except localsettings.PatientNotFoundError:
-            LOGGER.exception("Patient Not Found - %s", serialno)
+    def patient_load_failed(self, serialno, exc, options):
+        '''
+        the patient loader could not load serialno
+        '''
+        if isinstance(exc, localsettings.PatientNotFoundError):
+            LOGGER.error("Patient Not Found - %s", serialno)
             self.advise(_("error getting serialno") + " %d - " % serialno +
                         _("please check this number is correct?"), 1)
-        except Exception as exc:
-            LOGGER.exception("Unknown ERROR loading patient - serialno %s",
-                             serialno)
+        else:
+            LOGGER.error("Unknown ERROR loading patient - serialno %s",
+                         serialno, exc_info=exc)
             self.advise("Unknown Error - Tell Neil<br />%s" % exc, 2)
+        self.loadedPatient_label.setText(_("No Patient Loaded"))
+        current_address, addToRecentSnos, newPatientReload = options
+        self.update_record_history(serialno, addToRecentSnos)
 
+    def update_record_history(self, serialno, addToRecentSnos=True):
+        '''
+        update the list of recently visited records, and the forward/back
+        buttons, once a record has been loaded.
+        '''
         if addToRecentSnos:  # add to end of list
             try:
                 localsettings.recent_snos.remove(serialno)
@@ -1400,7 +1520,8 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         if i != 5 or self.notes_loaded:
             return
         self.set_note_preferences()
-        note_html = formatted_notes.notes(self.pt.notes_dict)
+        note_html = formatted_notes.notes(
+            self.pt.notes_dict, older_notes=self.pt.has_older_notes)
         self.ui.notes_webView.setHtml(note_html)
         self.ui.notes_webView.delegate_links()
         self.notes_loaded = True
@@ -1447,10 +1568,11 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
                 self.ui.reception_webview2.setHtml("hidden")
                 self.hide_reception_right_panel()
             else:
-                html_ = formatted_notes.rec_notes(
-                    self.pt.notes_dict,
-                    self.pt.treatment_course.accd
-                    )
+                accd = self.pt.treatment_course.accd
+                if accd:
+                    # course activity may predate the page of notes loaded.
+                    self.pt.load_notes_since(accd)
+                html_ = formatted_notes.rec_notes(self.pt.notes_dict, accd)
                 self.ui.reception_webview2.setHtml(html_)
                 self.hide_reception_right_panel(False)
             html_ = reception_summary.html(self.pt, is_summary)
@@ -1482,7 +1604,8 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
             self.ui.notesSummary_webView.setHtml(localsettings.message)
         elif not self.summary_notes_loaded:
             self.set_note_preferences()
-            note_html = formatted_notes.summary_notes(self.pt.notes_dict)
+            note_html = formatted_notes.summary_notes(
+                self.pt.notes_dict, self.pt.has_older_notes)
             self.ui.notesSummary_webView.setHtml(note_html)
             self.ui.notesSummary_webView.delegate_links()
             self.summary_notes_loaded = True
@@ -1776,6 +1899,9 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         self.debugMenu.addAction("Estimates table data")
         self.debugMenu.addAction("Perio table data")
         self.debugMenu.addAction("Changable Fields")
+        self.debugMenu.addSeparator()
+        self.query_report_action = self.debugMenu.addAction(
+            _("Slow query report"))
 
         self.ui.debug_toolButton.setMenu(self.debugMenu)
 
@@ -2202,10 +2328,25 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         '''
         self.feeSearch_pushButton_clicked()
 
+    def feeSearch_lineEdit_text_edited(self, text):
+        '''
+        user is typing in the fee search box, restart the countdown to
+        a search.
+        '''
+        self.fee_search_timer.start()
+
+    def fee_search_timer_timeout(self):
+        fees_module.feeSearch(self, as_you_type=True)
+
+    def feescale_release_timer_timeout(self):
+        fees_module.release_archived_feescales(
+            self, FEESCALE_RELEASE_INTERVAL / 1000)
+
     def feeSearch_pushButton_clicked(self, toggled=None):
         '''
         user is searching fees
         '''
+        self.fee_search_timer.stop()
         fees_module.feeSearch(self)
 
     def feescale_tester_pushButton_clicked(self):
@@ -2589,6 +2730,10 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         this is for my own debugging purposes
         I can view attributes in memory, and compare to the original db values
         '''
+        if arg == self.query_report_action:
+            self.debug_browser_refresh_func = query_stats.html_report
+            self.refresh_debug_browser()
+            return
         # -load a table of self.pt.attributes
         if arg is not None:
             txtype = str(arg.text()).split(" ")[0]
@@ -2774,6 +2919,9 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
     def notes_link_clicked(self, url):
         LOGGER.debug("notes link clicked '%s'", url)
         url_text = url.toString()
+        if url_text == formatted_notes.OLDER_NOTES_URL:
+            self.load_older_notes()
+            return
         m = re.match(r"om://edit_notes\?(\d+|__SNO__)", url_text)
         if m:
             if m.groups()[0] == "__SNO__":
@@ -2793,6 +2941,16 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         else:
             LOGGER.warning("unable to match clicked link '%s'", url)
 
+    def load_older_notes(self):
+        '''
+        the user has asked to see the page of notes before those shown.
+        '''
+        self.pt.load_older_notes()
+        wv = self.sender()
+        if wv is not None:
+            wv.setProperty("showing_older_notes", True)
+        self.load_notes()
+
     def show_diary(self):
         '''
         called when the diary widget itself has something to show.
@@ -2836,6 +2994,13 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         self.signals_history()
         self.signals_bulk_mail()
         self.signals_notes()
+        self.signals_patient_loader()
+
+    def signals_patient_loader(self):
+        self.patient_loader.loading_signal.connect(self.patient_loading)
+        self.patient_loader.loaded_signal.connect(self.patient_loaded)
+        self.patient_loader.failed_signal.connect(self.patient_load_failed)
+        self.loading_dialog.canceled.connect(self.cancel_patient_load)
 
     def signals_miscbuttons(self):
         '''
@@ -3082,8 +3247,12 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
             self.printSelectedAccounts)
         self.ui.printAccountsTable_pushButton.clicked.connect(
             self.printAccountsTable)
-        self.ui.accounts_tableWidget.cellDoubleClicked.connect(
+        self.ui.accounts_tableView.doubleClicked.connect(
             self.accountsTableClicked)
+        self.ui.accounts_tableView.model().rows_loaded_signal.connect(
+            self.accounts_model_rows_loaded)
+        self.ui.accounts_tableView.model().finished_signal.connect(
+            self.accounts_model_finished)
 
     def signals_contract(self):
         # contract
@@ -3129,6 +3298,12 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
             self.documents_pushButton_clicked)
         self.ui.feeSearch_lineEdit.returnPressed.connect(
             self.feeSearch_lineEdit_edited)
+        self.ui.feeSearch_lineEdit.textEdited.connect(
+            self.feeSearch_lineEdit_text_edited)
+        self.fee_search_timer.timeout.connect(self.fee_search_timer_timeout)
+        self.feescale_release_timer.timeout.connect(
+            self.feescale_release_timer_timeout)
+        self.feescale_loader.finished.connect(self.feescale_loader_finished)
         self.ui.search_descriptions_radioButton.toggled.connect(
             self.feeSearch_pushButton_clicked)
         self.ui.feeSearch_pushButton.clicked.connect(
@@ -3365,13 +3540,36 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         ds = DistinctStatuses()
         self.ui.status_comboBox.addItems(ds.DISTINCT_STATUSES)
 
-    def load_fee_tables(self):
-        localsettings.loadFeeTables()
-        for warning in localsettings.FEETABLES.warnings:
-            self.advise(
-                "<b>%s</b><hr />%s" % (_("error loading feetable"), warning),
+    def feescale_loader_finished(self):
+        '''
+        the background thread started by initiate has loaded the feescales
+        '''
+        if self._feescales_handled:
+            return
+        self._feescales_handled = True
+        if self.feescale_loader.exception is not None:
+            self.advise("<b>%s</b><hr />%s" % (
+                _("error loading feetable"), self.feescale_loader.exception),
                 2)
-        self.ui.cseType_comboBox.addItems(localsettings.CSETYPES)
+        else:
+            for warning in localsettings.FEETABLES.warnings:
+                self.advise("<b>%s</b><hr />%s" % (
+                    _("error loading feetable"), warning), 2)
+            self.ui.cseType_comboBox.addItems(localsettings.CSETYPES)
+            self.feescale_release_timer.start()
+        self.startup_step_finished("feescales")
+
+    def wait_for_feescales(self):
+        '''
+        block until the background load of the feescales has finished
+        (if it is still running).
+        '''
+        if self.feescale_loader.isRunning():
+            LOGGER.debug("waiting for the feescale loader")
+            with startup_profile.phase("wait for feescales"):
+                self.feescale_loader.wait()
+        if self.feescale_loader.isFinished():
+            self.feescale_loader_finished()
 
     def hide_rare_feescale_items(self, bool_):
         # TODO - this could actually have 3 levels.
@@ -3384,6 +3582,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
 
     def reload_feescales(self):
         self.advise(_("Reloading feescales from database"))
+        self.wait_for_feescales()
         localsettings.loadFeeTables()
         fees_module.loadFeesTable(self)
         if self.pt is not None:
@@ -3656,7 +3855,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         LOGGER.debug("checking records in use")
         users = []
         message = ""
-        for riu in records_in_use.get_usage_info(self.pt.serialno):
+        for riu in records_in_use.usage_info(self.pt.serialno):
             user = "%s - %s" % (riu.op, riu.location)
             if riu.surgeryno == localsettings.surgeryno:
                 continue
@@ -3719,11 +3918,12 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         dl = PatientLocationDialog(sno, self)
         if dl.exec_():
             self.advise(dl.message)
-            self.diary_widget.layout_diary()
             self.check_waiting()
 
     def check_waiting(self):
-        serialnos = locations.no_of_patients_waiting()
+        patient_locations = locations.locations()
+        self.diary_widget.update_locations(patient_locations)
+        serialnos = locations.no_of_patients_waiting(patient_locations)
         n = len(serialnos)
         if n == 0:
             message =_("No patients are waiting")
@@ -3743,7 +3943,7 @@ class OpenmolarGui(QtWidgets.QMainWindow, Advisor):
         dl = ClearLocationsDialog(self)
         if dl.exec_():
             self.advise(_("All Patient Locations have been cleared"))
-            self.diary_widget.layout_diary()
+            self.check_waiting()
 
     def save_prompting_prefs(self):
         '''
@@ -3775,7 +3975,8 @@ def main():
     '''
     os.chdir(os.path.expanduser("~"))
     app = QtWidgets.QApplication(sys.argv)
-    mainWindow = OpenmolarGui()
+    with startup_profile.phase("build main window"):
+        mainWindow = OpenmolarGui()
     sys.excepthook = mainWindow.excepthook
     mainWindow.show()
     mainWindow.setWindowState(QtCore.Qt.WindowMaximized)
@@ -0,0 +1,202 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+provides PatientLoader, which builds patient_class.patient objects in a
+background thread, so that the gui does not freeze whilst the (many) queries
+needed to load a record are executed.
+also PatientPrefetcher, which warms the patient cache with the records of
+patients due in over the next few hours.
+'''
+
+import logging
+
+from PyQt5 import QtCore
+
+from openmolar import connect
+from openmolar.dbtools import appointments
+from openmolar.dbtools import patient_class
+
+LOGGER = logging.getLogger("openmolar")
+
+
+class PatientLoaderThread(QtCore.QThread):
+    '''
+    loads one patient, using a connection lent by the connection pool.
+    the result (or exception) is held as an attribute for the PatientLoader.
+    '''
+
+    def __init__(self, serialno, options=None, parent=None):
+        super(PatientLoaderThread, self).__init__(parent)
+        self.serialno = serialno
+        self.options = options
+        self.patient = None
+        self.exception = None
+
+    def run(self):
+        LOGGER.debug("loading patient %s in background thread", self.serialno)
+        try:
+            self.patient = patient_class.patient(self.serialno)
+        except Exception as exc:
+            self.exception = exc
+        finally:
+            connect.params.release_connection()
+
+
+class PatientLoader(QtCore.QObject):
+    '''
+    loads patients off the gui thread.
+    only the most recent request is ever delivered - calling load whilst
+    another load is in flight supersedes it, and cancel discards it.
+    (queries cannot be safely interrupted, so superseded threads run to
+    completion, and their result is thrown away).
+    '''
+    loading_signal = QtCore.pyqtSignal(object)  # serialno, or None when idle
+    loaded_signal = QtCore.pyqtSignal(object, object)  # patient, options
+    # serialno, exception, options
+    failed_signal = QtCore.pyqtSignal(object, object, object)
+
+    def __init__(self, parent=None):
+        super(PatientLoader, self).__init__(parent)
+        self._current = None
+        self._threads = set()
+
+    @property
+    def is_loading(self):
+        return self._current is not None
+
+    @property
+    def serialno(self):
+        '''
+        the serialno of the record being loaded (or None)
+        '''
+        if self._current is None:
+            return None
+        return self._current.serialno
+
+    def load(self, serialno, options=None):
+        '''
+        start loading serialno. options are passed back with the patient.
+        '''
+        if self._current is not None:
+            LOGGER.info("loading of record %s superseded by %s",
+                        self._current.serialno, serialno)
+        thread = PatientLoaderThread(serialno, options)
+        thread.finished.connect(lambda: self._thread_finished(thread))
+        self._threads.add(thread)
+        self._current = thread
+        thread.start()
+        self.loading_signal.emit(serialno)
+
+    def cancel(self):
+        '''
+        forget about the load in progress (if any).
+        '''
+        if self._current is None:
+            return
+        LOGGER.info("loading of record %s cancelled", self._current.serialno)
+        self._current = None
+        self.loading_signal.emit(None)
+
+    def wait(self):
+        '''
+        cancel, and block until all background threads have finished.
+        should be called before the application exits.
+        '''
+        self.cancel()
+        for thread in list(self._threads):
+            thread.wait()
+
+    def _thread_finished(self, thread):
+        self._threads.discard(thread)
+        thread.deleteLater()
+        if thread is not self._current:
+            LOGGER.debug("discarding result of superseded load of record %s",
+                          thread.serialno)
+            return
+        self._current = None
+        self.loading_signal.emit(None)
+        if thread.exception is None:
+            self.loaded_signal.emit(thread.patient, thread.options)
+        else:
+            self.failed_signal.emit(
+                thread.serialno, thread.exception, thread.options)
+
+
+class PrefetchThread(QtCore.QThread):
+    '''
+    fetches the records of upcoming patients into the patient cache.
+    '''
+
+    def __init__(self, hours, parent=None):
+        super(PrefetchThread, self).__init__(parent)
+        self.hours = hours
+
+    def run(self):
+        try:
+            serialnos = appointments.upcoming_patients(self.hours)
+            LOGGER.debug("prefetching records %s", serialnos)
+            patient_class.prefetch(serialnos)
+        except Exception:
+            LOGGER.warning("patient prefetch failed", exc_info=True)
+        finally:
+            connect.params.release_connection()
+
+
+class PatientPrefetcher(QtCore.QObject):
+    '''
+    periodically prefetches the records of patients booked over the next
+    few hours, so that they load from cache when the patient arrives.
+    '''
+    INTERVAL = 300000  # 5 minutes
+    HOURS = 2
+
+    def __init__(self, parent=None):
+        super(PatientPrefetcher, self).__init__(parent)
+        self._thread = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.prefetch)
+
+    def start(self, delay=10000):
+        '''
+        prefetch after delay (ms), and every INTERVAL thereafter.
+        '''
+        QtCore.QTimer.singleShot(delay, self.prefetch)
+        self.timer.start(self.INTERVAL)
+
+    def prefetch(self):
+        if not self.timer.isActive():
+            return
+        if self._thread is not None and self._thread.isRunning():
+            return
+        self._thread = PrefetchThread(self.HOURS, self)
+        self._thread.start()
+
+    def wait(self):
+        '''
+        stop prefetching, and block until any prefetch in progress finishes.
+        '''
+        self.timer.stop()
+        if self._thread is not None:
+            self._thread.wait()
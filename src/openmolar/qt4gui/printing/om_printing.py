@@ -141,9 +141,9 @@ def printAccountsTable(om_gui):
     print the table
     '''
     # - set a pointer for readability
-    table = om_gui.ui.accounts_tableWidget
-    rowno = table.rowCount()
-    memo_col = table.columnCount() - 1
+    model = om_gui.ui.accounts_tableView.model()
+    rowno = model.rowCount()
+    memo_col = model.columnCount() - 1
     if rowno == 0:
         om_gui.advise(_("Nothing to print - have you loaded the table?"), 1)
         return()
@@ -165,17 +165,17 @@ def printAccountsTable(om_gui):
         else:
             html += '<tr>'
         for col in (0, 1, 2, 3, 4, 5, 6, 7, memo_col):
-            item = table.item(row, col)
-            if item:
+            text = model.text(row, col)
+            if text:
                 if col == 1:
-                    html += '<td align="right">%s</td>' % item.text()
+                    html += '<td align="right">%s</td>' % text
                 elif col == 7:
-                    money = localsettings.pencify(item.text())
+                    money = localsettings.pencify(text)
                     money_str = localsettings.formatMoney(money)
                     html += '<td align="right">%s</td>' % money_str
                     total += money
                 else:
-                    html += '<td>%s</td>' % item.text()
+                    html += '<td>%s</td>' % text
             else:
                 html += '<td> </td>'
         html += '</tr>\n'
@@ -489,59 +489,55 @@ def printSelectedAccounts(om_gui):
     have been selected to get an invoice
     '''
 
-    if om_gui.ui.accounts_tableWidget.rowCount() == 0:
+    model = om_gui.ui.accounts_tableView.model()
+    if model.rowCount() == 0:
         om_gui.advise("Please load the table first", 1)
         return
     firstPage = True
     no_printed = 0
-    for row in range(om_gui.ui.accounts_tableWidget.rowCount()):
-        for col in range(11, 14):
-            item = om_gui.ui.accounts_tableWidget.item(row, col)
-            if item.checkState():
-                tone = ("A", "B", "C")[col - 11]
-                sno = int(om_gui.ui.accounts_tableWidget.item(row, 1).text())
-                LOGGER.info("Account tone %s letter to %s", tone, sno)
-                printpt = patient_class.patient(sno)
-
-                doc = AccountLetter(printpt.title, printpt.fname, printpt.sname,
-                                    (printpt.addr1,
-                                     printpt.addr2,
-                                     printpt.addr3,
-                                     printpt.town,
-                                     printpt.county),
-                                    printpt.pcde, printpt.fees)
-                doc.setTone(tone)
-
-                if firstPage:
-                    # -raise a print dialog for the first letter of the run
-                    # -only
-                    if not doc.dialogExec():
-                        # - user has abandoned the print run
-                        return
-                    chosenPrinter = doc.printer
-                    chosenPageSize = doc.printer.pageSize()
-                    firstPage = False
-                else:
-                    doc.printer = chosenPrinter
-                    doc.printer.setPaperSize(chosenPageSize)
-                doc.requireDialog = False
-                if tone == "B":
-                    doc.setPreviousCorrespondenceDate(printpt.billdate)
-                if doc.print_():
-                    printpt.updateBilling(tone)
-                    printpt.addHiddenNote(
-                        "printed", "account - tone %s" % tone)
-
-                    patient_write_changes.discreet_changes(
-                        printpt, ("billct", "billdate", "billtype"))
-
-                    patient_write_changes.toNotes(sno,
-                                                  printpt.HIDDENNOTES)
-
-                    commitPDFtoDB(om_gui,
-                                  "Account tone%s" % tone, printpt.serialno)
-
-                    no_printed += 1
+    for sno, tone in list(model.chosen_letters()):
+        LOGGER.info("Account tone %s letter to %s", tone, sno)
+        printpt = patient_class.patient(sno)
+
+        doc = AccountLetter(printpt.title, printpt.fname, printpt.sname,
+                            (printpt.addr1,
+                             printpt.addr2,
+                             printpt.addr3,
+                             printpt.town,
+                             printpt.county),
+                            printpt.pcde, printpt.fees)
+        doc.setTone(tone)
+
+        if firstPage:
+            # -raise a print dialog for the first letter of the run
+            # -only
+            if not doc.dialogExec():
+                # - user has abandoned the print run
+                return
+            chosenPrinter = doc.printer
+            chosenPageSize = doc.printer.pageSize()
+            firstPage = False
+        else:
+            doc.printer = chosenPrinter
+            doc.printer.setPaperSize(chosenPageSize)
+        doc.requireDialog = False
+        if tone == "B":
+            doc.setPreviousCorrespondenceDate(printpt.billdate)
+        if doc.print_():
+            printpt.updateBilling(tone)
+            printpt.addHiddenNote(
+                "printed", "account - tone %s" % tone)
+
+            patient_write_changes.discreet_changes(
+                printpt, ("billct", "billdate", "billtype"))
+
+            patient_write_changes.toNotes(sno,
+                                          printpt.HIDDENNOTES)
+
+            commitPDFtoDB(om_gui,
+                          "Account tone%s" % tone, printpt.serialno)
+
+            no_printed += 1
     om_gui.advise("%d letters printed" % no_printed, 1)
 
 
@@ -68,6 +68,11 @@ UPGRADES_AVAILABLE = (
     ("3.5", ".schema3_4to3_5"),
     ("3.6", ".schema3_5to3_6"),
     ("3.7", ".schema3_6to3_7"),
+    ("3.8", ".schema3_7to3_8"),
+    ("3.9", ".schema3_8to3_9"),
+    ("4.0", ".schema3_9to4_0"),
+    ("4.1", ".schema4_0to4_1"),
+    ("4.2", ".schema4_1to4_2"),
 )
 
 MESSAGE = '''<h3>%s</h3>
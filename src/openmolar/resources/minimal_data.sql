@@ -40,7 +40,7 @@ UNLOCK TABLES;
 
 LOCK TABLES `settings` WRITE;
 /*!40000 ALTER TABLE `settings` DISABLE KEYS */;
-INSERT INTO `settings` VALUES (1,'wikiurl','http://openmolar.com/wiki',NULL,NULL,NULL,'neil@openmolar.com','2014-06-10 17:52:59'),(2,'Schema_Version','2.9',NULL,NULL,NULL,'neil@openmolar.com','2014-07-01 12:51:30'),(3,'Schema_Version','3.0',NULL,NULL,NULL,'2_9 to 3_0 script','2016-09-14 12:15:42'),(5,'Schema_Version','3.1',NULL,NULL,NULL,'3_0 to 3_1 script','2016-09-14 12:15:45'),(7,'Schema_Version','3.2',NULL,NULL,NULL,'3.1 to 3.2 script','2016-09-14 12:15:48'),(9,'Schema_Version','3.3',NULL,NULL,NULL,'3.2 to 3.3 script','2016-09-14 12:15:50'),(11,'Schema_Version','3.4',NULL,NULL,NULL,'3.3 to 3.4 script','2016-09-14 12:15:52'),(13,'Schema_Version','3.5',NULL,NULL,NULL,'3.4 to 3.5 script','2016-09-14 12:15:56'),(15,'Schema_Version','3.6',NULL,NULL,NULL,'3.5 to 3.6 script','2016-12-12 10:23:00'),(17,'Schema_Version','3.7',NULL,NULL,NULL,'3.6 to 3.7 script','2016-12-12 10:23:02'),(18,'compatible_clients','3.7',NULL,NULL,NULL,'Update script','2016-12-12 10:23:02');
+INSERT INTO `settings` VALUES (1,'wikiurl','http://openmolar.com/wiki',NULL,NULL,NULL,'neil@openmolar.com','2014-06-10 17:52:59'),(2,'Schema_Version','2.9',NULL,NULL,NULL,'neil@openmolar.com','2014-07-01 12:51:30'),(3,'Schema_Version','3.0',NULL,NULL,NULL,'2_9 to 3_0 script','2016-09-14 12:15:42'),(5,'Schema_Version','3.1',NULL,NULL,NULL,'3_0 to 3_1 script','2016-09-14 12:15:45'),(7,'Schema_Version','3.2',NULL,NULL,NULL,'3.1 to 3.2 script','2016-09-14 12:15:48'),(9,'Schema_Version','3.3',NULL,NULL,NULL,'3.2 to 3.3 script','2016-09-14 12:15:50'),(11,'Schema_Version','3.4',NULL,NULL,NULL,'3.3 to 3.4 script','2016-09-14 12:15:52'),(13,'Schema_Version','3.5',NULL,NULL,NULL,'3.4 to 3.5 script','2016-09-14 12:15:56'),(15,'Schema_Version','3.6',NULL,NULL,NULL,'3.5 to 3.6 script','2016-12-12 10:23:00'),(17,'Schema_Version','3.7',NULL,NULL,NULL,'3.6 to 3.7 script','2016-12-12 10:23:02'),(19,'Schema_Version','3.8',NULL,NULL,NULL,'3.7 to 3.8 script','2026-10-17 12:00:00'),(21,'Schema_Version','3.9',NULL,NULL,NULL,'3.8 to 3.9 script','2026-10-17 12:00:01'),(23,'Schema_Version','4.0',NULL,NULL,NULL,'3.9 to 4.0 script','2026-10-17 12:00:02'),(25,'Schema_Version','4.1',NULL,NULL,NULL,'4.0 to 4.1 script','2026-10-17 12:00:03'),(27,'Schema_Version','4.2',NULL,NULL,NULL,'4.1 to 4.2 script','2026-10-17 12:00:04'),(28,'compatible_clients','4.2',NULL,NULL,NULL,'Update script','2026-10-17 12:00:04');
 /*!40000 ALTER TABLE `settings` ENABLE KEYS */;
 UNLOCK TABLES;
 
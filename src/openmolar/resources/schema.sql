@@ -190,6 +190,23 @@ CREATE TABLE `cbcodes` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `change_feed`
+--
+
+DROP TABLE IF EXISTS `change_feed`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `change_feed` (
+  `ix` bigint(20) unsigned NOT NULL AUTO_INCREMENT,
+  `table_name` char(20) NOT NULL,
+  `serialno` int(11) DEFAULT NULL,
+  `time_stamp` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`ix`),
+  KEY `time_stamp` (`time_stamp`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `claims`
 --
@@ -485,6 +502,7 @@ CREATE TABLE `docsimported` (
   `size` bigint(20) unsigned NOT NULL DEFAULT '1024',
   `filedate` datetime NOT NULL DEFAULT '0000-00-00 00:00:00',
   `importime` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `doc_hash` char(40) DEFAULT NULL,
   PRIMARY KEY (`ix`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -505,6 +523,50 @@ CREATE TABLE `docsimporteddata` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `document_chunk_lists`
+--
+
+DROP TABLE IF EXISTS `document_chunk_lists`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `document_chunk_lists` (
+  `doc_hash` char(40) NOT NULL,
+  `seq` int(10) unsigned NOT NULL,
+  `chunk_hash` char(40) NOT NULL,
+  PRIMARY KEY (`doc_hash`,`seq`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `document_chunks`
+--
+
+DROP TABLE IF EXISTS `document_chunks`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `document_chunks` (
+  `chunk_hash` char(40) NOT NULL,
+  `compressed` tinyint(1) NOT NULL DEFAULT '0',
+  `data` blob NOT NULL,
+  PRIMARY KEY (`chunk_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `documents`
+--
+
+DROP TABLE IF EXISTS `documents`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `documents` (
+  `doc_hash` char(40) NOT NULL,
+  `size` bigint(20) unsigned NOT NULL,
+  PRIMARY KEY (`doc_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `est_link2`
 --
@@ -628,7 +690,7 @@ CREATE TABLE `formatted_notes` (
   `note` varchar(80) DEFAULT NULL,
   `timestamp` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   UNIQUE KEY `ix` (`ix`),
-  KEY `formatted_notes_serialno_index` (`serialno`)
+  KEY `formatted_notes_serialno_ndate_index` (`serialno`,`ndate`)
 ) ENGINE=InnoDB AUTO_INCREMENT=7 DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -684,6 +746,20 @@ CREATE TABLE `forum_parents` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `forum_unread`
+--
+
+DROP TABLE IF EXISTS `forum_unread`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `forum_unread` (
+  `op` char(8) NOT NULL,
+  `unread` int(11) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`op`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `forumread`
 --
@@ -697,10 +773,26 @@ CREATE TABLE `forumread` (
   `op` char(8) DEFAULT NULL,
   `readdate` datetime NOT NULL,
   PRIMARY KEY (`ix`),
-  KEY `id` (`id`)
+  KEY `id` (`id`),
+  KEY `forumread_op_index` (`op`,`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=6 DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `last_treatment`
+--
+
+DROP TABLE IF EXISTS `last_treatment`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `last_treatment` (
+  `serialno` int(11) NOT NULL,
+  `tx_date` date NOT NULL,
+  PRIMARY KEY (`serialno`),
+  KEY `tx_date` (`tx_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `locations`
 --
@@ -857,6 +949,7 @@ CREATE TABLE `newdocsprinted` (
   `docname` varchar(64) DEFAULT NULL,
   `docversion` smallint(6) DEFAULT NULL,
   `data` blob,
+  `doc_hash` char(40) DEFAULT NULL,
   PRIMARY KEY (`ix`),
   KEY `newdocsprinted_serialno_index` (`serialno`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
@@ -93,11 +93,13 @@ class DatabaseUpdaterThread(QtCore.QThread):
         self.db.rollback()
         self.db.close()
         self.db=None
+        connect.params.release_connection()
 
     def commit(self):
         self.db.commit()
         self.db.close()
         self.db=None
+        connect.params.release_connection()
 
     def update_schema_version(self, compatible_versions, message):
         schema_version.update(compatible_versions, message)
@@ -0,0 +1,92 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+'''
+This module provides a function 'run' which will move data
+to schema 4.0
+'''
+
+
+import logging
+
+from openmolar.schema_upgrades.database_updater_thread \
+    import DatabaseUpdaterThread
+
+LOGGER = logging.getLogger("openmolar")
+
+SQLSTRINGS = [
+    '''
+CREATE TABLE IF NOT EXISTS forum_unread (
+op CHAR(8) NOT NULL,
+unread INT NOT NULL DEFAULT 0,
+PRIMARY KEY (op)
+)
+    ''',
+    '''
+CREATE INDEX forumread_op_index ON forumread (op, id)
+    ''',
+    '''
+INSERT INTO forum_unread (op, unread)
+SELECT ops.op, (SELECT count(*) FROM forum WHERE open AND ix NOT IN
+(SELECT id FROM forumread WHERE forumread.op = ops.op))
+FROM (SELECT DISTINCT op FROM forumread WHERE op IS NOT NULL) AS ops
+ON DUPLICATE KEY UPDATE unread = VALUES(unread)
+    ''',
+]
+
+
+class DatabaseUpdater(DatabaseUpdaterThread):
+
+    '''
+    a class to update the database
+    '''
+
+    def run(self):
+        LOGGER.info("running script to convert from schema 3.9 to 4.0")
+        try:
+            self.connect()
+            # - execute the SQL commands
+            self.progressSig(10, _("creating new tables"))
+            self.execute_statements(SQLSTRINGS)
+            self.progressSig(97, _('updating settings'))
+            LOGGER.info("updating stored database version in settings table")
+
+            # older clients would not maintain the forum_unread counters.
+            self.update_schema_version(("4.0",), "3.9 to 4.0 script")
+
+            self.progressSig(100, _("updating stored schema version"))
+            self.commit()
+            self.completeSig(_("Successfully moved db to") + " 4.0")
+            return True
+        except Exception as exc:
+            LOGGER.exception("error upgrading schema")
+            self.rollback()
+            raise self.UpdateError(exc)
+
+
+if __name__ == "__main__":
+    dbu = DatabaseUpdater()
+    if dbu.run():
+        LOGGER.info("ALL DONE, conversion successful")
+    else:
+        LOGGER.warning("conversion failed")
@@ -23,16 +23,60 @@
 
 from collections import namedtuple
 from collections import OrderedDict
+import bisect
 import datetime
+import hashlib
 import logging
+import os
+import pickle
 import re
+import time
 from xml.dom import minidom
+from xml.etree import ElementTree
 
 from openmolar.settings import localsettings
 from openmolar.dbtools.feescales import feescale_handler
 
 LOGGER = logging.getLogger("openmolar")
 
+# parsed feescales are pickled here, one file per feescale.
+CACHE_DIRECTORY = os.path.join(localsettings.LOCALFILEDIRECTORY,
+                               "feescale_cache")
+
+# bump this whenever the attributes of FeeTable (or the classes it holds)
+# change, so that stale pickles are ignored.
+CACHE_VERSION = 4
+
+# attributes read from the head of the feescale, for every table at startup.
+METADATA_ATTRIBUTES = ("categories", "description", "startDate", "endDate",
+                       "headers")
+
+# attributes which are only loaded when a table is first used, and are
+# discarded by FeeTable.unload
+ITEM_ATTRIBUTES = ("feesDict", "complex_shortcuts", "treatmentCodes",
+                   "chartPlainCodes", "chartRegexCodes", "otherRegexCodes",
+                   "item_modifiers", "ui_lists")
+
+# lookups derived from the items, rebuilt as required.
+MEMO_ATTRIBUTES = ("_chart_matcher", "_other_matcher", "_code_memo",
+                   "_fee_memo", "_modifier_index")
+
+# the feescale metadata is parsed from chunks of this size until the first
+# item is reached.
+METADATA_CHUNK_SIZE = 8192
+
+# memoised lookups are dropped when a table has seen this many distinct keys
+MAX_MEMOISED_CODES = 5000
+
+TOOTH_ATT = re.compile("[ul][lr][1-8A-E]")
+
+# regex flags which can be applied to part of a pattern, as (?i:...)
+SCOPED_FLAGS = (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL),
+                ("x", re.VERBOSE))
+
+ChartButton = namedtuple('ChartButton',
+                         ("ix", "shortcut", "description", "tooltip"))
+
 
 def isParseable(data):
     '''
@@ -51,12 +95,10 @@ def getListFromNode(node, id):
     '''
     get the text data from the first child of any such nodes
     '''
-    nlist = node.getElementsByTagName(id)
     values = []
-    for n in nlist:
-        children = n.childNodes
-        for child in children:
-            values.append(child.data.strip())
+    for n in node.findall(".//%s" % id):
+        if n.text is not None:
+            values.append(n.text.strip())
     return values
 
 
@@ -64,13 +106,7 @@ def getTextFromNode(node, id):
     '''
     get the text data from the first child of any such nodes
     '''
-    nlist = node.getElementsByTagName(id)
-    text = ""
-    for n in nlist:
-        children = n.childNodes
-        for child in children:
-            text += child.data.strip()
-    return text
+    return "".join(getListFromNode(node, id))
 
 
 def getBoolFromNode(node, id, default=False):
@@ -87,6 +123,237 @@ def _stripped(xml_string):
         return xml_string.replace("&gt;", ">").replace("&lt;", "<")
 
 
+def _memoise(memo, key, value):
+    if len(memo) > MAX_MEMOISED_CODES:
+        memo.clear()
+    memo[key] = value
+
+
+def content_hash(xml_data):
+    '''
+    a digest of the feescale xml, used to validate the cached copy.
+    '''
+    if not isinstance(xml_data, bytes):
+        xml_data = xml_data.encode("utf8")
+    return hashlib.sha1(xml_data).hexdigest()
+
+
+def _cache_path(ix):
+    return os.path.join(CACHE_DIRECTORY, "feescale_%s.pickle" % ix)
+
+
+def _read_cache(ix, xml_hash, items=False):
+    '''
+    the cache file holds a header, then the metadata of the table, then its
+    items (each pickled separately, so the metadata can be read alone).
+    returns the metadata (or items) of feescale ix, or None if there is no
+    cached copy, or it was made from different xml.
+    '''
+    try:
+        with open(_cache_path(ix), "rb") as f:
+            if pickle.load(f) != (CACHE_VERSION, xml_hash):
+                LOGGER.debug("cached feescale %s is stale" % ix)
+                return None
+            cached = pickle.load(f)
+            if items:
+                cached = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        LOGGER.exception("unable to read cached feescale %s" % ix)
+        return None
+    return cached
+
+
+def load_cached_metadata(ix, xml_hash):
+    return _read_cache(ix, xml_hash)
+
+
+def load_cached_items(ix, xml_hash):
+    return _read_cache(ix, xml_hash, items=True)
+
+
+def save_cached_table(table):
+    '''
+    pickle a fully loaded FeeTable so the next startup can skip the xml.
+    '''
+    path = _cache_path(table.database_ix)
+    temp_path = path + ".tmp"
+    try:
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        with open(temp_path, "wb") as f:
+            pickle.dump((CACHE_VERSION, table.xml_hash), f,
+                        pickle.HIGHEST_PROTOCOL)
+            pickle.dump(table.metadata, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(table.items, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except Exception:
+        LOGGER.exception("unable to cache feescale %s" % table.database_ix)
+
+
+def _metadata_dom(xml_data):
+    '''
+    parse the feescale only as far as the first item, which (according to
+    the feescale schema) is beyond the description, dates and headers.
+    '''
+    parser = ElementTree.XMLPullParser(("start",))
+    root = None
+    for i in range(0, len(xml_data), METADATA_CHUNK_SIZE):
+        parser.feed(xml_data[i:i + METADATA_CHUNK_SIZE])
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+            elif element.tag == "item":
+                return root
+    parser.close()
+    return root
+
+
+class ShortcutMatcher(object):
+
+    '''
+    finds the first of an ordered sequence of (compiled regex, itemcode)
+    pairs which matches a code, as a loop over regex.match would.
+    the regexes are merged into one alternation per leading character, so a
+    lookup is a dictionary access and a single call to match.
+    '''
+
+    def __init__(self, regex_codes):
+        self.regex_codes = list(regex_codes)
+        self._dispatch = None
+        try:
+            dispatch = {}
+            for char in set(self._first_char(regex)
+                            for regex, itemcode in self.regex_codes):
+                dispatch[char] = self._combine(char)
+            self._dispatch = dispatch
+        except (re.error, ValueError) as exc:
+            LOGGER.warning(
+                "unable to combine shortcut regexes, will scan them (%s)" %
+                exc)
+
+    @staticmethod
+    def _first_char(regex):
+        '''
+        the character any match of this regex must start with,
+        or None if this cannot (cheaply) be known.
+        '''
+        pattern = regex.pattern
+        if (regex.flags & re.IGNORECASE or "|" in pattern or
+                len(pattern) < 2 or pattern[0] in "\\.^$*+?{}[]()" or
+                pattern[1] in "*?{"):
+            return None
+        return pattern[0]
+
+    def _combine(self, char):
+        '''
+        a single alternation of the regexes which could match a code starting
+        with char, each in its own group.
+        backreferences would be renumbered by this, so are not allowed.
+        flags (such as re.IGNORECASE) are kept by scoping them to the group.
+        '''
+        groups, itemcodes = [], {}
+        group_no = 1
+        for regex, itemcode in self.regex_codes:
+            if self._first_char(regex) not in (None, char):
+                continue
+            if re.search(r"\\\d|\(\?P=", regex.pattern):
+                raise ValueError("backreference in %s" % regex.pattern)
+            flags = "".join(
+                letter for letter, flag in SCOPED_FLAGS if regex.flags & flag)
+            if flags:
+                groups.append("((?%s:%s))" % (flags, regex.pattern))
+            else:
+                groups.append("(%s)" % regex.pattern)
+            itemcodes[group_no] = itemcode
+            group_no += regex.groups + 1
+        if not groups:
+            return None, itemcodes
+        return re.compile("|".join(groups)), itemcodes
+
+    def match(self, code):
+        '''
+        the itemcode of the first regex to match code, or None
+        '''
+        if self._dispatch is None:
+            for regex, itemcode in self.regex_codes:
+                if regex.match(code):
+                    return itemcode
+            return None
+        try:
+            combined, itemcodes = self._dispatch[code[:1]]
+        except KeyError:
+            combined, itemcodes = self._dispatch.get(None, (None, None))
+        if combined is None:
+            return None
+        m = combined.match(code)
+        if m is None:
+            return None
+        # the outermost group of the branch which matched closes last.
+        return itemcodes[m.lastindex]
+
+
+class SearchIndex(object):
+
+    '''
+    an inverted index of the words in some (short) texts, allowing quick,
+    case insensitive, substring searches of those texts.
+    every suffix of every word is held in a sorted list, so finding words
+    containing a fragment is a bisection on the fragment as a prefix.
+    '''
+    WORD = re.compile(r"\w+")
+
+    def __init__(self):
+        self._texts = {}
+        self._keys_by_word = {}
+        self._suffixes = None
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, key, text):
+        '''
+        index text, which will be found as key.
+        '''
+        text = text.lower()
+        self._texts[key] = text
+        for word in self.WORD.findall(text):
+            self._keys_by_word.setdefault(word, set()).add(key)
+        self._suffixes = None
+
+    def _words_containing(self, fragment):
+        if self._suffixes is None:
+            self._suffixes = sorted(set(
+                (word[i:], word) for word in self._keys_by_word
+                for i in range(len(word))))
+        words = set()
+        i = bisect.bisect_left(self._suffixes, (fragment, ""))
+        while i < len(self._suffixes):
+            suffix, word = self._suffixes[i]
+            if not suffix.startswith(fragment):
+                break
+            words.add(word)
+            i += 1
+        return words
+
+    def search(self, phrase):
+        '''
+        the keys of all texts containing phrase.
+        '''
+        phrase = phrase.lower()
+        candidates = None
+        for fragment in self.WORD.findall(phrase):
+            keys = set()
+            for word in self._words_containing(fragment):
+                keys.update(self._keys_by_word[word])
+            candidates = keys if candidates is None else candidates & keys
+            if not candidates:
+                return set()
+        if candidates is None:  # phrase is only punctuation or whitespace
+            candidates = self._texts
+        return set(key for key in candidates if phrase in self._texts[key])
+
+
 class FeeTables(object):
 
     '''
@@ -96,12 +363,8 @@ class FeeTables(object):
     def __init__(self):
         self.tables = OrderedDict()
         self.warnings = []
-        self._ui_crown_chart_buttons = None
-        self._ui_post_chart_buttons = None
-        self._ui_implant_chart_buttons = None
-        self._ui_fs_chart_buttons = None
-        self._ui_endo_chart_buttons = None
-        self._ui_surgical_chart_buttons = None
+        self._ui_buttons = {}
+        self._code_index = {}
 
         self.getTables()
         self.loadTables()
@@ -135,68 +398,67 @@ class FeeTables(object):
             return None
 
     def get_all_buts(self, att):
+        '''
+        unique buttons from the current tables, and any archived tables
+        which happen to be loaded (archived tables are not loaded just to
+        find their buttons).
+        results are remembered for each combination of tables.
+        '''
+        tables = [table for table in self.tables.values()
+                  if table.is_current or table.is_loaded]
+        key = (att, tuple(table.database_ix for table in tables))
+        try:
+            return self._ui_buttons[key]
+        except KeyError:
+            pass
         unique_shortcuts = set([])
         types_ = []
-        for table in list(self.tables.values()):
+        for table in tables:
             for button in table.ui_lists.get(att, []):
                 if button.shortcut not in unique_shortcuts:
                     types_.append(button)
                 unique_shortcuts.add(button.shortcut)
-        return sorted(types_, key=lambda x: x.ix)
+        self._ui_buttons[key] = sorted(types_, key=lambda x: x.ix)
+        return self._ui_buttons[key]
 
     @property
     def ui_fs_chart_buttons(self):
-        if self._ui_fs_chart_buttons is None:
-            self._ui_fs_chart_buttons = self.get_all_buts("fs_buttons")
-        return self._ui_fs_chart_buttons
+        return self.get_all_buts("fs_buttons")
 
     @property
     def ui_crown_chart_buttons(self):
         '''
         A list of unique crown types from all tables.
         '''
-        if self._ui_crown_chart_buttons is None:
-            self._ui_crown_chart_buttons = self.get_all_buts("crown_buttons")
-        return self._ui_crown_chart_buttons
+        return self.get_all_buts("crown_buttons")
 
     @property
     def ui_post_chart_buttons(self):
         '''
         A list of unique post types from all tables.
         '''
-        if self._ui_post_chart_buttons is None:
-            self._ui_post_chart_buttons = self.get_all_buts("post_buttons")
-        return self._ui_post_chart_buttons
+        return self.get_all_buts("post_buttons")
 
     @property
     def ui_implant_chart_buttons(self):
         '''
         A list of unique implant types from all tables.
         '''
-        if self._ui_implant_chart_buttons is None:
-            self._ui_implant_chart_buttons = \
-                self.get_all_buts("implant_buttons")
-        return self._ui_implant_chart_buttons
+        return self.get_all_buts("implant_buttons")
 
     @property
     def ui_endo_chart_buttons(self):
         '''
         A list of unique implant types from all tables.
         '''
-        if self._ui_endo_chart_buttons is None:
-            self._ui_endo_chart_buttons = \
-                self.get_all_buts("endo_buttons")
-        return self._ui_endo_chart_buttons
+        return self.get_all_buts("endo_buttons")
 
     @property
     def ui_surgical_chart_buttons(self):
         '''
         A list of unique implant types from all tables.
         '''
-        if self._ui_surgical_chart_buttons is None:
-            self._ui_surgical_chart_buttons = \
-                self.get_all_buts("surgical_buttons")
-        return self._ui_surgical_chart_buttons
+        return self.get_all_buts("surgical_buttons")
 
     def __repr__(self):
         '''
@@ -224,17 +486,22 @@ class FeeTables(object):
         '''
         rows = feescale_handler.get_feescales_from_database()
         for i, (ix, xml_data) in enumerate(rows):
-            ft = FeeTable(ix, xml_data)
+            xml_hash = content_hash(xml_data)
+            ft = FeeTable(ix, xml_data, xml_hash,
+                          load_cached_metadata(ix, xml_hash))
             ft.index = i
             self.tables[i] = ft
 
     def loadTables(self):
         '''
-        iterate through the child tables, and get them loaded
+        iterate through the current child tables, and get them loaded.
+        other tables are loaded if and when they are used.
         '''
         for table in list(self.tables.values()):
+            if not table.is_current:
+                continue
             try:
-                table.load_from_xml()
+                table.materialise()
             except Exception as exc:
                 message = "%s %s %s" % (
                     _("feesscale"),
@@ -245,6 +512,60 @@ class FeeTables(object):
                 LOGGER.exception(message)
                 self.warnings.append(message + "<hr /><pre>%s</pre>" % exc)
 
+    def unload_archived_tables(self, keep=(), idle_for=0):
+        '''
+        free the items of tables which are not current (except those in
+        keep, or used in the last idle_for seconds), they will be reloaded
+        if used again.
+        returns the indexes of the tables unloaded.
+        '''
+        unloaded = []
+        cutoff = time.time() - idle_for
+        for i, table in self.tables.items():
+            if (table.is_current or table in keep or
+                    not table.is_loaded or table.last_used > cutoff):
+                continue
+            table.unload()
+            unloaded.append(i)
+        return unloaded
+
+    def _matching_tables(self, key, lookup):
+        '''
+        (table, itemcode) for every current table in which lookup(table)
+        finds an itemcode. results are remembered, keyed on key.
+        '''
+        key += (datetime.date.today(),)
+        try:
+            return self._code_index[key]
+        except KeyError:
+            matches = []
+            for table in self.tables.values():
+                if not table.is_current:
+                    continue
+                itemcode = lookup(table)
+                if itemcode != "-----":
+                    matches.append((table, itemcode))
+            _memoise(self._code_index, key, matches)
+            return matches
+
+    def tables_matching_tooth_code(self, tooth, shortcut):
+        '''
+        (table, itemcode) for every current table which recognises the
+        chart shortcut.
+        '''
+        return self._matching_tables(
+            ("chart", tooth, shortcut),
+            lambda table: table.getToothCode(tooth, shortcut))
+
+    def tables_matching_user_code(self, usercode):
+        '''
+        (table, itemcode) for every current table which recognises the
+        usercode.
+        '''
+        return self._matching_tables(
+            ("other", usercode),
+            lambda table: table.getItemCodeFromUserCode(usercode))
+
     @property
     def all_other_shortcuts(self):
         for table in list(self.tables.values()):
@@ -257,43 +578,57 @@ class FeeTable(object):
 
     '''
     a class to contain and allow quick access to data stored in a fee table
+    only the metadata (description, dates etc.) is read when the table is
+    created, the fee items are loaded when first accessed.
     '''
+    # time.time() when the items were last loaded or looked up.
+    last_used = 0
 
-    def __init__(self, ix, xml_data):
+    def __init__(self, ix, xml_data, xml_hash=None, metadata=None):
         LOGGER.info("initiating Feetable %s" % ix)
         self.database_ix = ix
-        self.dom = minidom.parseString(xml_data)
-
-        self.setCategories()
-        self.setTableDescription()
-        self.setStartDate()
-        self.setEndDate()
-        self.setSectionHeaders()
-
-        self.feesDict = {}
+        self.xml_hash = xml_hash
+        self._xml_data = xml_data
+        if metadata is None:
+            self.dom = _metadata_dom(xml_data)
+            self.setCategories()
+            self.setTableDescription()
+            self.setStartDate()
+            self.setEndDate()
+            self.setSectionHeaders()
+        else:
+            LOGGER.debug("Feetable %s metadata read from cache" % ix)
+            self.__dict__.update(metadata)
+        self.dom = None
 
-        self.complex_shortcuts = []
-        self.treatmentCodes = OrderedDict()
-        self.chartPlainCodes = OrderedDict()
-        self.chartRegexCodes = OrderedDict()
-        self.otherRegexCodes = OrderedDict()
-        self.item_modifiers = []
+    def __getattr__(self, name):
+        '''
+        only called if name is not found in the usual way, which is the case
+        for the items of a table which has not yet been loaded.
+        '''
+        if name in ITEM_ATTRIBUTES or name in MEMO_ATTRIBUTES:
+            self.materialise()
+            return self.__dict__[name]
+        raise AttributeError(name)
 
-        self.ui_lists = {
-            "crown_buttons": [],
-            "implant_buttons": [],
-            "fs_buttons": [],
-            "endo_buttons": [],
-            "surgical_buttons": [],
-            "post_buttons": [],
-        }
+    def __setstate__(self, state):
+        '''
+        fee items are pickled without their table (see FeeItem.__getstate__)
+        '''
+        self.__dict__.update(state)
+        for fee_item in state.get("feesDict", {}).values():
+            fee_item.table = self
 
     def __repr__(self):
         '''
         a readable description of the object
         '''
+        if "feesDict" in self.__dict__:
+            n_items = len(self.feesDict)
+        else:
+            n_items = "(not loaded)"
         return "FeeTable %s database index %s - has %s feeItems" % (
-            self.briefName, self.database_ix, len(self.feesDict))
+            self.briefName, self.database_ix, n_items)
 
     def __hash__(self):
         '''
@@ -328,9 +663,9 @@ class FeeTable(object):
         '''
         LOGGER.debug("loading categories")
         self.categories = []
-        for node in self.dom.getElementsByTagName("category"):
+        for node in self.dom.findall(".//category"):
             try:
-                text = node.firstChild.data.strip(" \n")
+                text = node.text.strip(" \n")
                 self.categories.append(text)
             except AttributeError:  # no categories
                 pass
@@ -342,9 +677,9 @@ class FeeTable(object):
         '''
         LOGGER.debug("loading section headers")
         self.headers = {}
-        for node in self.dom.getElementsByTagName("header"):
-            id = node.getAttribute("id")
-            text = node.childNodes[0].data.strip(" \n")
+        for node in self.dom.findall(".//header"):
+            id = node.get("id", "")
+            text = node.text.strip(" \n")
             self.headers[id] = text
         LOGGER.debug("section headers = %s" % sorted(self.headers))
 
@@ -353,8 +688,8 @@ class FeeTable(object):
         a user friendly description of the table
         '''
         LOGGER.debug("loading feescale description")
-        node = self.dom.getElementsByTagName("feescale_description")[0]
-        text = node.childNodes[0].data.strip(" \n")
+        node = self.dom.findall(".//feescale_description")[0]
+        text = node.text.strip(" \n")
         self.description = text
         LOGGER.info("Feetable description = %s" % self.description)
 
@@ -363,10 +698,10 @@ class FeeTable(object):
         the date the feetable started (can be in the future)
         '''
         LOGGER.debug("loading startdate")
-        start_node = self.dom.getElementsByTagName("start")[0]
-        day = start_node.getElementsByTagName("day")[0].childNodes[0].data
-        month = start_node.getElementsByTagName("month")[0].childNodes[0].data
-        year = start_node.getElementsByTagName("year")[0].childNodes[0].data
+        start_node = self.dom.findall(".//start")[0]
+        day = start_node.findall(".//day")[0].text
+        month = start_node.findall(".//month")[0].text
+        year = start_node.findall(".//year")[0].text
         self.startDate = datetime.date(int(year), int(month), int(day))
         LOGGER.debug("startDate = %s" % self.startDate)
 
@@ -376,14 +711,14 @@ class FeeTable(object):
         '''
         LOGGER.debug("loading enddate")
         try:
-            end_node = self.dom.getElementsByTagName("end")[0]
+            end_node = self.dom.findall(".//end")[0]
         except IndexError:
             self.endDate = None
             LOGGER.debug("feescale is open ended (no end date)")
             return
-        day = end_node.getElementsByTagName("day")[0].childNodes[0].data
-        month = end_node.getElementsByTagName("month")[0].childNodes[0].data
-        year = end_node.getElementsByTagName("year")[0].childNodes[0].data
+        day = end_node.findall(".//day")[0].text
+        month = end_node.findall(".//month")[0].text
+        year = end_node.findall(".//year")[0].text
         self.endDate = datetime.date(int(year), int(month), int(day))
         LOGGER.debug("endDate = %s" % self.endDate)
 
@@ -396,28 +731,91 @@ class FeeTable(object):
             self.startDate <= datetime.date.today() <= self.endDate
 
     def get_ui_buttons(self, tagname):
-        for ix, node in enumerate(self.dom.getElementsByTagName(tagname)):
-            chart_button = namedtuple('Button', ("ix",
-                                                 "shortcut",
-                                                 "description",
-                                                 "tooltip"))
-            chart_button.ix = ix
-            chart_button.description = node.getAttribute("description")
-            chart_button.tooltip = node.getAttribute("tooltip")
-            chart_button.shortcut = node.getAttribute("shortcut")
-            yield (chart_button)
+        for ix, node in enumerate(self.dom.findall(".//%s" % tagname)):
+            yield ChartButton(ix,
+                              node.get("shortcut", ""),
+                              node.get("description", ""),
+                              node.get("tooltip", ""))
+
+    @property
+    def metadata(self):
+        return dict((att, getattr(self, att)) for att in METADATA_ATTRIBUTES)
+
+    @property
+    def items(self):
+        return dict((att, getattr(self, att)) for att in ITEM_ATTRIBUTES)
+
+    @property
+    def is_loaded(self):
+        return "feesDict" in self.__dict__
+
+    def _reset_items(self):
+        self.feesDict = {}
+
+        self.complex_shortcuts = []
+        self.treatmentCodes = OrderedDict()
+        self.chartPlainCodes = OrderedDict()
+        self.chartRegexCodes = OrderedDict()
+        self.otherRegexCodes = OrderedDict()
+        self.item_modifiers = []
+        self._chart_matcher = None
+        self._other_matcher = None
+        self._code_memo = {}
+        self._fee_memo = {}
+        self._modifier_index = {}
+
+        self.ui_lists = {
+            "crown_buttons": [],
+            "implant_buttons": [],
+            "fs_buttons": [],
+            "endo_buttons": [],
+            "surgical_buttons": [],
+            "post_buttons": [],
+        }
+
+    def touch(self):
+        self.last_used = time.time()
+
+    def materialise(self):
+        '''
+        load the fee items, shortcuts and modifiers, from the cache if
+        possible.
+        '''
+        self.touch()
+        items = load_cached_items(self.database_ix, self.xml_hash)
+        if items is None:
+            self.load_from_xml()
+            save_cached_table(self)
+            return
+        self._reset_items()
+        self.__dict__.update(items)
+        for fee_item in self.feesDict.values():
+            fee_item.table = self
+        LOGGER.info("Feetable %s loaded from cache" % self.database_ix)
+
+    def unload(self):
+        '''
+        discard the items, which will be reloaded if needed.
+        '''
+        if self.is_loaded:
+            LOGGER.debug("unloading Feetable %s" % self.database_ix)
+            for att in ITEM_ATTRIBUTES + MEMO_ATTRIBUTES:
+                self.__dict__.pop(att, None)
 
     def load_from_xml(self):
         '''
         now load the fee items and shortcuts
         '''
-        shortcut_nodes = self.dom.getElementsByTagName("complex_shortcut")
+        LOGGER.info("loading Feetable %s from xml" % self.database_ix)
+        self._reset_items()
+        self.dom = ElementTree.fromstring(self._xml_data)
+        shortcut_nodes = self.dom.findall(".//complex_shortcut")
         for shortcut_node in shortcut_nodes:
             complex_shortcut = ComplexShortcut(shortcut_node)
             self.complex_shortcuts.append(complex_shortcut)
 
-        for item_node in self.dom.getElementsByTagName("item"):
-            item_code = item_node.getAttribute("id")
+        for item_node in self.dom.findall(".//item"):
+            item_code = item_node.get("id", "")
             fee_item = FeeItem(self, item_code, item_node)
             self.feesDict[item_code] = fee_item
 
@@ -436,7 +834,7 @@ class FeeTable(object):
                 else:
                     self.treatmentCodes[fee_item.usercode] = item_code
 
-        for modifier_node in self.dom.getElementsByTagName("modifier"):
+        for modifier_node in self.dom.findall(".//modifier"):
             self.item_modifiers.append(Modifier(modifier_node))
 
         for button in self.get_ui_buttons("crown_chart_button"):
@@ -457,7 +855,8 @@ class FeeTable(object):
         for button in self.get_ui_buttons("implant_chart_button"):
             self.ui_lists["implant_buttons"].append(button)
 
-        self.dom.unlink()
+        # the parsed tree is not needed once loaded
+        self.dom = None
 
     def getToothCode(self, tooth, shortcut):
         '''
@@ -467,22 +866,36 @@ class FeeTable(object):
         if not found, "-----" will be returned
         '''
         LOGGER.debug("getToothCode for %s%s" % (tooth, shortcut))
-
-        for key in self.chartRegexCodes:
-            if key.match(tooth + shortcut):
-                return self.chartRegexCodes[key]
-        return self.chartPlainCodes.get(shortcut, "-----")
+        self.touch()
+        try:
+            return self._code_memo[(tooth, shortcut)]
+        except KeyError:
+            pass
+        if self._chart_matcher is None:
+            self._chart_matcher = ShortcutMatcher(self.chartRegexCodes.items())
+        itemcode = self._chart_matcher.match(tooth + shortcut)
+        if itemcode is None:
+            itemcode = self.chartPlainCodes.get(shortcut, "-----")
+        _memoise(self._code_memo, (tooth, shortcut), itemcode)
+        return itemcode
 
     def getItemCodeFromUserCode(self, arg):
         '''
         return the itemcode associated with it, otherwise, return "-----"
         '''
         LOGGER.debug("looking up usercode %s" % arg)
-        for key in self.otherRegexCodes:
-            if key.match(arg):
-                return self.otherRegexCodes[key]
-
-        return self.treatmentCodes.get(arg, "-----")
+        self.touch()
+        try:
+            return self._code_memo[arg]
+        except KeyError:
+            pass
+        if self._other_matcher is None:
+            self._other_matcher = ShortcutMatcher(self.otherRegexCodes.items())
+        itemcode = self._other_matcher.match(arg)
+        if itemcode is None:
+            itemcode = self.treatmentCodes.get(arg, "-----")
+        _memoise(self._code_memo, arg, itemcode)
+        return itemcode
 
     def _getFees(self, itemcode, pt, csetype, shortcut):
         '''
@@ -505,21 +918,35 @@ class FeeTable(object):
 
         # complex codes have a different fee if there are multiple
         # in the estimate already
-        existing_no = 0
-        for existing_est in pt.estimates:
-            if (existing_est.itemcode == itemcode and
-               csetype == existing_est.csetype):
-                existing_no += 1
+        existing_no = pt.estimates.count_of(itemcode, csetype)
 
         return fee_item.get_fees(existing_no + 1)
 
     def getFees(self, itemcode, pt, csetype, shortcut):
         '''
         a wrapper for the old function
+        results are memoised on whatever can alter the fee, ie. which of
+        the item's fees applies, and the patient attributes the modifiers
+        for this item may examine.
         '''
         LOGGER.debug((itemcode, pt, csetype, shortcut))
+        self.touch()
+        fee_item = self.feesDict.get(itemcode)
+        if fee_item is None or fee_item.is_simple:
+            fee_selector = None
+        elif fee_item.has_fee_shortcuts:
+            fee_selector = shortcut
+        else:
+            fee_selector = pt.estimates.count_of(itemcode, csetype)
+        key = (itemcode, fee_selector, self._modifier_key(itemcode, pt))
+        try:
+            return self._fee_memo[key]
+        except KeyError:
+            pass
         gross, charge = self._getFees(itemcode, pt, csetype, shortcut)
-        return self.apply_modifiers(gross, charge, itemcode, pt)
+        fees = self.apply_modifiers(gross, charge, itemcode, pt)
+        _memoise(self._fee_memo, key, fees)
+        return fees
 
     def recalc_fee(self, pt, itemcode, item_no):
         '''
@@ -527,6 +954,7 @@ class FeeTable(object):
         '''
         LOGGER.debug("recalculating fee for itemcode %s with %d items" % (
             itemcode, item_no))
+        self.touch()
 
         try:
             fee_item = self.feesDict[itemcode]
@@ -538,10 +966,31 @@ class FeeTable(object):
         gross, charge = fee_item.get_fees(item_no)
         return self.apply_modifiers(gross, charge, itemcode, pt)
 
+    def modifiers_for(self, itemcode):
+        '''
+        the modifiers (in feescale order) which apply to itemcode
+        '''
+        try:
+            return self._modifier_index[itemcode]
+        except KeyError:
+            modifiers = [modifier for modifier in self.item_modifiers
+                         if modifier.item_id_match(itemcode)]
+            _memoise(self._modifier_index, itemcode, modifiers)
+            return modifiers
+
+    def _modifier_key(self, itemcode, pt):
+        '''
+        the patient attributes which Modifier.condition_met examines,
+        or None if no modifier applies to this itemcode.
+        '''
+        if not self.modifiers_for(itemcode):
+            return None
+        return pt.cset, pt.age_course_start, pt.ageYears()
+
     def apply_modifiers(self, gross, charge, itemcode, pt):
-        for modifier in self.item_modifiers:
+        for modifier in self.modifiers_for(itemcode):
             LOGGER.debug("checking modifier %s" % modifier)
-            if modifier.condition_met(pt) and modifier.item_id_match(itemcode):
+            if modifier.condition_met(pt):
                 return modifier.gross_mod(gross), modifier.charge_mod(charge)
         return gross, charge
 
@@ -550,6 +999,7 @@ class FeeTable(object):
         returns the patient readable (ie. estimate ready) description of the
         item
         '''
+        self.touch()
         try:
             return self.feesDict[itemcode].description
         except KeyError:
@@ -583,7 +1033,7 @@ class FeeItem(object):
 
         self.section = getTextFromNode(element, "section")
         try:
-            self.obscurity = int(element.getAttribute("obscurity"))
+            self.obscurity = int(element.get("obscurity", ""))
         except ValueError:
             self.obscurity = 0
         self.fees = []
@@ -596,13 +1046,10 @@ class FeeItem(object):
         self.fee_shortcuts = []
 
         try:
-            shortcut_node = element.getElementsByTagName("shortcut")[0]
-            self.is_regex = shortcut_node.getAttribute("type") == "regex"
-            self.pt_attribute = shortcut_node.getAttribute("att")
-            try:
-                self.shortcut = shortcut_node.childNodes[0].data
-            except IndexError:
-                self.shortcut = None
+            shortcut_node = element.findall(".//shortcut")[0]
+            self.is_regex = shortcut_node.get("type", "") == "regex"
+            self.pt_attribute = shortcut_node.get("att", "")
+            self.shortcut = shortcut_node.text
         except IndexError:
             self.pt_attribute = "other"
             self.is_regex = False
@@ -614,15 +1061,15 @@ class FeeItem(object):
         self.description = getTextFromNode(element, "description")
 
         try:
-            node = element.getElementsByTagName("feescale_forbid")[0]
+            node = element.findall(".//feescale_forbid")[0]
             self.allow_feescale_add = False
-            reason_nodes = node.getElementsByTagName("reason")
+            reason_nodes = node.findall(".//reason")
             if reason_nodes:
-                self._forbid_reason = reason_nodes[0].childNodes[0].data
+                self._forbid_reason = reason_nodes[0].text
         except IndexError:
             self.allow_feescale_add = True
 
-        for node in element.getElementsByTagName("fee"):
+        for node in element.findall(".//fee"):
             bd = getTextFromNode(node, "brief_description")
             self.brief_descriptions.append(bd)
 
@@ -635,13 +1082,22 @@ class FeeItem(object):
             except ValueError:
                 pass
 
-            condition = _stripped(node.getAttribute("condition"))
+            condition = _stripped(node.get("condition", ""))
             self.conditions.append(condition)
 
-            shortcut_match = node.getAttribute("shortcut_match")
+            shortcut_match = node.get("shortcut_match", "")
             if shortcut_match:
                 self.fee_shortcuts.append(re.compile(shortcut_match))
 
+    def __getstate__(self):
+        '''
+        the table is not pickled with the item, FeeTable.materialise
+        restores it.
+        '''
+        state = self.__dict__.copy()
+        state["table"] = None
+        return state
+
     def __repr__(self):
         return "FeeItem '%s' %s %s %s %s" % (
             self.itemcode,
@@ -786,11 +1242,11 @@ class ComplexShortcut(object):
 
     def __init__(self, element):
 
-        shortcut_node = element.getElementsByTagName("shortcut")[0]
-        self.is_regex = shortcut_node.getAttribute("type") == "regex"
-        self.pt_attribute = shortcut_node.getAttribute("att")
+        shortcut_node = element.findall(".//shortcut")[0]
+        self.is_regex = shortcut_node.get("type", "") == "regex"
+        self.pt_attribute = shortcut_node.get("att", "")
 
-        shortcut = shortcut_node.childNodes[0].data
+        shortcut = shortcut_node.text
         LOGGER.debug("Complex shortcut %s %s" % (self.pt_attribute, shortcut))
         if self.pt_attribute != "chart":
             shortcut = "%s %s" % (self.pt_attribute, shortcut)
@@ -802,8 +1258,8 @@ class ComplexShortcut(object):
         self.addition_cases, self.removal_cases = [], []
 
         try:
-            addition_node = element.getElementsByTagName("addition")[0]
-            for case_node in addition_node.getElementsByTagName("case"):
+            addition_node = element.findall(".//addition")[0]
+            for case_node in addition_node.findall(".//case"):
                 case_action = CaseAction(case_node)
                 self.addition_cases.append(case_action)
                 LOGGER.debug(case_action)
@@ -811,8 +1267,8 @@ class ComplexShortcut(object):
             LOGGER.debug("no removal cases")
 
         try:
-            removal_node = element.getElementsByTagName("removal")[0]
-            for case_node in removal_node.getElementsByTagName("case"):
+            removal_node = element.findall(".//removal")[0]
+            for case_node in removal_node.findall(".//case"):
                 case_action = CaseAction(case_node)
                 self.removal_cases.append(case_action)
                 LOGGER.debug(case_action)
@@ -823,7 +1279,7 @@ class ComplexShortcut(object):
         '''
         check to see if condition is met
         '''
-        if re.match("[ul][lr][1-8A-E]", att):
+        if TOOTH_ATT.match(att):
             if self.is_regex:
                 return self.shortcut.match("%s%s" % (att, shortcut))
             return self.shortcut == shortcut
@@ -855,9 +1311,9 @@ class CaseAction(object):
         self.alterations = []
         self.shortcut_substitution = None
 
-        self.condition = _stripped(case_node.getAttribute("condition"))
+        self.condition = _stripped(case_node.get("condition", ""))
 
-        handled = case_node.getAttribute("handled")
+        handled = case_node.get("handled", "")
         if handled == "no":
             self._is_handled = self.NOT_HANDLED
         elif handled == "part":
@@ -865,23 +1321,22 @@ class CaseAction(object):
         else:  # default is fully handled!
             self._is_handled = self.FULLY_HANDLED
 
-        removal_nodes = case_node.getElementsByTagName("remove_item")
+        removal_nodes = case_node.findall(".//remove_item")
         for removal_node in removal_nodes:
-            self.removals.append(removal_node.getAttribute("id"))
+            self.removals.append(removal_node.get("id", ""))
 
-        addition_nodes = case_node.getElementsByTagName("add_item")
+        addition_nodes = case_node.findall(".//add_item")
         for addition_node in addition_nodes:
-            self.additions.append(addition_node.getAttribute("id"))
+            self.additions.append(addition_node.get("id", ""))
 
-        alteration_nodes = case_node.getElementsByTagName("alter_item")
+        alteration_nodes = case_node.findall(".//alter_item")
         for alt_node in alteration_nodes:
-            self.alterations.append(alt_node.getAttribute("id"))
+            self.alterations.append(alt_node.get("id", ""))
 
         try:
-            sub_node = case_node.getElementsByTagName(
-                "shortcut_substitution")[0]
+            sub_node = case_node.findall(".//shortcut_substitution")[0]
             self.shortcut_substitution = \
-                sub_node.getAttribute("find"), sub_node.getAttribute("replace")
+                sub_node.get("find", ""), sub_node.get("replace", "")
         except IndexError:
             pass
 
@@ -912,22 +1367,20 @@ class Modifier(object):
                                  # from the fee (eg. free exams on over 80s)
         self._charge_percent = None  # allow for a discount or supplement
 
-        for node in modifier_node.getElementsByTagName("condition"):
-            self.conditions.append(_stripped(node.firstChild.data))
-        for node in modifier_node.getElementsByTagName("item_id"):
-            item_id = node.firstChild.data
-            if node.getAttribute("type") == "regex":
+        for node in modifier_node.findall(".//condition"):
+            self.conditions.append(_stripped(node.text))
+        for node in modifier_node.findall(".//item_id"):
+            item_id = node.text
+            if node.get("type", "") == "regex":
                 self.item_id_regexes.append(re.compile(item_id))
             else:
                 self.item_ids.append(item_id)
         try:
-            self._gross_fee = int(modifier_node.getElementsByTagName(
-                                  "gross")[0].firstChild.data)
+            self._gross_fee = int(modifier_node.findall(".//gross")[0].text)
         except IndexError:
             pass  # no gross fee modification
         try:
-            charge_data = modifier_node.getElementsByTagName(
-                "charge")[0].firstChild.data
+            charge_data = modifier_node.findall(".//charge")[0].text
             if "%" in charge_data:
                 self._charge_percent = int(charge_data.replace("%", ""))/100
             else:
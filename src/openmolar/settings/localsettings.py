@@ -34,6 +34,7 @@ import sys
 
 from xml.dom import minidom
 
+from openmolar.settings import startup_profile
 from openmolar.settings.version import VERSION
 
 LOGGER = logging.getLogger("openmolar")
@@ -44,8 +45,8 @@ SUPERVISOR = "c1219df26de403348e211a314ff2fce58aa6e28d"
 
 DBNAME = "default"
 
-# updated 23th November 2016
-CLIENT_SCHEMA_VERSION = "3.7"
+# updated 17th October 2026
+CLIENT_SCHEMA_VERSION = "4.2"
 
 DB_SCHEMA_VERSION = "unknown"
 
@@ -859,6 +860,12 @@ def force_reconnect():
     user has changed server!
     '''
     from openmolar.connect import params
+    from openmolar.dbtools.db_settings import clear_settings_snapshot
+    from openmolar.dbtools import locations, records_in_use
+    clear_settings_snapshot()
+    # the change feeds' positions belong to the previous server.
+    locations.reset_monitor()
+    records_in_use.reset_monitor()
     if params.has_connection:
         LOGGER.warning("closing connection to previously chosen database")
         params._connection.close()
@@ -876,6 +883,8 @@ def initiateUsers(changed_server=False):
 
     if changed_server:
         force_reconnect()
+    # this loads the settings table (in a single query), so that initiate
+    # need only check that it is unchanged.
     settings_fetcher = SettingsFetcher()
     allowed_logins = settings_fetcher.allowed_logins
 
@@ -895,8 +904,10 @@ def initiate(changed_server=False):
         force_reconnect()
 
     settings_fetcher = SettingsFetcher()
-    settings_fetcher.fetch()
-    cashbookCodesDict = cashbook.CashBookCodesDict()
+    with startup_profile.phase("fetch settings"):
+        settings_fetcher.fetch()
+    with startup_profile.phase("cashbook codes"):
+        cashbookCodesDict = cashbook.CashBookCodesDict()
 
     PT_COUNT = settings_fetcher.PT_COUNT
     WIKIURL = settings_fetcher.wiki_url
@@ -956,6 +967,7 @@ def initiate(changed_server=False):
     LOGGER.debug("practice address - %s", PRACTICE_ADDRESS)
 
 
+@startup_profile.timed("load feescales")
 def loadFeeTables():
     '''
     load the feetables (time consuming)
@@ -0,0 +1,129 @@
+#! /usr/bin/python
+
+# ########################################################################### #
+# #                                                                         # #
+# # Copyright (c) 2009-2016 Neil Wallace <neil@openmolar.com>               # #
+# #                                                                         # #
+# # This file is part of OpenMolar.                                         # #
+# #                                                                         # #
+# # OpenMolar is free software: you can redistribute it and/or modify       # #
+# # it under the terms of the GNU General Public License as published by    # #
+# # the Free Software Foundation, either version 3 of the License, or       # #
+# # (at your option) any later version.                                     # #
+# #                                                                         # #
+# # OpenMolar is distributed in the hope that it will be useful,            # #
+# # but WITHOUT ANY WARRANTY; without even the implied warranty of          # #
+# # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           # #
+# # GNU General Public License for more details.                            # #
+# #                                                                         # #
+# # You should have received a copy of the GNU General Public License       # #
+# # along with OpenMolar.  If not, see <http://www.gnu.org/licenses/>.      # #
+# #                                                                         # #
+# ########################################################################### #
+
+
+'''
+a timeline of the phases of application startup.
+
+phases are recorded (from any thread) with the phase context manager or the
+timed decorator. When the application is started with --profile-startup the
+timeline is printed to the console once the main window is ready for use,
+showing the offset and duration of each phase, and which thread ran it.
+'''
+
+import collections
+import contextlib
+import functools
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger("openmolar")
+
+# set by the --profile-startup command line option
+ENABLED = False
+
+Phase = collections.namedtuple(
+    "Phase", ("name", "thread", "start", "duration"))
+
+_ORIGIN = time.perf_counter()
+_LOCK = threading.Lock()
+_PHASES = []
+_COMPLETED = False
+
+
+def _record(name, start, duration):
+    with _LOCK:
+        _PHASES.append(Phase(name, threading.current_thread().name,
+                             start - _ORIGIN, duration))
+
+
+@contextlib.contextmanager
+def phase(name):
+    '''
+    record the time spent in the with block as a startup phase.
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _record(name, start, duration)
+        LOGGER.debug("startup phase '%s' took %.1f ms", name, duration * 1000)
+
+
+def timed(name):
+    '''
+    a decorator recording each call of the function as a startup phase.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def mark(name):
+    '''
+    record a point in time (a phase of no duration).
+    '''
+    _record(name, time.perf_counter(), 0)
+
+
+def timeline():
+    '''
+    the recorded Phases, in order of starting.
+    '''
+    with _LOCK:
+        return sorted(_PHASES, key=lambda p: p.start)
+
+
+def text_report():
+    '''
+    a plain text report, suitable for the console.
+    '''
+    lines = ["%10s %10s  %-16s %s" % (
+        "OFFSET ms", "TOOK ms", "THREAD", "PHASE")]
+    for p in timeline():
+        lines.append("%10.1f %10.1f  %-16s %s" % (
+            p.start * 1000, p.duration * 1000, p.thread[:16], p.name))
+    return "\n".join(lines)
+
+
+def print_report():
+    print(text_report())
+
+
+def startup_complete():
+    '''
+    called once the main window is ready for use.
+    '''
+    global _COMPLETED
+    if _COMPLETED:
+        return
+    _COMPLETED = True
+    mark("startup complete")
+    if ENABLED:
+        print_report()